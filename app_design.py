@@ -1,25 +1,52 @@
+import sys
+import time
+
+# Startup is timed from here to the first painted frame
+_STARTED = time.perf_counter()
+
+# Headless runs (--run / --category / --list) are handed to ps_cli before
+# tkinter, PIL or pystray are imported, so scheduled tasks start fast.
+if __name__ == "__main__":
+    import ps_cli
+    if ps_cli.wants_cli(sys.argv):
+        sys.exit(ps_cli.main(sys.argv[1:]))
+
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-import subprocess
+from tkinter import ttk, messagebox, filedialog, font as tkfont
 import json
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import os
-import sys
-import ctypes
-import re
-import tempfile
-
-try:
-    from PIL import Image, ImageTk
-    HAS_PIL = True
-except ImportError:
-    HAS_PIL = False
-
-try:
-    from pystray import Icon as TrayIcon, Menu as TrayMenu, MenuItem as TrayMenuItem
-    import threading
-    HAS_TRAY = True
-except ImportError:
-    HAS_TRAY = False
+import queue
+import threading
+
+from ps_engine import ExecutionEngine, HostPool, ElevatedBroker, EV_START, EV_OUTPUT, EV_EXIT, EV_ERROR
+from ps_output import ANSI_PALETTE, BOLD, INVERSE, UNDERLINE, OutputBatch, OutputDecoder, sanitize, tag_style
+from ps_index import SearchIndex, CategoryIndex
+from ps_spool import OutputSpool
+from ps_trace import TraceRecorder
+from ps_store import (
+    ConfigStore, CommandStore, CommandImport, RunHistory,
+    DEFAULT_HISTORY_MAX_DAYS, DEFAULT_HISTORY_MAX_MB,
+)
+
+# PIL is imported on the first thumbnail decode and pystray when the tray
+# starts, so neither delays the first frame
+Image = ImageTk = None
+HAS_PIL = None  # unknown until _have_pil() is first called
+
+
+def _have_pil():
+    """Import PIL on first use; True if it is available."""
+    global Image, ImageTk, HAS_PIL
+    if HAS_PIL is None:
+        try:
+            from PIL import Image, ImageTk
+            HAS_PIL = True
+        except ImportError:
+            HAS_PIL = False
+    return HAS_PIL
 
 # ---------------------------------------------------------------------------
 # Paths
@@ -31,6 +58,9 @@ else:
     SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_FILE = os.path.join(SCRIPT_DIR, "commands.json")
 CONFIG_FILE = os.path.join(SCRIPT_DIR, "config.json")
+THUMB_CACHE_DIR = os.path.join(SCRIPT_DIR, "thumbnails")
+HISTORY_DIR = os.path.join(SCRIPT_DIR, "history")
+TRACE_DIR = os.path.join(SCRIPT_DIR, "traces")
 
 # ---------------------------------------------------------------------------
 # Theme — light blue / grey / white
@@ -97,11 +127,58 @@ FONTS = {
 }
 
 CARD_IMAGE_SIZE = (160, 100)
+# On-disk thumbnail cache budget; least recently used entries go first
+THUMB_CACHE_BUDGET = 32 * 1024 * 1024
+# Threads decoding thumbnails off the Tk thread
+THUMB_WORKERS = 2
+# Decoded thumbnails kept in memory per card slot; least recently shown go first
+THUMB_PHOTOS_PER_SLOT = 4
 CARD_MAX_NAME = 22
 COLUMNS = 3
 
-# Regex to strip ANSI escape sequences from terminal output
-_ANSI_RE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+# Cards have a fixed height so the grid can be virtualized: only the rows in
+# view (plus one spare) get widgets, which are re-bound as you scroll.
+CARD_HEIGHT = 236
+CARD_GAP = 16
+CARD_PITCH = CARD_HEIGHT + CARD_GAP
+
+# Output is drained from the engine queue once per frame (~60 fps)
+FRAME_MS = 16
+
+# Scrollback: lines kept in the output panel when config.json has no
+# "max_output_lines".  Trimming waits for this fraction of extra lines so the
+# delete is amortized over many appends instead of running on every chunk.
+DEFAULT_MAX_OUTPUT_LINES = 1000
+SCROLLBACK_SLACK = 0.1
+
+# Warm PowerShell hosts are opt-in: config.json "host_pool_size" > 0
+DEFAULT_HOST_POOL_MAX_RUNS = 25
+
+# Runs beyond "max_concurrent_runs" wait in a queue; finished output tabs
+# beyond MAX_OUTPUT_TABS are closed oldest-first.
+DEFAULT_MAX_CONCURRENT_RUNS = 4
+MAX_OUTPUT_TABS = 20
+
+# Per-run timing records kept for export
+RUN_TIMINGS_KEPT = 500
+
+# Imported batches (IMPORT_BATCH_SIZE items each) applied per frame
+IMPORT_BATCHES_PER_FRAME = 4
+
+# Commands added to the search index per idle slot while it is built
+SEARCH_INDEX_SLICE = 200
+
+# Results of a broad search ranked before the grid is painted, a few
+# screens' worth; the rest are ranked a frame later
+SEARCH_RANKED_FIRST = 120
+
+
+def _format_bytes(n):
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
 
 
 # ---------------------------------------------------------------------------
@@ -176,6 +253,523 @@ class PlaceholderEntry(tk.Entry):
             self.config(textvariable=var)
 
 
+# ---------------------------------------------------------------------------
+# Thumbnails
+# ---------------------------------------------------------------------------
+def _make_thumbnail(path):
+    """Decode *path* and crop/resize it to CARD_IMAGE_SIZE."""
+    img = Image.open(path)
+    target_w, target_h = CARD_IMAGE_SIZE
+    # JPEG can decode at 1/2, 1/4 or 1/8 scale; ask for the smallest that
+    # still covers the card so an 8K wallpaper never decodes at full size
+    img.draft("RGB", (target_w, target_h))
+    # Crop to aspect ratio then resize for uniform cards
+    img_ratio = img.width / img.height
+    target_ratio = target_w / target_h
+    if img_ratio > target_ratio:
+        new_h = img.height
+        new_w = int(new_h * target_ratio)
+        left = (img.width - new_w) // 2
+        img = img.crop((left, 0, left + new_w, new_h))
+    else:
+        new_w = img.width
+        new_h = int(new_w / target_ratio)
+        top = (img.height - new_h) // 2
+        img = img.crop((0, top, new_w, top + new_h))
+    img = img.resize(CARD_IMAGE_SIZE, Image.LANCZOS)
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA")
+    return img
+
+
+class ThumbnailCache:
+    """Card thumbnails stored as small PNGs, keyed by source path, mtime and
+    size, so a warm start never decodes the original images."""
+
+    def __init__(self, directory, budget=THUMB_CACHE_BUDGET):
+        self.directory = directory
+        self.budget = budget
+        self._size = None  # bytes on disk, measured on the first write
+        self._lock = threading.Lock()
+
+    def _entry_path(self, path, st):
+        key = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{CARD_IMAGE_SIZE[0]}x{CARD_IMAGE_SIZE[1]}"
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".png")
+
+    def load(self, path):
+        """Return a PIL image for *path*, from the cache when possible."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        entry = self._entry_path(path, st)
+        try:
+            img = Image.open(entry)
+            img.load()
+            os.utime(entry)  # mark as recently used
+            return img
+        except OSError:
+            pass
+        img = _make_thumbnail(path)
+        self._store(entry, img)
+        return img
+
+    def _store(self, entry, img):
+        tmp = f"{entry}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            img.save(tmp, "PNG")
+            size = os.path.getsize(tmp)
+            os.replace(tmp, entry)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = self._disk_usage()
+            else:
+                self._size += size
+            if self._size > self.budget:
+                self._evict()
+
+    def _disk_usage(self):
+        total = 0
+        with os.scandir(self.directory) as it:
+            for e in it:
+                if e.name.endswith(".png"):
+                    total += e.stat().st_size
+        return total
+
+    def _evict(self):
+        """Delete least recently used entries down to 80% of the budget."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for e in it:
+                if e.name.endswith(".png"):
+                    st = e.stat()
+                    entries.append((st.st_mtime, st.st_size, e.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = self.budget * 0.8
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+
+# ---------------------------------------------------------------------------
+# Output tab (one per run)
+# ---------------------------------------------------------------------------
+class OutputTab:
+    """A run's own output view: Text widget, frame batch and status."""
+
+    GLYPHS = {
+        "queued":  "\u23F3",
+        "running": "\u25B6",
+        "done":    "\u2714",
+        "failed":  "\u2716",
+    }
+
+    def __init__(self, notebook, job_id, name):
+        self.job_id = job_id
+        self.name = name
+        self.status = "queued"
+        self.run_id = None
+        self.command = None
+        self.admin = False
+        self.record = None  # RunRecord capturing output for the history
+        self.clicked = self.confirmed = None  # perf_counter stamps
+        self.append_time = 0.0  # seconds spent queueing and drawing output
+        self.batch = OutputBatch()
+
+        self.frame = tk.Frame(notebook, bg=THEME["output_bg"])
+        self.text = tk.Text(
+            self.frame, bg=THEME["output_bg"], fg=THEME["output_fg"],
+            font=FONTS["output"], wrap="word", relief="flat", state="disabled",
+            insertbackground=THEME["output_fg"], padx=12, pady=8, height=10,
+            selectbackground=THEME["output_border"], selectforeground=THEME["output_fg"],
+            borderwidth=0, highlightthickness=0, spacing1=2, spacing3=2
+        )
+        self.vscroll = ttk.Scrollbar(self.frame, orient="vertical", command=self.text.yview)
+        self.text.configure(yscrollcommand=self.vscroll.set)
+        self.vscroll.pack(side="right", fill="y")
+        self.text.pack(side="left", fill="both", expand=True)
+
+        # Text color tags for styled output
+        self.text.tag_configure("prompt", foreground=THEME["output_prompt"])
+        self.text.tag_configure("success", foreground=THEME["output_success"])
+        self.text.tag_configure("error", foreground=THEME["output_error"])
+        self.text.tag_configure("warning", foreground=THEME["output_warning"])
+        self.text.tag_configure("dim", foreground=THEME["output_border"])
+        self.text.tag_configure("found", background=THEME["output_warning"], foreground=THEME["output_bg"])
+        self._tags = {"", "prompt", "success", "error", "warning", "dim", "found"}
+
+        # Disable the Text widget's built-in mousewheel so the app routes it
+        self.text.bind("<MouseWheel>", lambda e: "break")
+
+    @property
+    def title(self):
+        name = self.name if len(self.name) <= 24 else self.name[:23] + "\u2026"
+        return f" {self.GLYPHS[self.status]} #{self.job_id} {name} "
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def write(self, text, tag=None):
+        self.batch.write(text, tag)
+
+    def write_runs(self, runs):
+        self.batch.write_runs(runs)
+
+    def flush(self, max_lines):
+        """Apply the pending batch: one delete at most, one insert, one scroll."""
+        if not self.batch.pending:
+            return
+        erase_line, insert_args = self.batch.take()
+        self.text.configure(state="normal")
+        if erase_line:
+            self.text.delete("end-1c linestart", "end-1c")
+        if insert_args:
+            for tag in insert_args[1::2]:
+                if tag not in self._tags:
+                    self._configure_ansi_tag(tag)
+            self.text.insert("end", *insert_args)
+        self.trim(max_lines)
+        self.text.see("end")
+        self.text.configure(state="disabled")
+
+    def _configure_ansi_tag(self, tag):
+        """Style a colour tag from the OutputDecoder the first time it shows up."""
+        self._tags.add(tag)
+        style = tag_style(tag)
+        if style is None:
+            return
+        fg, bg, flags = style
+        fg = THEME["output_fg"] if fg is None else ANSI_PALETTE[fg]
+        bg = None if bg is None else ANSI_PALETTE[bg]
+        if flags & INVERSE:
+            fg, bg = bg or THEME["output_bg"], fg
+        options = {"foreground": fg}
+        if bg is not None:
+            options["background"] = bg
+        if flags & BOLD:
+            options["font"] = (FONTS["output"][0], FONTS["output"][1], "bold")
+        if flags & UNDERLINE:
+            options["underline"] = True
+        self.text.tag_configure(tag, **options)
+
+    def trim(self, max_lines, force=False):
+        """Drop the oldest lines once the view exceeds *max_lines*.
+
+        Without *force* nothing happens until the overshoot reaches
+        SCROLLBACK_SLACK of the limit, so the delete cost is amortized.
+        """
+        lines = int(self.text.index("end-1c").split(".")[0])
+        slack = 0 if force else max(1, int(max_lines * SCROLLBACK_SLACK))
+        if lines <= max_lines + slack:
+            return
+        state = self.text.cget("state")
+        self.text.configure(state="normal")
+        self.text.delete("1.0", f"{lines - max_lines + 1}.0")
+        self.text.configure(state=state)
+
+    def clear(self):
+        self.batch.clear()
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.configure(state="disabled")
+
+    def scroll(self, lines):
+        self.text.yview_scroll(lines, "units")
+
+    def jump_to_end(self):
+        self.text.see("end")
+
+    def find(self, needle, forward=True):
+        """Highlight the next (or previous) match of *needle*, wrapping
+        around; False if there is none."""
+        found = self.text.tag_ranges("found")
+        if found:
+            start = found[1] if forward else found[0]
+        else:
+            start = "1.0" if forward else "end"
+        hit = self.text.search(needle, start, backwards=not forward)
+        if not hit:
+            return False
+        self.text.tag_remove("found", "1.0", "end")
+        self.text.tag_add("found", hit, f"{hit}+{len(needle)}c")
+        self.text.see(hit)
+        return True
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.text.get("1.0", "end-1c"))
+
+    def close(self):
+        pass
+
+
+class SpoolTab(OutputTab):
+    """An output tab backed by an OutputSpool: output goes to disk and the
+    Text widget only ever holds the lines in view, re-read from the spool as
+    it scrolls.  Scrolling, jumping to the end and searching cost the same
+    whatever the output size, and nothing is trimmed."""
+
+    _linespace = None  # pixels per line in the output font, measured once
+
+    def __init__(self, notebook, job_id, name, spool_dir=None):
+        self.spool = OutputSpool(spool_dir)  # first: an OSError leaves no widgets behind
+        super().__init__(notebook, job_id, name)
+        self.batch = None
+        self.first = 0          # first line in view
+        self.follow = True      # keep the last line in view as output arrives
+        self._found = None      # line of the last search hit
+        self._needle = None
+        self._shown = None      # what the widget holds, to skip repaints
+
+        # The scrollbar maps to lines in the spool, not in the widget
+        self.text.configure(wrap="none", yscrollcommand="")
+        self.vscroll.configure(command=self._on_scrollbar)
+        hscroll = ttk.Scrollbar(self.frame, orient="horizontal", command=self.text.xview)
+        self.text.configure(xscrollcommand=hscroll.set)
+        hscroll.pack(side="bottom", fill="x", before=self.vscroll)
+        self.text.bind("<Configure>", lambda e: self.render())
+
+    def _rows(self):
+        if SpoolTab._linespace is None:
+            # spacing1 + spacing3 of the Text widget
+            SpoolTab._linespace = tkfont.Font(font=FONTS["output"]).metrics("linespace") + 4
+        return max(1, (self.text.winfo_height() - 16) // SpoolTab._linespace)
+
+    def write(self, text, tag=None):
+        self.spool.write(text)
+
+    def write_runs(self, runs):
+        self.spool.write("".join(runs[0::2]))
+
+    def flush(self, max_lines):
+        self.render()
+
+    def trim(self, max_lines, force=False):
+        pass  # the spool keeps everything; the widget holds one screen
+
+    def render(self):
+        """Show the lines from ``first`` on (the last screenful while
+        following) and sync the scrollbar."""
+        spool = self.spool
+        rows = self._rows()
+        total = spool.lines
+        last = max(0, total - rows)
+        self.first = last if self.follow else min(self.first, last)
+        view = (self.first, rows, spool.size, self._found)
+        if view == self._shown:
+            return
+        self._shown = view
+        self.text.configure(state="normal")
+        self.text.delete("1.0", "end")
+        self.text.insert("end", "\n".join(spool.read_lines(self.first, rows)))
+        if self._found is not None and self.first <= self._found < self.first + rows:
+            row = self._found - self.first + 1
+            hit = self.text.search(self._needle, f"{row}.0", f"{row}.end")
+            if hit:
+                self.text.tag_add("found", hit, f"{hit}+{len(self._needle)}c")
+            else:
+                self.text.tag_add("found", f"{row}.0", f"{row}.end")
+        self.text.configure(state="disabled")
+        if total:
+            self.vscroll.set(self.first / total, min(1.0, (self.first + rows) / total))
+        else:
+            self.vscroll.set(0.0, 1.0)
+
+    def scroll_to(self, line):
+        last = max(0, self.spool.lines - self._rows())
+        self.first = max(0, min(int(line), last))
+        self.follow = self.first >= last
+        self.render()
+
+    def scroll(self, lines):
+        self.scroll_to(self.first + lines)
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(value) * self.spool.lines)
+        elif unit == "pages":
+            self.scroll(int(value) * self._rows())
+        else:
+            self.scroll(int(value))
+
+    def jump_to_end(self):
+        self.follow = True
+        self.render()
+
+    def find(self, needle, forward=True):
+        """Bring the next (or previous) line containing *needle* into view,
+        wrapping around; False if there is none."""
+        spool = self.spool
+        if self._found is not None and needle == self._needle:
+            start = self._found
+        else:
+            start = self.first - 1 if forward else self.first
+        line = spool.find(needle, start, forward)
+        if line is None:
+            line = spool.find(needle, -1 if forward else spool.lines, forward)
+        if line is None:
+            return False
+        self._found, self._needle = line, needle
+        self.follow = False
+        self.scroll_to(line - self._rows() // 2)
+        return True
+
+    def save(self, path):
+        self.spool.save(path)
+
+    def clear(self):
+        self.spool.clear()
+        self.first, self.follow, self._found = 0, True, None
+        self.render()
+
+    def close(self):
+        self.spool.close()
+
+
+# ---------------------------------------------------------------------------
+# Card slot (recycled card widget)
+# ---------------------------------------------------------------------------
+class CardSlot:
+    """One card's widgets, re-bound to whichever command scrolls into place."""
+
+    def __init__(self, app, canvas):
+        self.app = app
+        self.idx = None     # command index shown, None while hidden
+        self.pos = None     # position in the filtered grid
+        self.photo = None
+        self.image_path = None  # thumbnail wanted for the bound command
+        self._badges = (None, None)
+
+        self.frame = card = tk.Frame(
+            canvas, bg=THEME["card_bg"], bd=0,
+            highlightthickness=1, highlightbackground=THEME["card_border"],
+            padx=12, pady=10
+        )
+        card.pack_propagate(False)
+
+        # Image, or emoji placeholder; the blank image makes width/height pixels
+        self.img_lbl = tk.Label(
+            card, image=app._blank_image, compound="center", text="\U0001F4BB",
+            font=(FONT_FAMILY, 28), bg=THEME["accent_light"], fg=THEME["accent"],
+            width=CARD_IMAGE_SIZE[0], height=CARD_IMAGE_SIZE[1], bd=0
+        )
+        self.img_lbl.pack(pady=(0, 8), fill="x")
+
+        self.name_lbl = tk.Label(card, font=FONTS["card_name"], bg=THEME["card_bg"], fg=THEME["text_primary"])
+        self.name_lbl.pack()
+        self.cmd_lbl = tk.Label(card, font=FONTS["card_cmd"], bg=THEME["card_bg"], fg=THEME["text_muted"])
+        self.cmd_lbl.pack(pady=(1, 3))
+
+        # Category and admin badges share one row so every card is the same height
+        self.badge_row = tk.Frame(card, bg=THEME["card_bg"], height=20)
+        self.badge_row.pack(fill="x", pady=(0, 4))
+        self.cat_lbl = tk.Label(
+            self.badge_row, font=FONTS["badge"],
+            bg=THEME["badge_bg"], fg=THEME["badge_fg"], padx=6, pady=1
+        )
+        self.admin_lbl = tk.Label(
+            self.badge_row, text=" \U0001F6E1 Admin ", font=FONTS["badge"],
+            bg="#FEF3C7", fg="#92400E", padx=6, pady=1
+        )
+
+        # Buttons row
+        btn_row = tk.Frame(card, bg=THEME["card_bg"])
+        btn_row.pack(pady=(6, 0))
+        run_btn = app._themed_button(btn_row, "\u25B6  Run", self._run, "accent")
+        run_btn.pack(side="left", padx=3)
+        edit_btn = app._themed_button(btn_row, "Edit", lambda: app.edit_command(self.idx))
+        edit_btn.pack(side="left", padx=3)
+
+        # Hover effect — only recolor non-button labels
+        self._hover_targets = (self.img_lbl, self.name_lbl, self.cmd_lbl, self.badge_row, btn_row)
+        card.bind("<Enter>", lambda e: self._set_hover(True))
+        card.bind("<Leave>", lambda e: self._set_hover(False))
+        for w in (card, self.img_lbl):
+            w.bind("<Button-3>", lambda e: app._show_card_menu(e, self.idx))
+
+        # Drag-and-drop
+        card.bind("<ButtonPress-1>", lambda e: app._drag_start(self.idx))
+        card.bind("<B1-Motion>", app._drag_motion)
+        card.bind("<ButtonRelease-1>", app._drag_end)
+
+        # Tooltip with full command
+        self.tooltip = ToolTip(card, "")
+
+        self.window = canvas.create_window(0, 0, anchor="nw", window=card, height=CARD_HEIGHT, state="hidden")
+
+    def bind(self, idx, item, photo):
+        self.idx = idx
+        self.image_path = item.get("image") or None
+        self.set_photo(photo)
+
+        # Name (truncated if long)
+        display_name = item["name"]
+        if len(display_name) > CARD_MAX_NAME:
+            display_name = display_name[:CARD_MAX_NAME - 1] + "\u2026"
+        self.name_lbl.configure(text=display_name)
+
+        # Command preview
+        cmd_preview = item["cmd"]
+        if len(cmd_preview) > 35:
+            cmd_preview = cmd_preview[:34] + "\u2026"
+        self.cmd_lbl.configure(text=cmd_preview)
+
+        cat = item.get("category", "")
+        is_admin = bool(item.get("admin", False))
+        if (cat, is_admin) != self._badges:
+            self._badges = (cat, is_admin)
+            self.cat_lbl.pack_forget()
+            self.admin_lbl.pack_forget()
+            if cat:
+                self.cat_lbl.configure(text=f" {cat} ")
+                self.cat_lbl.pack(side="left", expand=True, anchor="e" if is_admin else "center", padx=2)
+            if is_admin:
+                self.admin_lbl.pack(side="left", expand=True, anchor="w" if cat else "center", padx=2)
+
+        self.tooltip.update_text(item["cmd"])
+
+    def set_photo(self, photo):
+        """Show *photo*, or the emoji placeholder while it is None."""
+        if photo is self.photo and photo is not None:
+            return
+        self.photo = photo  # keep a reference while shown
+        if photo:
+            self.img_lbl.configure(image=photo, text="", bg=THEME["card_bg"])
+        else:
+            self.img_lbl.configure(image=self.app._blank_image, text="\U0001F4BB", bg=THEME["accent_light"])
+
+    def _run(self):
+        item = self.app.commands[self.idx]
+        self.app.run_powershell(item["cmd"], item.get("admin", False), item["name"])
+
+    def _set_hover(self, hover):
+        bg = THEME["card_hover"] if hover else THEME["card_bg"]
+        border = THEME["card_hover_border"] if hover else THEME["card_border"]
+        self.frame.configure(highlightbackground=border, bg=bg)
+        for t in self._hover_targets:
+            if t is self.img_lbl and not self.photo:
+                continue
+            try:
+                t.configure(bg=bg)
+            except tk.TclError:
+                pass
+
+
 class PowerShellApp:
     # -----------------------------------------------------------------------
     # Init
@@ -191,13 +785,32 @@ class PowerShellApp:
         if os.path.isfile(ico_path):
             self.root.iconbitmap(default=ico_path)
 
+        self._config = ConfigStore(CONFIG_FILE)
+        # Parse commands.json while the window is being built; the list is
+        # first used once the window is on screen (_startup_first_paint)
+        self._store = CommandStore(DATA_FILE)
+        self._store.preload()
+        self._commands_ready = False
         self._load_geometry()
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
 
-        self.commands = self.load_commands()
         self.custom_categories = self._load_custom_categories()
+        self._category_index = CategoryIndex((), self.custom_categories)
+        self._max_output_lines = self._load_output_limit()
         self._drag_data = {"idx": None}
+        self._import = None  # CommandImport in progress
         self._visible_count = 0
+        self._rank_after_id = None   # rest of a broad search, ranked after the first paint
+
+        self.engine = self._create_engine()
+        self._history = self._create_history()
+        self._run_timings = deque(maxlen=RUN_TIMINGS_KEPT)
+        self._drain_after_id = None
+        self._flush_after_id = None
+        self._output_tabs = []       # OutputTab, oldest first
+        self._tabs_by_run = {}       # engine run id -> OutputTab
+        self._dirty_tabs = set()
+        self._next_job_id = 1
 
         self.create_menubar()
 
@@ -211,11 +824,21 @@ class PowerShellApp:
             bg=THEME["status_bg"], fg=THEME["text_secondary"], anchor="w"
         )
         self._status_left.pack(side="left", padx=12)
+        self._status_jobs = tk.Label(
+            self.status_bar, text="", font=FONTS["status"],
+            bg=THEME["status_bg"], fg=THEME["accent"], anchor="w"
+        )
+        self._status_jobs.pack(side="left", padx=12)
         self._status_right = tk.Label(
             self.status_bar, text="Ctrl+N  New  |  Ctrl+F  Find  |  F5  Refresh",
             font=FONTS["status"], bg=THEME["status_bg"], fg=THEME["text_muted"], anchor="e"
         )
         self._status_right.pack(side="right", padx=12)
+        self._status_timing = tk.Label(
+            self.status_bar, text="", font=FONTS["status"],
+            bg=THEME["status_bg"], fg=THEME["text_muted"], anchor="e"
+        )
+        self._status_timing.pack(side="right", padx=12)
 
         # ---- Output panel (hidden, pack before main so it's above status) ----
         self._output_visible = False
@@ -240,41 +863,42 @@ class PowerShellApp:
         close_out_btn.bind("<Enter>", lambda e: close_out_btn.configure(fg=THEME["output_error"]))
         close_out_btn.bind("<Leave>", lambda e: close_out_btn.configure(fg=THEME["text_muted"]))
 
-        clear_btn = tk.Label(
-            output_header, text=" Clear ", font=FONTS["small"],
-            bg=THEME["output_header"], fg=THEME["text_muted"], cursor="hand2"
+        for text, action, hover_fg in (
+            (" Close Tab ", self._close_output_tab, THEME["output_fg"]),
+            (" Clear ", self._clear_output, THEME["output_fg"]),
+            (" Save ", self.save_output, THEME["output_fg"]),
+            (" End ", self._output_to_end, THEME["output_fg"]),
+            (" Stop ", self._stop_current_run, THEME["output_error"]),
+        ):
+            hdr_btn = tk.Label(
+                output_header, text=text, font=FONTS["small"],
+                bg=THEME["output_header"], fg=THEME["text_muted"], cursor="hand2"
+            )
+            hdr_btn.pack(side="right", padx=4, pady=5)
+            hdr_btn.bind("<Button-1>", lambda e, a=action: a())
+            hdr_btn.bind("<Enter>", lambda e, b=hdr_btn, f=hover_fg: b.configure(fg=f))
+            hdr_btn.bind("<Leave>", lambda e, b=hdr_btn: b.configure(fg=THEME["text_muted"]))
+
+        # Find in the current tab: Enter for the next match, Shift+Enter for the previous
+        self._output_find_var = tk.StringVar()
+        find_entry = PlaceholderEntry(
+            output_header, placeholder="Find in output...", textvariable=self._output_find_var,
+            font=FONTS["small"], width=20, bg=THEME["output_bg"], fg=THEME["output_fg"],
+            relief="flat", insertbackground=THEME["output_fg"]
         )
-        clear_btn.pack(side="right", padx=4, pady=5)
-        clear_btn.bind("<Button-1>", lambda e: self._clear_output())
-        clear_btn.bind("<Enter>", lambda e: clear_btn.configure(fg=THEME["output_fg"]))
-        clear_btn.bind("<Leave>", lambda e: clear_btn.configure(fg=THEME["text_muted"]))
+        find_entry.pack(side="right", padx=8, pady=5)
+        find_entry.bind("<Return>", lambda e: self._find_in_output(True))
+        find_entry.bind("<Shift-Return>", lambda e: self._find_in_output(False))
 
         # Separator under header
         tk.Frame(self.output_frame, bg=THEME["output_border"], height=1).pack(fill="x")
 
-        # Text area with both scrollbars
-        text_container = tk.Frame(self.output_frame, bg=THEME["output_bg"])
-        text_container.pack(fill="both", expand=True)
-
-        self.output_text = tk.Text(
-            text_container, bg=THEME["output_bg"], fg=THEME["output_fg"],
-            font=FONTS["output"], wrap="word", relief="flat", state="disabled",
-            insertbackground=THEME["output_fg"], padx=12, pady=8, height=10,
-            selectbackground=THEME["output_border"], selectforeground=THEME["output_fg"],
-            borderwidth=0, highlightthickness=0, spacing1=2, spacing3=2
-        )
-        output_vscroll = ttk.Scrollbar(text_container, orient="vertical", command=self.output_text.yview)
-        self.output_text.configure(yscrollcommand=output_vscroll.set)
-
-        output_vscroll.pack(side="right", fill="y")
-        self.output_text.pack(side="left", fill="both", expand=True)
-
-        # Text color tags for styled output
-        self.output_text.tag_configure("prompt", foreground=THEME["output_prompt"])
-        self.output_text.tag_configure("success", foreground=THEME["output_success"])
-        self.output_text.tag_configure("error", foreground=THEME["output_error"])
-        self.output_text.tag_configure("warning", foreground=THEME["output_warning"])
-        self.output_text.tag_configure("dim", foreground=THEME["output_border"])
+        # One tab per run
+        style = ttk.Style(root)
+        style.configure("Output.TNotebook", background=THEME["output_bg"], borderwidth=0)
+        style.configure("Output.TNotebook.Tab", font=FONTS["small"], padding=(6, 2))
+        self.output_notebook = ttk.Notebook(self.output_frame, style="Output.TNotebook", height=200)
+        self.output_notebook.pack(fill="both", expand=True)
 
         # ---- Main container ----
         main_container = tk.Frame(root, bg=THEME["bg"])
@@ -296,7 +920,13 @@ class PowerShellApp:
 
         self._active_category = "Home"
         self._search_mode = False
+        self._search_index = None     # built in idle time after startup
+        self._search_building = None  # the index while that build runs
+        self._search_pending = None   # id(item) -> item, not yet indexed
+        self._positions = None        # id(item) -> list index, for ranking
         self._sidebar_buttons = {}
+        self._sidebar_counts = {}    # last count shown per sidebar entry
+        self._sidebar_spacer = None
         self._sidebar_extras = []  # separators and other non-button widgets to clean up
         self._build_sidebar()
 
@@ -340,19 +970,13 @@ class PowerShellApp:
         # Scrollable card grid
         self.canvas = tk.Canvas(self.content_area, bg=THEME["content_bg"], highlightthickness=0, bd=0)
         self.scrollbar = ttk.Scrollbar(self.content_area, orient="vertical", command=self.canvas.yview)
-        self.buttons_frame = tk.Frame(self.canvas, bg=THEME["content_bg"])
         self._scrollbar_visible = False
 
-        self.buttons_frame.bind("<Configure>", lambda e: self._sync_scroll())
-        self._canvas_win = self.canvas.create_window((0, 0), window=self.buttons_frame, anchor="nw")
         self.canvas.configure(yscrollcommand=self._on_scroll_set)
         self.canvas.bind("<Configure>", self._on_canvas_resize)
 
         self.canvas.pack(side="left", fill="both", expand=True, padx=(20, 0), pady=(4, 10))
 
-        # Disable the Text widget's built-in mousewheel so we control it
-        self.output_text.bind("<MouseWheel>", lambda e: "break")
-
         # Mousewheel routing — use winfo_containing to check actual mouse position
         def _is_over(widget, x, y):
             """Check if screen coords (x, y) are within widget's bounds."""
@@ -371,7 +995,9 @@ class PowerShellApp:
 
             # Check output panel first
             if self._output_visible and _is_over(self.output_frame, sx, sy):
-                self.output_text.yview_scroll(delta, "units")
+                tab = self._current_output_tab()
+                if tab:
+                    tab.scroll(delta)
                 return "break"
 
             # Check card area
@@ -385,13 +1011,25 @@ class PowerShellApp:
 
         self.root.bind_all("<MouseWheel>", _on_mousewheel)
 
-        # Card cache
-        self._card_widgets = []
-        self._image_refs = []
-        self._card_tooltips = []
+        # Virtualized card grid: a pool of CardSlots bound to the rows in view
+        self._blank_image = tk.PhotoImage(width=1, height=1)
+        self._card_slots = []
+        self._visible_indices = []   # command indices passing the current filter
+        self._first_row = None
+        self._rebind_all = False
+        self._col_width = 0
+        self._grid_height = 0
+        self._grid_view = None
+        self._thumb_cache = OrderedDict()  # path -> PhotoImage (None if unloadable), LRU first
+        self._thumbnails = ThumbnailCache(THUMB_CACHE_DIR)
+        self._thumb_pool = None
+        self._thumb_futures = {}    # path -> Future still decoding
+        self._thumb_done = queue.SimpleQueue()
+        self._thumb_generation = 0  # bumped when the cache is invalidated
+        self._thumb_after_id = None
 
         # Empty state label (shown when no cards visible)
-        self._empty_frame = tk.Frame(self.buttons_frame, bg=THEME["content_bg"])
+        self._empty_frame = tk.Frame(self.canvas, bg=THEME["content_bg"])
         tk.Label(
             self._empty_frame, text="No commands yet",
             font=FONTS["empty"], bg=THEME["content_bg"], fg=THEME["text_muted"]
@@ -400,6 +1038,7 @@ class PowerShellApp:
             self._empty_frame, text="Click 'New Command' in the sidebar or press Ctrl+N",
             font=FONTS["empty_sub"], bg=THEME["content_bg"], fg=THEME["text_muted"]
         ).pack()
+        self._empty_win = self.canvas.create_window(0, 0, anchor="nw", window=self._empty_frame, state="hidden")
 
         # ---- Toast overlay ----
         self._toast_label = tk.Label(
@@ -408,28 +1047,70 @@ class PowerShellApp:
         )
         self._toast_after_id = None
 
-        # Build
+        # Build.  Only the shell is drawn here; card slots and the tray are
+        # set up in idle-time stages once the first frame is on screen.
+        self._tray_icon = None
+        self._cards_ready = False
+        self._startup_timing = {}
         self._build_cards()
-        self.refresh_buttons()
         self._update_status()
+        self.root.after_idle(self._startup_first_paint)
 
-        # System tray (optional)
-        self._tray_icon = None
-        if HAS_TRAY and HAS_PIL:
-            self._setup_tray()
+    # -----------------------------------------------------------------------
+    # Staged startup
+    # -----------------------------------------------------------------------
+    def _startup_ms(self):
+        return round((time.perf_counter() - _STARTED) * 1000, 1)
+
+    def _startup_first_paint(self):
+        """Stage 1: draw the window shell and sidebar, then take in the
+        commands (loaded on a thread meanwhile) and start on cards."""
+        self.root.update_idletasks()
+        self._startup_timing["first_paint_ms"] = self._startup_ms()
+        self._status_timing.config(text=f"First paint {self._startup_timing['first_paint_ms']:.0f} ms")
+        self._check_store_loaded()
+        self._category_index.rebuild(self.commands, self.custom_categories)
+        self._commands_ready = True
+        self._sync_sidebar()
+        self.refresh_buttons()
+        self.root.after_idle(self._startup_cards)
+
+    def _startup_cards(self):
+        """Stage 2: grow the card pool one row per idle slot, showing each
+        row as it is made, so input is handled between rows."""
+        done = self._ensure_card_pool(self.canvas.winfo_height(), limit=COLUMNS)
+        self._layout_cards()
+        if not done:
+            self.root.after_idle(self._startup_cards)
+            return
+        self._cards_ready = True
+        self._startup_timing["cards_ms"] = self._startup_ms()
+        self.root.after_idle(self._startup_tray)
+
+    def _startup_tray(self):
+        """Stage 3: the tray icon, whose imports run off the Tk thread."""
+        threading.Thread(target=self._setup_tray, name="tray", daemon=True).start()
+        t = self._startup_timing
+        self._status_timing.config(text=f"First paint {t['first_paint_ms']:.0f} ms  \u00B7  cards {t['cards_ms']:.0f} ms")
+        # Stage 4: the search index, in idle-time slices
+        self._start_search_index()
 
     # -----------------------------------------------------------------------
     # Canvas resize / scroll management
     # -----------------------------------------------------------------------
     def _on_canvas_resize(self, event):
-        self.canvas.itemconfig(self._canvas_win, width=event.width)
+        self._col_width = max(1, event.width // COLUMNS)
+        for slot in self._card_slots:
+            self.canvas.itemconfigure(slot.window, width=self._col_width - CARD_GAP)
+        self.canvas.itemconfigure(self._empty_win, width=event.width)
+        if not self._cards_ready:
+            return  # _startup_cards grows the pool
+        self._ensure_card_pool(event.height)
         self._sync_scroll()
+        self._layout_cards(force=True)
 
     def _content_overflows(self):
-        bbox = self.canvas.bbox("all")
-        if not bbox:
-            return False
-        return bbox[3] > self.canvas.winfo_height()
+        return self._grid_height > self.canvas.winfo_height()
 
     def _on_scroll_set(self, first, last):
         """Only show scrollbar when content overflows."""
@@ -445,11 +1126,12 @@ class PowerShellApp:
                 self.scrollbar.pack(side="right", fill="y", pady=4)
                 self._scrollbar_visible = True
             self.scrollbar.set(first, last)
+        self._layout_cards(scrolled=True)
 
     def _sync_scroll(self):
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        # Force a scroll-set check to show/hide scrollbar
-        self.canvas.update_idletasks()
+        rows = -(-len(self._visible_indices) // COLUMNS)
+        self._grid_height = rows * CARD_PITCH
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), self._grid_height))
         if not self._content_overflows():
             if self._scrollbar_visible:
                 self.scrollbar.pack_forget()
@@ -460,33 +1142,30 @@ class PowerShellApp:
     # Geometry persistence
     # -----------------------------------------------------------------------
     def _load_geometry(self):
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                cfg = json.load(f)
-            geo = cfg.get("geometry")
-            if geo:
+        geo = self._config.get("geometry")
+        if geo:
+            try:
                 self.root.geometry(geo)
                 return
-        except Exception:
-            pass
+            except tk.TclError:
+                pass
         self.root.geometry("960x680")
 
     def _save_geometry(self):
-        cfg = {}
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                cfg = json.load(f)
-        except Exception:
-            pass
-        cfg["geometry"] = self.root.geometry()
-        try:
-            with open(CONFIG_FILE, "w") as f:
-                json.dump(cfg, f)
-        except Exception:
-            pass
+        self._config.set("geometry", self.root.geometry())
 
     def _on_close(self):
         self._save_geometry()
+        self._config.close()
+        for tab in self._output_tabs:
+            self._end_record(tab, None)
+            tab.close()
+        if self._import is not None:
+            self._import.cancel()
+        self._store.close()
+        self.engine.close()
+        if self._thumb_pool:
+            self._thumb_pool.shutdown(wait=False, cancel_futures=True)
         if self._tray_icon:
             self._tray_icon.stop()
         self.root.destroy()
@@ -495,46 +1174,69 @@ class PowerShellApp:
     # Sidebar
     # -----------------------------------------------------------------------
     def _get_categories(self):
-        cats = set()
-        for item in self.commands:
-            cat = item.get("category", "")
-            if cat:
-                cats.add(cat)
-        # Merge with custom categories
-        for cat_info in self.custom_categories:
-            cats.add(cat_info["name"])
-        return sorted(cats)
+        return self._category_index.categories()
 
     def _get_category_icon(self, cat_name):
-        for cat_info in self.custom_categories:
-            if cat_info["name"] == cat_name:
-                return cat_info.get("icon", "")
-        return ""
+        return self._category_index.icon(cat_name)
 
     def _load_custom_categories(self):
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                cfg = json.load(f)
-            cats = cfg.get("categories", [])
-            if isinstance(cats, list):
-                return cats
-        except Exception:
-            pass
-        return []
+        cats = self._config.get("categories", [])
+        return cats if isinstance(cats, list) else []
 
     def _save_custom_categories(self):
-        cfg = {}
+        self._config.set("categories", self.custom_categories)
+
+    # -----------------------------------------------------------------------
+    # Output scrollback limit
+    # -----------------------------------------------------------------------
+    def _load_output_limit(self):
         try:
-            with open(CONFIG_FILE, "r") as f:
-                cfg = json.load(f)
-        except Exception:
+            limit = int(self._config.get("max_output_lines", DEFAULT_MAX_OUTPUT_LINES))
+            if limit > 0:
+                return limit
+        except (TypeError, ValueError):
             pass
-        cfg["categories"] = self.custom_categories
+        return DEFAULT_MAX_OUTPUT_LINES
+
+    def _save_output_limit(self):
+        self._config.set("max_output_lines", self._max_output_lines)
+
+    # -----------------------------------------------------------------------
+    # Execution engine settings
+    # -----------------------------------------------------------------------
+    def _create_engine(self):
+        cfg = self._config
         try:
-            with open(CONFIG_FILE, "w") as f:
-                json.dump(cfg, f)
-        except Exception:
-            pass
+            max_concurrent = max(0, int(cfg.get("max_concurrent_runs", DEFAULT_MAX_CONCURRENT_RUNS)))
+        except (TypeError, ValueError):
+            max_concurrent = DEFAULT_MAX_CONCURRENT_RUNS
+
+        # Warm hosts skip interpreter startup for every run
+        pool = None
+        try:
+            size = int(cfg.get("host_pool_size", 0))
+            max_runs = int(cfg.get("host_pool_max_runs", DEFAULT_HOST_POOL_MAX_RUNS))
+        except (TypeError, ValueError):
+            size = 0
+        if size > 0:
+            pool = HostPool(size, max_runs=max(1, max_runs))
+            threading.Thread(target=pool.warm, name="ps-pool-warm", daemon=True).start()
+
+        # One elevated broker per session means one UAC prompt per session
+        broker = ElevatedBroker() if cfg.get("elevated_broker") else None
+
+        # Output is decoded and sanitized on the reader threads
+        engine = ExecutionEngine(pool, max_concurrent, broker=broker, decoder=OutputDecoder)
+        # Raw output and chunk timing for replaying in benchmarks
+        if cfg.get("record_traces"):
+            engine.recorder = TraceRecorder(TRACE_DIR)
+        return engine
+
+    def set_output_limit(self, limit):
+        self._max_output_lines = max(1, int(limit))
+        self._save_output_limit()
+        for tab in self._output_tabs:
+            tab.trim(self._max_output_lines, force=True)
 
     def _build_sidebar(self):
         for w in list(self._sidebar_buttons.values()):
@@ -543,6 +1245,7 @@ class PowerShellApp:
             else:
                 w.destroy()
         self._sidebar_buttons.clear()
+        self._sidebar_counts.clear()
         for w in self._sidebar_extras:
             w.destroy()
         self._sidebar_extras.clear()
@@ -567,7 +1270,7 @@ class PowerShellApp:
         for fixed in ("Search", "Home"):
             if fixed == "Home":
                 icon = "\u2302"
-                count = len(self.commands)
+                count = len(self._category_index)
             else:
                 icon = "\U0001F50D"
                 count = None
@@ -600,6 +1303,7 @@ class PowerShellApp:
                 w.bind("<Leave>", lambda e, cn=container, lb=lbl, cl=count_lbl, c=fixed: self._sidebar_hover(cn, lb, cl, c, False))
 
             self._sidebar_buttons[fixed] = (container, lbl, count_lbl)
+            self._sidebar_counts[fixed] = count
 
         # Separator before categories
         cat_sep = tk.Frame(self.sidebar, bg=THEME["sidebar_sep"], height=1)
@@ -607,38 +1311,14 @@ class PowerShellApp:
         self._sidebar_extras.append(cat_sep)
 
         # Dynamic categories
-        categories = self._get_categories()
-        for cat in categories:
-            count = sum(1 for c in self.commands if c.get("category", "") == cat)
-            cat_icon = self._get_category_icon(cat)
-
-            container = tk.Frame(self.sidebar, bg=THEME["sidebar_bg"], cursor="hand2")
-            container.pack(fill="x")
-
-            display_text = f" {cat_icon}  {cat}" if cat_icon else f"  {cat}"
-            lbl = tk.Label(
-                container, text=display_text, font=FONTS["sidebar"],
-                bg=THEME["sidebar_bg"], fg=THEME["sidebar_fg"], anchor="w"
-            )
-            lbl.pack(side="left", fill="x", expand=True, padx=(14, 0), pady=7)
-
-            count_lbl = tk.Label(
-                container, text=str(count), font=FONTS["badge"],
-                bg=THEME["sidebar_bg"], fg=THEME["text_muted"], anchor="e"
-            )
-            count_lbl.pack(side="right", padx=(0, 14), pady=7)
-
-            for w in (container, lbl, count_lbl):
-                w.bind("<Button-1>", lambda e, c=cat: self._select_category(c))
-                w.bind("<Enter>", lambda e, cn=container, lb=lbl, cl=count_lbl, c=cat: self._sidebar_hover(cn, lb, cl, c, True))
-                w.bind("<Leave>", lambda e, cn=container, lb=lbl, cl=count_lbl, c=cat: self._sidebar_hover(cn, lb, cl, c, False))
-
-            self._sidebar_buttons[cat] = (container, lbl, count_lbl)
+        for cat in self._get_categories():
+            self._create_sidebar_category(cat, self._category_index.count(cat))
 
         # Spacer to push "Add Category" to bottom
         spacer = tk.Frame(self.sidebar, bg=THEME["sidebar_bg"])
         spacer.pack(fill="both", expand=True)
         self._sidebar_extras.append(spacer)
+        self._sidebar_spacer = spacer
 
         # "Add Category" button at bottom
         add_cat_sep = tk.Frame(self.sidebar, bg=THEME["sidebar_sep"], height=1)
@@ -662,6 +1342,73 @@ class PowerShellApp:
 
         self._highlight_sidebar()
 
+    def _create_sidebar_category(self, cat, count, before=None):
+        cat_icon = self._get_category_icon(cat)
+
+        container = tk.Frame(self.sidebar, bg=THEME["sidebar_bg"], cursor="hand2")
+        if before is not None:
+            container.pack(fill="x", before=before)
+        else:
+            container.pack(fill="x")
+
+        display_text = f" {cat_icon}  {cat}" if cat_icon else f"  {cat}"
+        lbl = tk.Label(
+            container, text=display_text, font=FONTS["sidebar"],
+            bg=THEME["sidebar_bg"], fg=THEME["sidebar_fg"], anchor="w"
+        )
+        lbl.pack(side="left", fill="x", expand=True, padx=(14, 0), pady=7)
+
+        count_lbl = tk.Label(
+            container, text=str(count), font=FONTS["badge"],
+            bg=THEME["sidebar_bg"], fg=THEME["text_muted"], anchor="e"
+        )
+        count_lbl.pack(side="right", padx=(0, 14), pady=7)
+
+        for w in (container, lbl, count_lbl):
+            w.bind("<Button-1>", lambda e, c=cat: self._select_category(c))
+            w.bind("<Enter>", lambda e, cn=container, lb=lbl, cl=count_lbl, c=cat: self._sidebar_hover(cn, lb, cl, c, True))
+            w.bind("<Leave>", lambda e, cn=container, lb=lbl, cl=count_lbl, c=cat: self._sidebar_hover(cn, lb, cl, c, False))
+
+        self._sidebar_buttons[cat] = (container, lbl, count_lbl)
+        self._sidebar_counts[cat] = count
+
+    def _sync_sidebar(self):
+        """Bring the sidebar up to date without rebuilding it: add or remove
+        only the categories that changed and touch only counters whose value
+        moved."""
+        index = self._category_index
+        categories = index.categories()
+        wanted = set(categories)
+
+        removed = [c for c in self._sidebar_buttons if c not in ("Search", "Home") and c not in wanted]
+        for cat in removed:
+            self._sidebar_buttons.pop(cat)[0].destroy()
+            self._sidebar_counts.pop(cat, None)
+
+        added = False
+        # Walk backwards so each new entry can be packed before its successor
+        successor = self._sidebar_spacer
+        for cat in reversed(categories):
+            if cat not in self._sidebar_buttons:
+                self._create_sidebar_category(cat, index.count(cat), before=successor)
+                added = True
+            successor = self._sidebar_buttons[cat][0]
+
+        for name, widgets in self._sidebar_buttons.items():
+            count_lbl = widgets[2]
+            if count_lbl is None:
+                continue
+            count = len(index) if name == "Home" else index.count(name)
+            if self._sidebar_counts.get(name) != count:
+                count_lbl.configure(text=str(count))
+                self._sidebar_counts[name] = count
+
+        if self._active_category in removed:
+            self._active_category = "Home"
+            added = True
+        if added:
+            self._highlight_sidebar()
+
     def _sidebar_hover(self, container, lbl, count_lbl, cat, entering):
         # Don't hover the active item
         is_active = (cat == "Search" and self._search_mode) or (cat != "Search" and cat == self._active_category and not self._search_mode)
@@ -724,6 +1471,7 @@ class PowerShellApp:
         file_menu.add_separator()
         file_menu.add_command(label="Import Commands...", command=self.import_commands)
         file_menu.add_command(label="Export Commands...", command=self.export_commands)
+        file_menu.add_command(label="Export Run Timings...", command=self.export_run_timings)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", accelerator="Alt+F4", command=self._on_close)
         menubar.add_cascade(label="File", menu=file_menu)
@@ -739,6 +1487,11 @@ class PowerShellApp:
         view_menu.add_checkbutton(label="Sidebar", variable=self._sidebar_visible, command=self.toggle_sidebar)
         self._output_toggle_var = tk.BooleanVar(value=False)
         view_menu.add_checkbutton(label="Output Panel", variable=self._output_toggle_var, command=self.toggle_output)
+        view_menu.add_command(label="Scrollback Limit...", command=self.edit_output_limit)
+        self._spool_output_var = tk.BooleanVar(value=bool(self._config.get("spool_output", False)))
+        view_menu.add_checkbutton(label="Spool Output to Disk", variable=self._spool_output_var,
+                                  command=lambda: self._config.set("spool_output", self._spool_output_var.get()))
+        view_menu.add_command(label="Run History...", accelerator="Ctrl+H", command=self.show_history)
         view_menu.add_separator()
         view_menu.add_command(label="Refresh", accelerator="F5", command=self.refresh_all)
         menubar.add_cascade(label="View", menu=view_menu)
@@ -755,47 +1508,60 @@ class PowerShellApp:
         self.root.bind("<Control-N>", lambda e: self.add_new_command())
         self.root.bind("<Control-f>", lambda e: self.focus_search())
         self.root.bind("<Control-F>", lambda e: self.focus_search())
+        self.root.bind("<Control-h>", lambda e: self.show_history())
+        self.root.bind("<Control-H>", lambda e: self.show_history())
         self.root.bind("<F5>", lambda e: self.refresh_all())
 
     # -----------------------------------------------------------------------
     # Data I/O
     # -----------------------------------------------------------------------
-    def load_commands(self):
-        if os.path.exists(DATA_FILE):
-            try:
-                with open(DATA_FILE, "r") as f:
-                    data = json.load(f)
-                if isinstance(data, list):
-                    return data
-            except (json.JSONDecodeError, IOError):
-                messagebox.showwarning("Warning", "commands.json is corrupted. Starting with empty list.")
-        return []
-
-    def save_commands(self):
-        with open(DATA_FILE, "w") as f:
-            json.dump(self.commands, f)
+    @property
+    def commands(self):
+        """The command list; change it only through ``self._store``."""
+        return self._store.items
+
+    def _check_store_loaded(self):
+        error = self._store.load_error
+        if error:
+            empty = "" if self._store.items else " Starting with empty list."
+            messagebox.showwarning("Warning", f"{error}.{empty}")
 
     def import_commands(self):
+        if self._import is not None:
+            self._toast("An import is already running")
+            return
         path = filedialog.askopenfilename(filetypes=[("JSON files", "*.json"), ("All files", "*.*")])
         if not path:
             return
-        try:
-            with open(path, "r") as f:
-                data = json.load(f)
-            if not isinstance(data, list):
-                messagebox.showerror("Import Error", "File does not contain a valid command list.")
-                return
-            count = 0
-            for item in data:
-                if isinstance(item, dict) and "name" in item and "cmd" in item:
-                    self.commands.append(item)
-                    count += 1
-            if count:
-                self.save_commands()
-                self._rebuild()
-            self._toast(f"Imported {count} command(s)")
-        except (json.JSONDecodeError, IOError) as e:
-            messagebox.showerror("Import Error", f"Could not read file:\n{e}")
+        # Parsed and deduplicated on a worker; batches land in the grid as they come
+        self._import = CommandImport(path, self.commands)
+        self._import.start()
+        self._update_status()
+        self.root.after(FRAME_MS, self._drain_import)
+
+    def _drain_import(self):
+        imp = self._import
+        added = []
+        for _ in range(IMPORT_BATCHES_PER_FRAME):
+            try:
+                batch = imp.batches.get_nowait()
+            except queue.Empty:
+                break
+            self._store.extend(batch)
+            added.extend(batch)
+        if added:
+            self._commands_changed(changed=added)
+        if not (imp.done and imp.batches.empty()):
+            self._update_status()
+            self.root.after(FRAME_MS, self._drain_import)
+            return
+        self._import = None
+        self._update_status()
+        if imp.error:
+            messagebox.showerror("Import Error", f"Could not read file:\n{imp.error}\n\n{imp.added} command(s) were imported before the error.")
+        else:
+            skipped = f", skipped {imp.duplicates} duplicate(s)" if imp.duplicates else ""
+            self._toast(f"Imported {imp.added} command(s){skipped}")
 
     def export_commands(self):
         if not self.commands:
@@ -822,8 +1588,7 @@ class PowerShellApp:
             self._toast("No commands to delete")
             return
         if messagebox.askyesno("Confirm", f"Delete all {len(self.commands)} command(s)? This cannot be undone."):
-            self.commands.clear()
-            self.save_commands()
+            self._store.clear()
             self._rebuild()
             self._toast("All commands deleted")
 
@@ -841,21 +1606,53 @@ class PowerShellApp:
             self.output_frame.pack_forget()
 
     def refresh_all(self):
-        self.commands = self.load_commands()
+        self._store.reload()
+        self._check_store_loaded()
+        self._config.flush()
+        self._config.reload()
         self.custom_categories = self._load_custom_categories()
         self._rebuild()
         self._toast("Refreshed")
 
     def _rebuild(self):
+        self._category_index.rebuild(self.commands, self.custom_categories)
+        self._positions = None
+        self._start_search_index()
         self._build_sidebar()
         self._build_cards()
         self.refresh_buttons(self.search_var.get().lower())
         self._update_status()
 
+    def _commands_changed(self, dirty=(), changed=(), removed=()):
+        """Incremental refresh after a single mutation.
+
+        *dirty* holds the command indices whose data changed or shifted (a
+        range for inserts and deletes); only visible slots bound to them are
+        re-bound, and the sidebar only updates what moved.  *changed* and
+        *removed* are the command dicts added/edited and deleted, for the
+        category and search indexes.
+        """
+        for item in removed:
+            self._category_index.remove(item)
+        for item in changed:
+            self._category_index.update(item)
+        self._positions = None
+        index = self._search_index if self._search_index is not None else self._search_building
+        if index is not None:
+            for item in removed:
+                index.remove(item)
+            index.extend(changed)
+        if self._search_pending:
+            for item in (*removed, *changed):
+                self._search_pending.pop(id(item), None)
+        self._sync_sidebar()
+        self.refresh_buttons(self.search_var.get().lower(), dirty=dirty)
+
     def show_shortcuts(self):
         shortcuts = (
             "Ctrl+N\t\tNew Command\n"
             "Ctrl+F\t\tFind / Focus Search\n"
+            "Ctrl+H\t\tRun History\n"
             "F5\t\tRefresh\n"
             "Escape\t\tClose Dialog\n"
             "Alt+F4\t\tExit\n\n"
@@ -933,8 +1730,7 @@ class PowerShellApp:
                 messagebox.showwarning("Warning", "Category name cannot be empty.", parent=dlg)
                 return
             # Check for duplicate
-            existing = {c["name"] for c in self.custom_categories}
-            if cat_name in existing:
+            if self._category_index.is_custom(cat_name):
                 messagebox.showwarning("Warning", f"Category '{cat_name}' already exists.", parent=dlg)
                 return
             new_cat = {"name": cat_name}
@@ -942,8 +1738,9 @@ class PowerShellApp:
             if icon:
                 new_cat["icon"] = icon
             self.custom_categories.append(new_cat)
+            self._category_index.add_custom(new_cat)
             self._save_custom_categories()
-            self._rebuild()
+            self._sync_sidebar()
             self._toast(f"Category '{cat_name}' created")
             dlg.destroy()
 
@@ -951,14 +1748,48 @@ class PowerShellApp:
         self._themed_button(btn_frame, "Create", create, "accent").pack(side="left", padx=8)
         self._themed_button(btn_frame, "Cancel", dlg.destroy).pack(side="left", padx=8)
 
+    # -----------------------------------------------------------------------
+    # Scrollback limit dialog
+    # -----------------------------------------------------------------------
+    def edit_output_limit(self):
+        dlg = self._themed_dialog("Scrollback Limit", width=360, height=150)
+        dlg.columnconfigure(1, weight=1)
+
+        self._themed_label(dlg, "Max output lines:", 0)
+        limit_var = tk.StringVar(value=str(self._max_output_lines))
+        limit_entry = self._themed_entry(dlg, limit_var, 0, width=12)
+        limit_entry.focus_set()
+        limit_entry.select_range(0, tk.END)
+
+        btn_frame = tk.Frame(dlg, bg=THEME["bg"])
+        btn_frame.grid(row=1, column=0, columnspan=2, pady=16)
+
+        def save(event=None):
+            try:
+                limit = int(limit_var.get().strip())
+            except ValueError:
+                limit = 0
+            if limit <= 0:
+                messagebox.showwarning("Warning", "Enter a positive number of lines.", parent=dlg)
+                return
+            self.set_output_limit(limit)
+            self._toast(f"Keeping the last {limit} output line(s)")
+            dlg.destroy()
+
+        dlg.bind("<Return>", save)
+        self._themed_button(btn_frame, "Save", save, "accent").pack(side="left", padx=8)
+        self._themed_button(btn_frame, "Cancel", dlg.destroy).pack(side="left", padx=8)
+
     # -----------------------------------------------------------------------
     # Status bar
     # -----------------------------------------------------------------------
     def _update_status(self):
-        total = len(self.commands)
+        total = len(self._category_index)
         shown = self._visible_count
         cat = self._active_category
-        if self._search_mode:
+        if not self._commands_ready:
+            text = "Loading commands\u2026"
+        elif self._search_mode:
             text = f"Showing {shown} of {total} command(s)  —  Search"
         elif shown == total:
             text = f"{total} command(s)"
@@ -966,6 +1797,9 @@ class PowerShellApp:
             text = f"Showing {shown} of {total} command(s)"
         if cat not in ("Home", "Search") and not self._search_mode:
             text += f"  —  {cat}"
+        imp = self._import
+        if imp is not None:
+            text += f"  —  Importing {imp.progress:.0%} ({imp.added} new, {imp.duplicates} duplicate)"
         self._status_left.config(text=text)
 
     # -----------------------------------------------------------------------
@@ -1139,9 +1973,8 @@ class PowerShellApp:
                 new_item["category"] = cat
             if admin_var.get():
                 new_item["admin"] = True
-            self.commands.append(new_item)
-            self.save_commands()
-            self._rebuild()
+            self._store.append(new_item)
+            self._commands_changed(changed=(new_item,))
             self._toast(f"Created '{new_name}'")
             dlg.destroy()
 
@@ -1256,16 +2089,15 @@ class PowerShellApp:
                 item["admin"] = True
             elif "admin" in item:
                 del item["admin"]
-            self.save_commands()
-            self._rebuild()
+            self._store.update(idx)
+            self._commands_changed(dirty={idx}, changed=(item,))
             self._toast(f"Saved '{new_name}'")
             dlg.destroy()
 
         def delete():
             if messagebox.askyesno("Confirm Delete", f"Delete '{item['name']}'?", parent=dlg):
-                self.commands.pop(idx)
-                self.save_commands()
-                self._rebuild()
+                self._store.delete(idx)
+                self._commands_changed(dirty=range(idx, len(self.commands) + 1), removed=(item,))
                 self._toast("Deleted command")
                 dlg.destroy()
 
@@ -1277,160 +2109,424 @@ class PowerShellApp:
     # -----------------------------------------------------------------------
     # Run command
     # -----------------------------------------------------------------------
-    def run_powershell(self, command, admin=False):
+    def run_powershell(self, command, admin=False, name=None):
+        clicked = time.perf_counter()
         mode_label = " (Admin)" if admin else ""
         if not messagebox.askyesno("Confirm", f"Run this command{mode_label}?\n\n{command}"):
             return
+        confirmed = time.perf_counter()
 
-        # Show the output panel and print PS-style prompt
+        # Show the output panel and print PS-style prompt in a new tab
         if not self._output_visible:
             self._output_toggle_var.set(True)
             self.toggle_output()
-        self.output_text.configure(state="normal")
+        tab = self._new_output_tab(name or command, spool=self._spool_output_var.get())
+        tab.command, tab.admin = command, admin
+        tab.clicked, tab.confirmed = clicked, confirmed
+        self._write_output(f"PS {SCRIPT_DIR}> ", "prompt", tab)
         if admin:
-            self.output_text.insert("end", f"\nPS {SCRIPT_DIR}> ", "prompt")
-            self.output_text.insert("end", f"[Admin] {command}\n", "prompt")
+            self._write_output(f"[Admin] {command}\n", "prompt", tab)
         else:
-            self.output_text.insert("end", f"\nPS {SCRIPT_DIR}> ", "prompt")
-            self.output_text.insert("end", command + "\n", "prompt")
-        self.output_text.see("end")
-        self.output_text.configure(state="disabled")
-
-        if admin:
-            self._toast("Launching as Administrator...")
-
-            # Create temp files: a .ps1 script and a .txt for captured output
-            fd_out, output_path = tempfile.mkstemp(suffix=".txt")
-            os.close(fd_out)
-            fd_scr, script_path = tempfile.mkstemp(suffix=".ps1")
-            os.close(fd_scr)
-
-            # Use Start-Process to run the command and redirect raw console output
-            with open(script_path, "w", encoding="utf-8") as f:
-                f.write(f'$Host.UI.RawUI.BufferSize = New-Object Management.Automation.Host.Size(500,9999)\n')
-                f.write(f'{command} 2>&1 | Out-String -Stream | Add-Content -Path "{output_path}" -Encoding utf8\n')
-                f.write(f'Add-Content -Path "{output_path}" -Value "<<<ADMIN_DONE>>>"')
-
-            try:
-                ctypes.windll.shell32.ShellExecuteW(
-                    None, "runas", "powershell",
-                    f'-NoProfile -WindowStyle Hidden -ExecutionPolicy Bypass -File "{script_path}"',
-                    None, 0
-                )
-                self._admin_read_pos = 0
-                self.root.after(500, lambda: self._poll_admin_file(output_path, script_path))
-            except Exception as e:
-                messagebox.showerror("Error", str(e))
-                try:
-                    os.unlink(output_path)
-                    os.unlink(script_path)
-                except OSError:
-                    pass
-            return
-
-        self._toast("Running...")
+            self._write_output(command + "\n", "prompt", tab)
 
         try:
-            proc = subprocess.Popen(
-                ["powershell", "-NoProfile", "-Command", command],
-                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            self.root.after(100, lambda: self._poll_output(proc))
+            run_id = self.engine.start(command, elevated=admin)
         except FileNotFoundError:
+            self._set_tab_status(tab, "failed")
             messagebox.showerror("Error", "PowerShell not found. Is it installed and on PATH?")
+            return
         except Exception as e:
+            self._set_tab_status(tab, "failed")
             messagebox.showerror("Error", str(e))
+            return
+        tab.run_id = run_id
+        self._tabs_by_run[run_id] = tab
+        if self.engine.is_queued(run_id):
+            self._toast(f"Queued #{tab.job_id} ({len(self.engine.pending)} waiting)")
+        elif admin:
+            self._toast("Launching as Administrator...")
+        else:
+            self._toast("Running...")
+        self._update_job_status()
+        self._schedule_drain()
 
-    def _append_output(self, text):
-        """Append text to the output widget, handling \\r and ANSI codes only."""
-        text = _ANSI_RE.sub("", text)
-        text = text.replace('\ufeff', '')  # Strip BOM
-        text = text.replace('\r\n', '\n')
-
-        self.output_text.configure(state="normal")
-        segments = text.split('\r')
-        for i, segment in enumerate(segments):
-            if i > 0:
-                # Bare \r: overwrite the current line
-                line_start = self.output_text.index("end-1c linestart")
-                self.output_text.delete(line_start, "end-1c")
-            if segment:
-                self.output_text.insert("end", segment)
-        self.output_text.see("end")
-        self.output_text.configure(state="disabled")
-
-    def _poll_output(self, proc):
-        ret = proc.poll()
-        chunk = b""
-        if proc.stdout:
+    # -----------------------------------------------------------------------
+    # Output tabs
+    # -----------------------------------------------------------------------
+    def _new_output_tab(self, name, spool=False):
+        tab = None
+        if spool:
             try:
-                if hasattr(proc.stdout, "read1"):
-                    chunk = proc.stdout.read1(4096)
-                else:
-                    chunk = proc.stdout.read(4096) if ret is not None else b""
-            except Exception:
-                pass
-        if chunk:
-            text = chunk.decode("utf-8", errors="replace")
-            self._append_output(text)
+                tab = SpoolTab(self.output_notebook, self._next_job_id, name, self._config.get("spool_dir") or None)
+            except OSError as e:
+                messagebox.showwarning("Warning", f"Could not create a spool file; output stays in the panel.\n\n{e}")
+        if tab is None:
+            tab = OutputTab(self.output_notebook, self._next_job_id, name)
+        self._next_job_id += 1
+        self._output_tabs.append(tab)
+        self.output_notebook.add(tab.frame, text=tab.title)
+        self.output_notebook.select(tab.frame)
+
+        # Keep the tab strip bounded: drop the oldest finished runs
+        finished = [t for t in self._output_tabs if not t.active]
+        excess = len(self._output_tabs) - MAX_OUTPUT_TABS
+        for old in finished[:max(0, excess)]:
+            self._remove_output_tab(old)
+        return tab
+
+    def _remove_output_tab(self, tab):
+        self._dirty_tabs.discard(tab)
+        self._output_tabs.remove(tab)
+        self.output_notebook.forget(tab.frame)
+        tab.frame.destroy()
+        tab.close()
+
+    def _current_output_tab(self):
+        current = self.output_notebook.select()
+        for tab in self._output_tabs:
+            if str(tab.frame) == current:
+                return tab
+        return None
+
+    def _set_tab_status(self, tab, status):
+        tab.status = status
+        if tab in self._output_tabs:
+            self.output_notebook.tab(tab.frame, text=tab.title)
+        self._update_job_status()
+
+    def _update_job_status(self):
+        """Status bar entry listing every queued or running job."""
+        active = [t for t in self._output_tabs if t.active]
+        parts = [f"#{t.job_id} {OutputTab.GLYPHS[t.status]}" for t in active[:6]]
+        if len(active) > 6:
+            parts.append(f"+{len(active) - 6}")
+        self._status_jobs.config(text="   ".join(parts))
+
+    def _output_to_end(self):
+        tab = self._current_output_tab()
+        if tab:
+            tab.jump_to_end()
+
+    def _find_in_output(self, forward):
+        tab = self._current_output_tab()
+        needle = self._output_find_var.get()
+        if tab is None or not needle:
+            return "break"
+        if not tab.find(needle, forward):
+            self._toast(f"'{needle}' not found")
+        return "break"
+
+    def save_output(self):
+        tab = self._current_output_tab()
+        if tab is None:
+            self._toast("No output to save")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            tab.save(path)
+            self._toast(f"Saved output of #{tab.job_id}")
+        except OSError as e:
+            messagebox.showerror("Save Error", f"Could not write file:\n{e}")
+
+    def _stop_current_run(self):
+        tab = self._current_output_tab()
+        if tab is None or not tab.active or tab.run_id is None:
+            return
+        self.engine.cancel(tab.run_id)
+        self._schedule_drain()
+
+    def _close_output_tab(self):
+        tab = self._current_output_tab()
+        if tab is None:
+            return
+        if tab.active:
+            if not messagebox.askyesno("Confirm", f"Stop #{tab.job_id} and close its tab?"):
+                return
+            self.engine.cancel(tab.run_id)
+            self._tabs_by_run.pop(tab.run_id, None)
+            self.engine.timings.pop(tab.run_id, None)
+            # Its exit event will find no tab; close the capture here
+            self._end_record(tab, None)
+            tab.status = "failed"
+        self._remove_output_tab(tab)
+        self._update_job_status()
+
+    def _append_output(self, output, tab):
+        """Queue process output for a tab.  The engine's OutputDecoder has
+        already decoded it into text or a flat ``[text, colour tag, ...]``
+        list, without other escape sequences, BOMs or \\r\\n."""
+        t0 = time.perf_counter()
+        if isinstance(output, str):
+            self._write_output(output, None, tab)
+        else:
+            tab.write_runs(output)
+            self._mark_dirty(tab)
+        tab.append_time += time.perf_counter() - t0
+
+    def _write_output(self, text, tag, tab):
+        """Add text to the tab's frame batch (bare \\r overwrites are folded
+        there) or, for a SpoolTab, to its spool."""
+        tab.write(text, tag)
+        self._mark_dirty(tab)
+
+    def _mark_dirty(self, tab):
+        self._dirty_tabs.add(tab)
+        if self._flush_after_id is None:
+            self._flush_after_id = self.root.after(FRAME_MS, self._flush_output)
+
+    def _flush_output(self):
+        """Apply every dirty tab's batch to its widget."""
+        if self._flush_after_id is not None:
+            self.root.after_cancel(self._flush_after_id)
+            self._flush_after_id = None
+        for tab in self._dirty_tabs:
+            self._flush_tab(tab)
+        self._dirty_tabs.clear()
+
+    def _flush_tab(self, tab):
+        t0 = time.perf_counter()
+        tab.flush(self._max_output_lines)
+        tab.append_time += time.perf_counter() - t0
+
+    def _schedule_drain(self):
+        if self._drain_after_id is None:
+            self._drain_after_id = self.root.after(FRAME_MS, self._drain_output)
+
+    def _drain_output(self):
+        """Per-frame pump: route everything the reader threads have queued."""
+        self._drain_after_id = None
+        for kind, run_id, payload in self.engine.drain():
+            tab = self._tabs_by_run.get(run_id)
+            if tab is None:
+                continue
+            if kind == EV_OUTPUT:
+                if tab.record:
+                    tab.record.write(payload if isinstance(payload, str) else "".join(payload[0::2]))
+                self._append_output(payload, tab)
+            elif kind == EV_START:
+                self._set_tab_status(tab, "running")
+                self._begin_record(tab)
+            elif kind == EV_EXIT:
+                del self._tabs_by_run[run_id]
+                self._end_record(tab, payload)
+                self._record_timing(tab, payload)
+                self._finish_run(tab, payload)
+            elif kind == EV_ERROR:
+                del self._tabs_by_run[run_id]
+                self._end_record(tab, None)
+                self._record_timing(tab, None)
+                self._write_output(f"\n{payload}\n", "error", tab)
+                self._set_tab_status(tab, "failed")
+        self._flush_output()
+        if self.engine.busy():
+            self._schedule_drain()
+
+    def _finish_run(self, tab, ret):
         if ret is None:
-            self.root.after(150, lambda: self._poll_output(proc))
+            tag, status_text = "warning", "Cancelled."
+        elif ret == 0:
+            tag, status_text = "success", "Command completed successfully."
         else:
-            if proc.stdout:
-                try:
-                    remaining = proc.stdout.read()
-                    if remaining:
-                        text = remaining.decode("utf-8", errors="replace")
-                        self._append_output(text)
-                except Exception:
-                    pass
-            self.output_text.configure(state="normal")
-            tag = "success" if ret == 0 else "error"
-            status_text = "Command completed successfully." if ret == 0 else f"Process exited with code {ret}"
-            self.output_text.insert("end", f"\n{status_text}\n", tag)
-            self.output_text.insert("end", f"PS {SCRIPT_DIR}> ", "prompt")
-            self.output_text.see("end")
-            self.output_text.configure(state="disabled")
-            self._toast("Command finished")
-
-    def _poll_admin_file(self, output_path, script_path):
-        """Poll the temp output file written by an elevated PowerShell process."""
-        done = False
+            tag, status_text = "error", f"Process exited with code {ret}"
+        self._write_output(f"\n{status_text}\n", tag, tab)
+        self._write_output(f"PS {SCRIPT_DIR}> ", "prompt", tab)
+        self._set_tab_status(tab, "done" if ret == 0 else "failed")
+        self._toast(f"#{tab.job_id} finished")
+
+    def _clear_output(self):
+        tab = self._current_output_tab()
+        if tab:
+            self._dirty_tabs.discard(tab)
+            tab.clear()
+
+    # -----------------------------------------------------------------------
+    # Run history
+    # -----------------------------------------------------------------------
+    def _create_history(self):
+        cfg = self._config
         try:
-            with open(output_path, "r", encoding="utf-8", errors="replace") as f:
-                f.seek(self._admin_read_pos)
-                new_data = f.read()
-                if new_data:
-                    self._admin_read_pos += len(new_data.encode("utf-8"))
-                    if "<<<ADMIN_DONE>>>" in new_data:
-                        new_data = new_data.replace("<<<ADMIN_DONE>>>", "")
-                        done = True
-                    self._append_output(new_data)
-        except FileNotFoundError:
-            pass
-        except Exception:
-            pass
+            days = float(cfg.get("history_max_days", DEFAULT_HISTORY_MAX_DAYS))
+            max_mb = float(cfg.get("history_max_mb", DEFAULT_HISTORY_MAX_MB))
+        except (TypeError, ValueError):
+            days, max_mb = DEFAULT_HISTORY_MAX_DAYS, DEFAULT_HISTORY_MAX_MB
+        return RunHistory(HISTORY_DIR, days, int(max_mb * 1024 * 1024))
+
+    def _begin_record(self, tab):
+        try:
+            tab.record = self._history.begin(tab.name, tab.command, tab.admin)
+        except OSError:
+            tab.record = None
 
-        if done:
-            self.output_text.configure(state="normal")
-            self.output_text.insert("end", "\nCommand completed (Admin).\n", "success")
-            self.output_text.insert("end", f"PS {SCRIPT_DIR}> ", "prompt")
-            self.output_text.see("end")
-            self.output_text.configure(state="disabled")
-            self._toast("Command finished")
+    def _end_record(self, tab, exit_code):
+        record, tab.record = tab.record, None
+        if record:
             try:
-                os.unlink(output_path)
-                os.unlink(script_path)
+                record.finish(exit_code)
             except OSError:
                 pass
-        else:
-            self.root.after(300, lambda: self._poll_admin_file(output_path, script_path))
 
-    def _clear_output(self):
-        self.output_text.configure(state="normal")
-        self.output_text.delete("1.0", "end")
-        self.output_text.configure(state="disabled")
+    def _record_timing(self, tab, exit_code):
+        """Turn the run's stamps into milliseconds since the user confirmed."""
+        timing = self.engine.timings.pop(tab.run_id, None)
+        if timing is None or tab.confirmed is None:
+            return
+        if tab in self._dirty_tabs:
+            # Draw the last frame now so append_ms covers all of the output
+            self._dirty_tabs.discard(tab)
+            self._flush_tab(tab)
+        base = tab.confirmed
+
+        def ms(t, since=base):
+            return None if t is None or since is None else round((t - since) * 1000, 1)
+
+        span = (timing.last_byte or 0) - (timing.first_byte or 0)
+        entry = {
+            "name": tab.name,
+            "command": tab.command,
+            "admin": tab.admin,
+            "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "exit": exit_code,
+            "confirm_ms": ms(tab.confirmed, tab.clicked),
+            "queued_ms": ms(timing.spawn_start),
+            "spawn_ms": ms(timing.spawned, timing.spawn_start),
+            "first_byte_ms": ms(timing.first_byte),
+            "last_byte_ms": ms(timing.last_byte),
+            "exit_ms": ms(timing.exited),
+            "bytes": timing.bytes,
+            "bytes_per_s": round(timing.bytes / span) if span > 0 else None,
+            "append_ms": round(tab.append_time * 1000, 1),
+        }
+        self._run_timings.append(entry)
+
+        parts = [f"#{tab.job_id}"]
+        if entry["spawn_ms"] is not None:
+            parts.append(f"spawn {entry['spawn_ms']:.0f} ms")
+        if entry["first_byte_ms"] is not None:
+            parts.append(f"first byte {entry['first_byte_ms']:.0f} ms")
+        if entry["exit_ms"] is not None:
+            parts.append(f"exit {entry['exit_ms'] / 1000:.2f} s")
+        if entry["bytes_per_s"]:
+            parts.append(f"{_format_bytes(entry['bytes_per_s'])}/s")
+        parts.append(f"append {entry['append_ms']:.0f} ms")
+        self._status_timing.config(text="  \u00B7  ".join(parts))
+
+    def export_run_timings(self):
+        if not self._run_timings and not self._startup_timing:
+            self._toast("No run timings yet")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".jsonl", filetypes=[("JSON Lines", "*.jsonl"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                if self._startup_timing:
+                    f.write(json.dumps({"startup": self._startup_timing}) + "\n")
+                for entry in self._run_timings:
+                    f.write(json.dumps(entry) + "\n")
+            self._toast(f"Exported {len(self._run_timings)} run timing(s)")
+        except IOError as e:
+            messagebox.showerror("Export Error", f"Could not write file:\n{e}")
+
+    def show_history(self):
+        dlg = self._themed_dialog("Run History", width=760, height=540)
+        dlg.columnconfigure(1, weight=1)
+        dlg.rowconfigure(2, weight=1)
+
+        self._themed_label(dlg, "Search:", 0)
+        search_var = tk.StringVar()
+        search_entry = self._themed_entry(dlg, search_var, 0)
+        search_entry.focus_set()
+
+        columns = (("start", "Started", 140), ("name", "Name", 250), ("exit", "Exit", 60),
+                   ("duration", "Duration", 80), ("bytes", "Output", 80))
+        tree = ttk.Treeview(dlg, columns=[c[0] for c in columns], show="headings", height=8)
+        for key, title, width in columns:
+            tree.heading(key, text=title)
+            tree.column(key, width=width, anchor="w" if key == "name" else "center", stretch=key == "name")
+        tree.grid(row=1, column=0, columnspan=2, padx=16, pady=(8, 4), sticky="nsew")
+
+        preview = tk.Text(
+            dlg, bg=THEME["output_bg"], fg=THEME["output_fg"], font=FONTS["output"],
+            relief="flat", height=10, wrap="none", padx=8, pady=6, state="disabled"
+        )
+        preview.grid(row=2, column=0, columnspan=2, padx=16, pady=4, sticky="nsew")
+
+        summary = tk.Label(dlg, font=FONTS["small"], bg=THEME["bg"], fg=THEME["text_muted"], anchor="w")
+        summary.grid(row=3, column=0, columnspan=2, padx=16, sticky="ew")
+
+        shown = {}  # tree item -> history entry
+
+        def fill(*args):
+            tree.delete(*tree.get_children())
+            shown.clear()
+            for entry in self._history.search(search_var.get().strip()):
+                code = entry.get("exit")
+                duration = entry.get("duration")
+                iid = tree.insert("", "end", values=(
+                    time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.get("start", 0))),
+                    entry.get("name", ""),
+                    "\u2014" if code is None else code,
+                    "" if duration is None else f"{duration:.1f}s",
+                    _format_bytes(entry.get("bytes", 0)) + ("+" if entry.get("truncated") else ""),
+                ))
+                shown[iid] = entry
+            summary.configure(text=f"{len(shown)} of {len(self._history.entries)} run(s)  —  "
+                                   f"{_format_bytes(self._history.total_bytes)} on disk")
+            show_selected()
+
+        def selected():
+            return [shown[iid] for iid in tree.selection() if iid in shown]
+
+        def show_selected(event=None):
+            entries = selected()
+            preview.configure(state="normal")
+            preview.delete("1.0", "end")
+            if entries:
+                entry = entries[0]
+                text = self._history.read_output(entry).decode("utf-8", errors="replace")
+                preview.insert("end", f"PS> {entry.get('command', '')}\n", "", sanitize(text), "")
+            preview.configure(state="disabled")
+
+        def open_in_tab():
+            for entry in selected():
+                tab = self._new_output_tab(f"{entry.get('name', '')} (history)")
+                self._write_output(f"PS {SCRIPT_DIR}> {entry.get('command', '')}\n", "prompt", tab)
+                self._append_output(sanitize(self._history.read_output(entry).decode("utf-8", errors="replace")), tab)
+                self._set_tab_status(tab, "done" if entry.get("exit") == 0 else "failed")
+            if not self._output_visible:
+                self._output_toggle_var.set(True)
+                self.toggle_output()
+
+        def delete():
+            entries = selected()
+            if entries and messagebox.askyesno("Confirm Delete", f"Delete {len(entries)} run(s) from history?", parent=dlg):
+                self._history.delete(entries)
+                fill()
+
+        def prune():
+            removed = self._history.prune()
+            fill()
+            self._toast(f"Pruned {removed} run(s)")
+
+        def clear():
+            if messagebox.askyesno("Confirm", "Delete the whole run history?", parent=dlg):
+                self._history.clear()
+                fill()
+
+        search_var.trace_add("write", fill)
+        tree.bind("<<TreeviewSelect>>", show_selected)
+        tree.bind("<Double-1>", lambda e: open_in_tab())
+
+        btn_frame = tk.Frame(dlg, bg=THEME["bg"])
+        btn_frame.grid(row=4, column=0, columnspan=2, pady=12)
+        self._themed_button(btn_frame, "Open in Tab", open_in_tab, "accent").pack(side="left", padx=6)
+        self._themed_button(btn_frame, "Delete", delete).pack(side="left", padx=6)
+        self._themed_button(btn_frame, "Prune", prune).pack(side="left", padx=6)
+        self._themed_button(btn_frame, "Clear All", clear, "danger").pack(side="left", padx=6)
+        self._themed_button(btn_frame, "Close", dlg.destroy).pack(side="left", padx=6)
+        fill()
 
     # -----------------------------------------------------------------------
     # Right-click context menu
@@ -1438,7 +2534,7 @@ class PowerShellApp:
     def _show_card_menu(self, event, idx):
         menu = tk.Menu(self.root, tearoff=0, font=FONTS["small"])
         item = self.commands[idx]
-        menu.add_command(label="  Run", command=lambda: self.run_powershell(item["cmd"], item.get("admin", False)))
+        menu.add_command(label="  Run", command=lambda: self.run_powershell(item["cmd"], item.get("admin", False), item["name"]))
         menu.add_command(label="  Edit", command=lambda: self.edit_command(idx))
         menu.add_command(label="  Duplicate", command=lambda: self._duplicate_command(idx))
         menu.add_separator()
@@ -1449,17 +2545,15 @@ class PowerShellApp:
         item = self.commands[idx]
         copy = dict(item)
         copy["name"] = item["name"] + " (copy)"
-        self.commands.insert(idx + 1, copy)
-        self.save_commands()
-        self._rebuild()
+        self._store.insert(idx + 1, copy)
+        self._commands_changed(dirty=range(idx + 1, len(self.commands)), changed=(copy,))
         self._toast(f"Duplicated '{item['name']}'")
 
     def _delete_command(self, idx):
         name = self.commands[idx]["name"]
         if messagebox.askyesno("Confirm Delete", f"Delete '{name}'?"):
-            self.commands.pop(idx)
-            self.save_commands()
-            self._rebuild()
+            item = self._store.delete(idx)
+            self._commands_changed(dirty=range(idx, len(self.commands) + 1), removed=(item,))
             self._toast(f"Deleted '{name}'")
 
     # -----------------------------------------------------------------------
@@ -1478,177 +2572,225 @@ class PowerShellApp:
     # Image loading
     # -----------------------------------------------------------------------
     def _load_thumbnail(self, path):
-        if not HAS_PIL or not path or not os.path.isfile(path):
+        """Decode the thumbnail for *path*; runs on a worker thread.
+
+        Returns a PIL image (or None).  The PhotoImage is made by the caller
+        on the Tk thread.
+        """
+        if not path or not _have_pil() or not os.path.isfile(path):
             return None
         try:
-            img = Image.open(path)
-            # Crop to aspect ratio then resize for uniform cards
-            target_w, target_h = CARD_IMAGE_SIZE
-            img_ratio = img.width / img.height
-            target_ratio = target_w / target_h
-            if img_ratio > target_ratio:
-                new_h = img.height
-                new_w = int(new_h * target_ratio)
-                left = (img.width - new_w) // 2
-                img = img.crop((left, 0, left + new_w, new_h))
-            else:
-                new_w = img.width
-                new_h = int(new_w / target_ratio)
-                top = (img.height - new_h) // 2
-                img = img.crop((0, top, new_w, top + new_h))
-            img = img.resize(CARD_IMAGE_SIZE, Image.LANCZOS)
-            return ImageTk.PhotoImage(img)
+            return self._thumbnails.load(path)
         except Exception:
             return None
 
-    # -----------------------------------------------------------------------
-    # Card building
-    # -----------------------------------------------------------------------
-    def _build_cards(self):
-        for frame, _ in self._card_widgets:
-            frame.destroy()
-        self._card_widgets = []
-        self._image_refs = []
-        self._card_tooltips = []
-
-        for idx, item in enumerate(self.commands):
-            card = tk.Frame(
-                self.buttons_frame, bg=THEME["card_bg"], bd=0,
-                highlightthickness=1, highlightbackground=THEME["card_border"],
-                padx=12, pady=10
-            )
-
-            # Collect non-button children to recolor on hover
-            hover_targets = []
-
-            # Image
-            photo = self._load_thumbnail(item.get("image"))
+    def _request_thumbnail(self, path):
+        if path in self._thumb_futures:
+            return
+        if self._thumb_pool is None:
+            self._thumb_pool = ThreadPoolExecutor(max_workers=THUMB_WORKERS, thread_name_prefix="thumb")
+        gen = self._thumb_generation
+        future = self._thumb_pool.submit(self._load_thumbnail, path)
+        self._thumb_futures[path] = future
+        future.add_done_callback(lambda f: self._thumb_done.put((gen, path, f)))
+        if self._thumb_after_id is None:
+            self._thumb_after_id = self.root.after(FRAME_MS, self._drain_thumbnails)
+
+    def _cancel_thumbnails(self, keep=()):
+        """Cancel queued decodes whose path is not in *keep*."""
+        for path in [p for p in self._thumb_futures if p not in keep]:
+            if self._thumb_futures[path].cancel():
+                del self._thumb_futures[path]
+
+    def _drain_thumbnails(self):
+        """Turn finished decodes into PhotoImages and show them."""
+        self._thumb_after_id = None
+        while True:
+            try:
+                gen, path, future = self._thumb_done.get_nowait()
+            except queue.Empty:
+                break
+            if gen != self._thumb_generation:
+                continue
+            if self._thumb_futures.get(path) is future:
+                del self._thumb_futures[path]
+            if future.cancelled():
+                continue
+            img = future.result()
+            photo = ImageTk.PhotoImage(img) if img else None
+            cache = self._thumb_cache
+            cache[path] = photo
+            # Slots hold their own reference, so eviction never blanks a card
+            while len(cache) > THUMB_PHOTOS_PER_SLOT * max(1, len(self._card_slots)):
+                cache.popitem(last=False)
             if photo:
-                self._image_refs.append(photo)
-                lbl_img = tk.Label(card, image=photo, bg=THEME["card_bg"], bd=0)
-            else:
-                lbl_img = tk.Label(
-                    card, text="\U0001F4BB", font=(FONT_FAMILY, 28),
-                    bg=THEME["accent_light"], fg=THEME["accent"],
-                    width=12, height=3
-                )
-            lbl_img.pack(pady=(0, 8), fill="x")
-            lbl_img.bind("<Button-3>", lambda e, i=idx: self._show_card_menu(e, i))
-            hover_targets.append(lbl_img)
-
-            # Name (truncated if long)
-            display_name = item["name"]
-            if len(display_name) > CARD_MAX_NAME:
-                display_name = display_name[:CARD_MAX_NAME - 1] + "\u2026"
-            name_lbl = tk.Label(card, text=display_name, font=FONTS["card_name"], bg=THEME["card_bg"], fg=THEME["text_primary"])
-            name_lbl.pack()
-            hover_targets.append(name_lbl)
-
-            # Command preview
-            cmd_preview = item["cmd"]
-            if len(cmd_preview) > 35:
-                cmd_preview = cmd_preview[:34] + "\u2026"
-            cmd_lbl = tk.Label(card, text=cmd_preview, font=FONTS["card_cmd"], bg=THEME["card_bg"], fg=THEME["text_muted"])
-            cmd_lbl.pack(pady=(1, 3))
-            hover_targets.append(cmd_lbl)
-
-            # Category badge
-            cat = item.get("category", "")
-            if cat:
-                cat_lbl = tk.Label(
-                    card, text=f" {cat} ", font=FONTS["badge"],
-                    bg=THEME["badge_bg"], fg=THEME["badge_fg"], padx=6, pady=1
-                )
-                cat_lbl.pack(pady=(0, 4))
-
-            # Admin badge
-            is_admin = item.get("admin", False)
-            if is_admin:
-                admin_lbl = tk.Label(
-                    card, text=" \U0001F6E1 Admin ", font=FONTS["badge"],
-                    bg="#FEF3C7", fg="#92400E", padx=6, pady=1
-                )
-                admin_lbl.pack(pady=(0, 4))
-
-            # Buttons row
-            btn_row = tk.Frame(card, bg=THEME["card_bg"])
-            btn_row.pack(pady=(6, 0))
-            hover_targets.append(btn_row)
-
-            run_btn = self._themed_button(btn_row, "\u25B6  Run", lambda c=item["cmd"], a=is_admin: self.run_powershell(c, a), "accent")
-            run_btn.pack(side="left", padx=3)
-
-            edit_btn = self._themed_button(btn_row, "Edit", lambda i=idx: self.edit_command(i))
-            edit_btn.pack(side="left", padx=3)
-
-            # Hover effect — only recolor non-button labels
-            def on_enter(e, c=card, targets=hover_targets):
-                c.configure(highlightbackground=THEME["card_hover_border"], bg=THEME["card_hover"])
-                for t in targets:
-                    try:
-                        if not isinstance(t, tk.Button):
-                            t.configure(bg=THEME["card_hover"])
-                    except tk.TclError:
-                        pass
-
-            def on_leave(e, c=card, targets=hover_targets):
-                c.configure(highlightbackground=THEME["card_border"], bg=THEME["card_bg"])
-                for t in targets:
-                    try:
-                        if not isinstance(t, tk.Button):
-                            t.configure(bg=THEME["card_bg"])
-                    except tk.TclError:
-                        pass
-
-            card.bind("<Enter>", on_enter)
-            card.bind("<Leave>", on_leave)
-            card.bind("<Button-3>", lambda e, i=idx: self._show_card_menu(e, i))
-
-            # Drag-and-drop
-            card.bind("<ButtonPress-1>", lambda e, i=idx: self._drag_start(i))
-            card.bind("<B1-Motion>", self._drag_motion)
-            card.bind("<ButtonRelease-1>", self._drag_end)
-
-            # Tooltip with full command
-            tt = ToolTip(card, item["cmd"])
-            self._card_tooltips.append(tt)
-
-            self._card_widgets.append((card, idx))
+                for slot in self._card_slots:
+                    if slot.idx is not None and slot.image_path == path:
+                        slot.set_photo(photo)
+        if self._thumb_futures:
+            self._thumb_after_id = self.root.after(FRAME_MS, self._drain_thumbnails)
 
     # -----------------------------------------------------------------------
-    # Card grid layout
+    # Card building (virtualized)
     # -----------------------------------------------------------------------
-    def refresh_buttons(self, filter_text=""):
-        self._empty_frame.grid_forget()
-        for frame, _ in self._card_widgets:
-            frame.grid_forget()
+    def _ensure_card_pool(self, viewport_height, limit=None):
+        """Grow the slot pool to cover the viewport plus one spare row.
+
+        At most *limit* slots are made per call; returns True once the pool
+        is complete.
+        """
+        rows = -(-max(1, viewport_height) // CARD_PITCH) + 1
+        made = 0
+        while len(self._card_slots) < rows * COLUMNS:
+            if limit is not None and made >= limit:
+                return False
+            slot = CardSlot(self, self.canvas)
+            if self._col_width:
+                self.canvas.itemconfigure(slot.window, width=self._col_width - CARD_GAP)
+            self._card_slots.append(slot)
+            made += 1
+        return True
+
+    def _thumbnail_for(self, path):
+        """Return the cached PhotoImage for *path*, or None while it loads."""
+        if not path:
+            return None
+        cache = self._thumb_cache
+        if path in cache:
+            cache.move_to_end(path)
+            return cache[path]
+        self._request_thumbnail(path)
+        return None
 
-        row = 0
-        col = 0
-        count = 0
-        for frame, idx in self._card_widgets:
-            item = self.commands[idx]
-            if self._active_category not in ("Home", "Search"):
-                if item.get("category", "") != self._active_category:
-                    continue
-            if filter_text and filter_text not in item["name"].lower():
+    def _build_cards(self):
+        """Invalidate bound card data; slots are re-bound on the next layout."""
+        self._thumb_cache.clear()
+        self._cancel_thumbnails()
+        self._thumb_futures.clear()
+        self._thumb_generation += 1
+        self._rebind_all = True
+
+    def _layout_cards(self, force=False, dirty=(), scrolled=False):
+        """Position the slot pool over the rows in view and bind their data.
+
+        Slots already showing the right command are left alone unless *force*
+        is set or their index is in *dirty*.  With *scrolled* nothing happens
+        until the first row in view actually changes.
+        """
+        first_row = max(0, int(self.canvas.canvasy(0) // CARD_PITCH))
+        if scrolled and first_row == self._first_row:
+            return
+        self._first_row = first_row
+        force = force or self._rebind_all
+        self._rebind_all = False
+        start = first_row * COLUMNS
+        visible = self._visible_indices
+        for k, slot in enumerate(self._card_slots):
+            pos = start + k
+            if pos >= len(visible):
+                if slot.idx is not None:
+                    self.canvas.itemconfigure(slot.window, state="hidden")
+                    slot.idx = slot.pos = None
                 continue
+            idx = visible[pos]
+            was_hidden = slot.idx is None
+            if slot.pos != pos or force:
+                row, col = divmod(pos, COLUMNS)
+                self.canvas.coords(slot.window, col * self._col_width + CARD_GAP // 2, row * CARD_PITCH + CARD_GAP // 2)
+                slot.pos = pos
+            if slot.idx != idx or force or idx in dirty:
+                item = self.commands[idx]
+                slot.bind(idx, item, self._thumbnail_for(item.get("image")))
+            if was_hidden:
+                self.canvas.itemconfigure(slot.window, state="normal")
+        # Slots are walked top to bottom, so visible cards were queued first;
+        # drop anything queued for cards that have since scrolled away
+        if self._thumb_futures:
+            self._cancel_thumbnails({slot.image_path for slot in self._card_slots if slot.idx is not None})
 
-            frame.grid(row=row, column=col, padx=8, pady=8, sticky="nsew")
-            self.buttons_frame.columnconfigure(col, weight=1)
-            col += 1
-            count += 1
-            if col >= COLUMNS:
-                col = 0
-                row += 1
-
-        self._visible_count = count
-
-        if count == 0:
-            self._empty_frame.grid(row=0, column=0, columnspan=COLUMNS, sticky="nsew")
-
+    # -----------------------------------------------------------------------
+    # Card grid filtering
+    # -----------------------------------------------------------------------
+    def _start_search_index(self):
+        """Index the commands for search a slice per idle slot, so neither
+        startup nor the first search waits for the whole list."""
+        self._search_index = None
+        self._search_building = index = SearchIndex()
+        self._search_pending = {id(item): item for item in self.commands}
+        self.root.after_idle(self._build_search_slice, index)
+
+    def _build_search_slice(self, index):
+        if index is not self._search_building:
+            return  # superseded by a reload
+        pending = self._search_pending
+        index.extend([pending.popitem()[1] for _ in range(min(SEARCH_INDEX_SLICE, len(pending)))])
+        if pending:
+            self.root.after_idle(self._build_search_slice, index)
+            return
+        self._search_index = index
+        self._search_building = self._search_pending = None
+        if self._search_mode and self.search_var.get():
+            self.refresh_buttons(self.search_var.get().lower())  # rank what was shown unranked
+
+    def _get_search_index(self):
+        """The search index, finishing any build in progress right away."""
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.commands)
+            self._search_building = self._search_pending = None
+        return self._search_index
+
+    def _position_of(self):
+        """``id(item) -> list index``, rebuilt after the list changes."""
+        if self._positions is None:
+            self._positions = {id(item): idx for idx, item in enumerate(self.commands)}
+        return self._positions.__getitem__
+
+    def refresh_buttons(self, filter_text="", dirty=(), complete=False):
+        if self._rank_after_id is not None:
+            self.root.after_cancel(self._rank_after_id)
+            self._rank_after_id = None
+        cat = self._active_category if self._active_category not in ("Home", "Search") else None
+        commands = self.commands
+        if filter_text and self._search_index is None:
+            # Index still being built: plain name match in list order until then
+            visible = [idx for idx, item in enumerate(commands) if filter_text in item["name"].lower()
+                       and (cat is None or item.get("category", "") == cat)]
+        elif filter_text:
+            # Best matches first, ties in the user's order.  A broad query
+            # paints its first screens now and ranks the rest a frame later.
+            position = self._position_of()
+            index = self._search_index
+            ranked = None
+            if cat is None and not complete:
+                ranked = index.top(filter_text, position, SEARCH_RANKED_FIRST, map(id, commands))
+            if ranked is None:
+                ranked = index.ranked(filter_text, position)
+            elif len(ranked) == SEARCH_RANKED_FIRST:
+                self._rank_after_id = self.root.after(FRAME_MS, self._finish_ranking, filter_text)
+            visible = [position(doc) for doc in ranked]
+            if cat is not None:
+                visible = [idx for idx in visible if commands[idx].get("category", "") == cat]
+        elif cat is not None:
+            visible = [idx for idx, item in enumerate(commands) if item.get("category", "") == cat]
+        else:
+            visible = list(range(len(commands)))
+
+        self._visible_indices = visible
+        self._visible_count = len(visible)
+        self.canvas.itemconfigure(self._empty_win, state="hidden" if visible else "normal")
+        # A new filter starts at the top; a refresh of the same view stays put
+        view = (self._active_category, self._search_mode, filter_text)
+        if view != self._grid_view:
+            self._grid_view = view
+            self.canvas.yview_moveto(0)
+        self._sync_scroll()
+        self._layout_cards(dirty=dirty)
         self._update_status()
 
+    def _finish_ranking(self, filter_text):
+        self._rank_after_id = None
+        self.refresh_buttons(filter_text, complete=True)
+
     # -----------------------------------------------------------------------
     # Drag and drop
     # -----------------------------------------------------------------------
@@ -1664,16 +2806,16 @@ class PowerShellApp:
             return
         widget = event.widget.winfo_containing(event.x_root, event.y_root)
         target_idx = None
-        for frame, idx in self._card_widgets:
-            if widget is frame or (widget is not None and str(widget).startswith(str(frame))):
-                target_idx = idx
+        for slot in self._card_slots:
+            frame = slot.frame
+            if slot.idx is not None and (widget is frame or (widget is not None and str(widget).startswith(str(frame) + "."))):
+                target_idx = slot.idx
                 break
         if target_idx is not None and target_idx != src:
-            item = self.commands.pop(src)
-            self.commands.insert(target_idx, item)
-            self.save_commands()
-            self._build_cards()
-            self.refresh_buttons(self.search_var.get().lower())
+            self._store.move(src, target_idx)
+            self._positions = None
+            lo, hi = min(src, target_idx), max(src, target_idx)
+            self.refresh_buttons(self.search_var.get().lower(), dirty=range(lo, hi + 1))
             self._toast("Reordered")
         self._drag_data["idx"] = None
 
@@ -1681,6 +2823,13 @@ class PowerShellApp:
     # System tray
     # -----------------------------------------------------------------------
     def _setup_tray(self):
+        """Import pystray and run the tray icon; runs on its own thread."""
+        try:
+            from pystray import Icon as TrayIcon, Menu as TrayMenu, MenuItem as TrayMenuItem
+        except ImportError:
+            return
+        if not _have_pil():
+            return
         try:
             ico_path = os.path.join(SCRIPT_DIR, "Powershell_custom.ico")
             if os.path.isfile(ico_path):
@@ -1692,10 +2841,11 @@ class PowerShellApp:
                 TrayMenuItem("Show", self._tray_show),
                 TrayMenuItem("Exit", self._tray_exit),
             )
-            self._tray_icon = TrayIcon("PSRunner", img, "PowerShell Command Runner", menu)
-            threading.Thread(target=self._tray_icon.run, daemon=True).start()
+            icon = TrayIcon("PSRunner", img, "PowerShell Command Runner", menu)
         except Exception:
-            self._tray_icon = None
+            return
+        self._tray_icon = icon
+        icon.run()
 
     def _tray_show(self, icon=None, menu_item=None):
         self.root.after(0, self.root.deiconify)
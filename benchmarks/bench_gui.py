@@ -0,0 +1,350 @@
+"""GUI benchmark for PowerShell Command Runner.
+
+Generates synthetic command libraries (100, 1k, 10k and 100k commands by
+default, a fraction of them with images) and times the card grid, search,
+sidebar and drag-and-drop paths against each one.  Every size runs in a fresh
+interpreter, so import and startup costs are measured too.  For each
+operation the report records wall time (including the Tk redraw it queued)
+and how many Tk widgets it created and destroyed.
+
+    python benchmarks/bench_gui.py
+    python benchmarks/bench_gui.py --sizes 100,10000 --repeat 5 --out report.json
+
+On Linux without a display an Xvfb server is started for the run (Xvfb must
+be installed); elsewhere the real display is used.  The report is JSON, with
+one entry per library size.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+DEFAULT_OUT = os.path.join(BENCH_DIR, "report.json")
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+DEFAULT_IMAGE_RATIO = 0.2
+DEFAULT_REPEAT = 3
+# Distinct image files behind the commands that have one; thumbnails are
+# keyed by path, so this bounds decode work rather than library size
+IMAGE_FILES = 40
+SCREEN = "1280x1024x24"
+WINDOW = "1100x760"
+READY_TIMEOUT = 120   # seconds to wait for staged startup or thumbnails
+CHILD_TIMEOUT = 1800
+
+VERBS = ("Get", "Set", "Restart", "Test", "Clear", "Export", "Import", "Update", "Remove", "Start", "Stop", "Show")
+NOUNS = ("Process", "Service", "NetAdapter", "DnsCache", "EventLog", "Disk", "Volume", "Printer",
+         "FirewallRule", "ScheduledTask", "WindowsUpdate", "Package", "Route", "Share", "Certificate", "User")
+QUERIES = ("a", "ne", "net", "get-process", "restart service 4711", "zzqx")
+
+
+# ---------------------------------------------------------------------------
+# Synthetic library
+# ---------------------------------------------------------------------------
+def _write_images(directory, count):
+    """Write *count* JPEGs and PNGs of varying size; [] if PIL is missing."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return []
+    rng = random.Random(7)
+    paths = []
+    for i in range(count):
+        size = (rng.choice((320, 800, 1920, 3840)), rng.choice((240, 600, 1080, 2160)))
+        img = Image.new("RGB", size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        path = os.path.join(directory, f"img{i:03d}.{'jpg' if i % 2 else 'png'}")
+        img.save(path)
+        paths.append(path)
+    return paths
+
+
+def make_library(directory, size, image_ratio, seed=1):
+    """Write commands.json and config.json for *size* commands into
+    *directory*; returns the number of categories used."""
+    rng = random.Random(seed)
+    n_cats = min(200, max(4, int(size ** 0.5) // 2))
+    categories = [f"{rng.choice(NOUNS)} Tools {i}" for i in range(n_cats)]
+    images = _write_images(directory, IMAGE_FILES) if image_ratio > 0 else []
+
+    commands = []
+    for i in range(size):
+        verb, noun = rng.choice(VERBS), rng.choice(NOUNS)
+        item = {
+            "name": f"{verb} {noun} {i}",
+            "cmd": f"{verb}-{noun} -Name 'item{i}' | Format-Table -AutoSize",
+            "category": rng.choice(categories),
+        }
+        if rng.random() < 0.3:
+            item["description"] = f"{verb}s the {noun.lower()} named item{i}"
+        if rng.random() < 0.1:
+            item["admin"] = True
+        if images and rng.random() < image_ratio:
+            item["image"] = rng.choice(images)
+        commands.append(item)
+
+    with open(os.path.join(directory, "commands.json"), "w", encoding="utf-8") as f:
+        json.dump(commands, f)
+    config = {
+        "geometry": WINDOW,
+        "categories": [{"name": cat, "icon": "⚙"} for cat in categories[:3]],
+    }
+    with open(os.path.join(directory, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    return n_cats
+
+
+# ---------------------------------------------------------------------------
+# Measurement (child process)
+# ---------------------------------------------------------------------------
+def _widget_names(widget):
+    names = set()
+    stack = [widget]
+    while stack:
+        w = stack.pop()
+        names.add(str(w))
+        stack.extend(w.winfo_children())
+    return names
+
+
+def point_app_at(app_design, workdir):
+    """Keep the app's data, caches and history inside *workdir*."""
+    app_design.DATA_FILE = os.path.join(workdir, "commands.json")
+    app_design.CONFIG_FILE = os.path.join(workdir, "config.json")
+    app_design.THUMB_CACHE_DIR = os.path.join(workdir, "thumbnails")
+    app_design.HISTORY_DIR = os.path.join(workdir, "history")
+    app_design.TRACE_DIR = os.path.join(workdir, "traces")
+    app_design.SCRIPT_DIR = workdir  # no window/tray icon: .ico is Windows-only
+
+
+def pump_until(root, done, timeout=READY_TIMEOUT):
+    deadline = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("timed out waiting for the app")
+        root.update()
+        time.sleep(0.001)
+
+
+def _measure(root, fn, repeat):
+    """Time *fn* plus the idle work (layout, redraw) it queues."""
+    samples = []
+    created = destroyed = 0
+    for i in range(repeat):
+        root.update()
+        before = _widget_names(root)
+        t0 = time.perf_counter()
+        fn(i)
+        root.update_idletasks()
+        samples.append((time.perf_counter() - t0) * 1000)
+        after = _widget_names(root)
+        created = max(created, len(after - before))
+        destroyed = max(destroyed, len(before - after))
+    return {
+        "ms": [round(s, 2) for s in samples],
+        "median_ms": round(statistics.median(samples), 2),
+        "min_ms": round(min(samples), 2),
+        "widgets_created": created,
+        "widgets_destroyed": destroyed,
+    }
+
+
+def run_child(size, image_ratio, repeat, workdir):
+    n_cats = make_library(workdir, size, image_ratio)
+    sys.path.insert(0, REPO_DIR)
+
+    t0 = time.perf_counter()
+    import app_design
+    import tkinter as tk
+    import_ms = (time.perf_counter() - t0) * 1000
+
+    point_app_at(app_design, workdir)
+    root = tk.Tk()
+    t0 = time.perf_counter()
+    app = app_design.PowerShellApp(root)
+    init_ms = (time.perf_counter() - t0) * 1000
+    pump_until(root, lambda: app._cards_ready)
+    ready_ms = (time.perf_counter() - t0) * 1000
+
+    def settle_thumbnails():
+        t1 = time.perf_counter()
+        pump_until(root, lambda: not app._thumb_futures and app._thumb_after_id is None)
+        return round((time.perf_counter() - t1) * 1000, 2)
+
+    ops = {}
+    with_images = sum(1 for item in app.commands if item.get("image"))
+    if with_images:
+        # Cold thumbnail cache, decoded on the worker threads
+        ops["thumbnails_settle"] = {"median_ms": settle_thumbnails()}
+
+    def build_cards(i):
+        app._build_cards()
+        app.refresh_buttons()
+    ops["build_cards"] = _measure(root, build_cards, repeat)
+    settle_thumbnails()  # keep background decodes out of later timings
+    ops["refresh_buttons"] = _measure(root, lambda i: app.refresh_buttons(), repeat)
+
+    def scroll(i):
+        app.canvas.yview_moveto((0.25, 0.75, 0.5)[i % 3])
+    ops["scroll"] = _measure(root, scroll, repeat)
+    app.canvas.yview_moveto(0)
+
+    def build_index(i):
+        app._search_index = None
+        app._get_search_index()
+    ops["search_index_build"] = _measure(root, build_index, repeat)
+    for q in QUERIES:
+        ops[f"search:{q}"] = _measure(root, lambda i, q=q: app.refresh_buttons(q), repeat)
+    app.refresh_buttons()
+
+    busiest = max(app._get_categories(), key=app._category_index.count)
+    ops["select_category"] = _measure(root, lambda i: app._select_category(busiest), repeat)
+    ops["select_home"] = _measure(root, lambda i: app._select_category("Home"), repeat)
+
+    def build_sidebar(i):
+        app._build_sidebar()
+        app._highlight_sidebar()
+    ops["build_sidebar"] = _measure(root, build_sidebar, repeat)
+    ops["sync_sidebar"] = _measure(root, lambda i: app._sync_sidebar(), repeat)
+
+    def drag(i):
+        slots = sorted((s for s in app._card_slots if s.idx is not None), key=lambda s: s.pos)
+        src, dst = slots[0], slots[min(len(slots) - 1, 4)]
+        frame = dst.frame
+        event = type("Event", (), {
+            "widget": src.frame,
+            "x_root": frame.winfo_rootx() + frame.winfo_width() // 2,
+            "y_root": frame.winfo_rooty() + frame.winfo_height() // 2,
+        })()
+        app._drag_start(src.idx)
+        app._drag_end(event)
+    if len(app.commands) > 1:
+        ops["drag_end"] = _measure(root, drag, repeat)
+
+    ops["rebuild"] = _measure(root, lambda i: app._rebuild(), repeat)
+
+    result = {
+        "size": size,
+        "categories": n_cats,
+        "with_images": with_images,
+        "import_ms": round(import_ms, 2),
+        "init_ms": round(init_ms, 2),
+        "ready_ms": round(ready_ms, 2),
+        "startup": dict(app._startup_timing),
+        "widgets_total": len(_widget_names(root)),
+        "card_slots": len(app._card_slots),
+        "ops": ops,
+    }
+    app._on_close()
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Virtual display
+# ---------------------------------------------------------------------------
+def start_xvfb():
+    """Start Xvfb on a free display; returns (process, display)."""
+    exe = shutil.which("Xvfb")
+    if not exe:
+        raise SystemExit("Xvfb not found: install it (e.g. apt install xvfb) or set DISPLAY.")
+    for n in range(99, 200):
+        if not os.path.exists(f"/tmp/.X11-unix/X{n}") and not os.path.exists(f"/tmp/.X{n}-lock"):
+            break
+    else:
+        raise SystemExit("No free X display number found.")
+    proc = subprocess.Popen([exe, f":{n}", "-screen", "0", SCREEN, "-nolisten", "tcp"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while not os.path.exists(f"/tmp/.X11-unix/X{n}"):
+        if proc.poll() is not None or time.time() > deadline:
+            proc.kill()
+            raise SystemExit("Xvfb failed to start.")
+        time.sleep(0.05)
+    return proc, f":{n}"
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+def _print_summary(result):
+    if "error" in result:
+        print(f"{result['size']:>7}  FAILED: {result['error'].splitlines()[-1] if result['error'] else '?'}")
+        return
+    ops = result["ops"]
+    print(f"{result['size']:>7}  ready {result['ready_ms']:8.1f} ms  "
+          f"build_cards {ops['build_cards']['median_ms']:7.1f} ms  "
+          f"search:net {ops['search:net']['median_ms']:7.1f} ms  "
+          f"sidebar {ops['build_sidebar']['median_ms']:7.1f} ms  "
+          f"widgets {result['widgets_total']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the card grid, search and sidebar at scale.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated library sizes (default: %(default)s)")
+    parser.add_argument("--image-ratio", type=float, default=DEFAULT_IMAGE_RATIO,
+                        help="fraction of commands with an image (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="runs per operation (default: %(default)s)")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="report path (default: benchmarks/report.json)")
+    parser.add_argument("--xvfb", action="store_true", help="use Xvfb even if DISPLAY is set")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        result = run_child(args.child, args.image_ratio, max(1, args.repeat), args.workdir)
+        sys.stdout.write(json.dumps(result) + "\n")
+        return 0
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    env = dict(os.environ)
+    xvfb = None
+    if sys.platform.startswith("linux") and (args.xvfb or not env.get("DISPLAY")):
+        xvfb, env["DISPLAY"] = start_xvfb()
+
+    results = []
+    try:
+        for size in sizes:
+            with tempfile.TemporaryDirectory(prefix="psbench-") as workdir:
+                cmd = [sys.executable, os.path.abspath(__file__), "--child", str(size),
+                       "--image-ratio", str(args.image_ratio), "--repeat", str(args.repeat), "--workdir", workdir]
+                try:
+                    proc = subprocess.run(cmd, env=env, capture_output=True, text=True, timeout=CHILD_TIMEOUT)
+                    lines = proc.stdout.strip().splitlines()
+                    if proc.returncode == 0 and lines:
+                        result = json.loads(lines[-1])
+                    else:
+                        result = {"size": size, "error": proc.stderr.strip()}
+                except subprocess.TimeoutExpired:
+                    result = {"size": size, "error": f"timed out after {CHILD_TIMEOUT} s"}
+            results.append(result)
+            _print_summary(result)
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "image_ratio": args.image_ratio,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.out}")
+    return 1 if any("error" in r for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
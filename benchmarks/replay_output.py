@@ -0,0 +1,292 @@
+"""Replay recorded output traces through the GUI's output path.
+
+Traces (``.pstrace``, see ps_trace) hold the raw bytes and chunk timing of
+real runs; record them with ``"record_traces": true`` in config.json or
+``ps_cli.py --trace DIR``.  Each trace is played through a ReplayEngine into
+the real PowerShellApp, so ``_drain_output``, ``_append_output`` and the
+per-frame flush run exactly as they do for PowerShell, and the report
+records per-chunk latency (posted by the reader thread until applied to the
+output widget), throughput and time spent flushing.
+
+    python benchmarks/replay_output.py traces/                  # recorded speed
+    python benchmarks/replay_output.py traces/ --speed 0        # as fast as possible
+    python benchmarks/replay_output.py --synthesize synthetic/  # write sample traces
+
+On Linux without a display an Xvfb server is started for the run.
+"""
+import argparse
+import collections
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from bench_gui import WINDOW, point_app_at, pump_until, start_xvfb  # noqa: E402
+from ps_engine import EV_OUTPUT, EV_EXIT  # noqa: E402
+from ps_trace import TRACE_SUFFIX, ReplayEngine, TraceWriter  # noqa: E402
+
+DEFAULT_OUT = os.path.join(BENCH_DIR, "replay_report.json")
+DEFAULT_REPEAT = 3
+
+
+# ---------------------------------------------------------------------------
+# Synthetic traces
+# ---------------------------------------------------------------------------
+def _synthetic_streams():
+    """(name, [(gap seconds, bytes)]) for the byte patterns that stress the
+    output path: progress bars, split multibyte text, colour and volume."""
+    bar = []
+    for i in range(201):
+        filled = i * 40 // 200
+        bar.append((0.01, b"\r\x1b[32m[" + b"#" * filled + b" " * (40 - filled) + b"]\x1b[0m %3d%%" % (i // 2)))
+    bar.append((0.01, b"\r\nDone.\r\n"))
+
+    text = ("\ufeff" + "".join(f"Zeile {i}: Gr\u00f6\u00dfe {i * 3} KB \u2014 \u2713 \u65e5\u672c\u8a9e\r\n" for i in range(2000))).encode("utf-8")
+    # 7-byte chunks split most multibyte characters and many \r\n pairs
+    split = [(0.0005, text[i:i + 7]) for i in range(0, len(text), 7)]
+
+    colours = (b"31", b"32", b"33", b"36")
+    table = b"".join(b"\x1b[%sm%-30s\x1b[0m %10d %s\r\n" % (colours[i % 4], b"Process-%d" % i, i * 1024, b"Running")
+                     for i in range(20000))
+    ansi = [(0.002, table[i:i + 4096]) for i in range(0, len(table), 4096)]
+
+    lines = b"".join(b"%08d The quick brown fox jumps over the lazy dog\r\n" % i for i in range(400000))
+    firehose = [(0.0, lines[i:i + 65536]) for i in range(0, len(lines), 65536)]
+
+    return (("progress", bar), ("utf8_split", split), ("ansi_table", ansi), ("firehose", firehose))
+
+
+def synthesize(directory):
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, chunks in _synthetic_streams():
+        path = os.path.join(directory, name + TRACE_SUFFIX)
+        writer = TraceWriter(path, {"command": f"<synthetic {name}>", "elevated": False, "synthetic": True}, start=0.0)
+        now = 0.0
+        for gap, data in chunks:
+            now += gap
+            writer.add(EV_OUTPUT, data, now)
+        writer.add(EV_EXIT, 0, now + 0.01)
+        paths.append(path)
+    return paths
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+class OutputProbe:
+    """Wraps the engine's drain and the app's flush to see when each run's
+    bytes reach the app and when they are applied to the widget."""
+
+    def __init__(self, app):
+        self.drained = collections.Counter()          # run id -> output events handed to the app
+        self.shown = collections.defaultdict(list)    # run id -> [(perf_counter, events applied)]
+        self.flushes = 0
+        self.flush_time = 0.0
+        drain, flush = app.engine.drain, app._flush_output
+
+        def probed_drain(*args, **kwargs):
+            events = drain(*args, **kwargs)
+            for kind, run_id, _payload in events:
+                if kind == EV_OUTPUT:
+                    self.drained[run_id] += 1
+            return events
+
+        def probed_flush():
+            t0 = time.perf_counter()
+            flush()
+            t1 = time.perf_counter()
+            self.flushes += 1
+            self.flush_time += t1 - t0
+            for run_id, n in self.drained.items():
+                marks = self.shown[run_id]
+                if not marks or marks[-1][1] != n:
+                    marks.append((t1, n))
+
+        app.engine.drain = probed_drain
+        app._flush_output = probed_flush
+
+
+def _latencies(stamps, marks):
+    """Seconds from each chunk being posted until a flush covered it."""
+    out = []
+    j = 0
+    for posted, total in stamps:
+        while j < len(marks) and marks[j][1] < total:
+            j += 1
+        if j == len(marks):
+            break
+        out.append(marks[j][0] - posted)
+    return out
+
+
+def _percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def replay(root, app, probe, path):
+    engine = app.engine
+    trace = engine.load(path)
+    tab = app._new_output_tab(os.path.basename(path))
+    tab.command = trace.meta.get("command", "")
+    flushes, flush_time = probe.flushes, probe.flush_time
+
+    started = tab.clicked = tab.confirmed = time.perf_counter()
+    run_id = engine.start(path)
+    run = engine.runs[run_id]
+    tab.run_id = run_id
+    app._tabs_by_run[run_id] = tab
+    app._schedule_drain()
+    pump_until(root, lambda: run_id not in app._tabs_by_run, timeout=max(60, trace.duration * 4))
+    root.update_idletasks()
+    finished = time.perf_counter()
+
+    marks = probe.shown.pop(run_id, [])
+    probe.drained.pop(run_id, None)
+    lat = _latencies(run.stamps, marks)
+    span = (marks[-1][0] - run.stamps[0][0]) if marks and run.stamps else 0
+    return {
+        "wall_s": round(finished - started, 4),
+        "throughput_bytes_per_s": round(trace.bytes / span) if span > 0 else None,
+        "latency_ms": {
+            "p50": round(_percentile(lat, 50) * 1000, 2) if lat else None,
+            "p95": round(_percentile(lat, 95) * 1000, 2) if lat else None,
+            "max": round(max(lat) * 1000, 2) if lat else None,
+        },
+        "flushes": probe.flushes - flushes,
+        "flush_ms": round((probe.flush_time - flush_time) * 1000, 2),
+        "append_ms": round(tab.append_time * 1000, 2),
+        "exit": run.returncode,
+    }
+
+
+def _median(runs, *keys):
+    values = []
+    for r in runs:
+        for key in keys:
+            r = r.get(key) if r is not None else None
+        if r is not None:
+            values.append(r)
+    return round(statistics.median(values), 2) if values else None
+
+
+def run_all(paths, speed, repeat):
+    import app_design
+    import tkinter as tk
+
+    workdir = tempfile.mkdtemp(prefix="psreplay-")
+    with open(os.path.join(workdir, "commands.json"), "w", encoding="utf-8") as f:
+        f.write("[]")
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump({"geometry": WINDOW}, f)
+    point_app_at(app_design, workdir)
+
+    root = tk.Tk()
+    app = app_design.PowerShellApp(root)
+    pump_until(root, lambda: app._cards_ready)
+    app.engine.close()
+    app.engine = ReplayEngine(speed, decoder=app.engine.decoder)
+    probe = OutputProbe(app)
+    app._output_toggle_var.set(True)
+    app.toggle_output()
+
+    results = []
+    try:
+        for path in paths:
+            trace = app.engine.load(path)
+            runs = [replay(root, app, probe, path) for _ in range(repeat)]
+            result = {
+                "trace": os.path.basename(path),
+                "command": trace.meta.get("command", ""),
+                "bytes": trace.bytes,
+                "chunks": trace.chunks,
+                "recorded_s": round(trace.duration, 4),
+                "complete": trace.complete,
+                "median": {
+                    "wall_s": _median(runs, "wall_s"),
+                    "throughput_bytes_per_s": _median(runs, "throughput_bytes_per_s"),
+                    "latency_p50_ms": _median(runs, "latency_ms", "p50"),
+                    "latency_p95_ms": _median(runs, "latency_ms", "p95"),
+                    "flush_ms": _median(runs, "flush_ms"),
+                    "append_ms": _median(runs, "append_ms"),
+                },
+                "runs": runs,
+            }
+            results.append(result)
+            m = result["median"]
+            rate = m["throughput_bytes_per_s"]
+            print(f"{result['trace'][:32]:32}  {trace.bytes:>10} B  wall {m['wall_s']:7.3f} s  "
+                  f"p95 {m['latency_p95_ms'] if m['latency_p95_ms'] is not None else '-':>8} ms  "
+                  f"{(rate or 0) / 1e6:7.2f} MB/s  flush {m['flush_ms']:8.1f} ms")
+    finally:
+        app._on_close()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def _collect(args):
+    paths = []
+    for arg in args:
+        if os.path.isdir(arg):
+            paths.extend(sorted(os.path.join(arg, f) for f in os.listdir(arg) if f.endswith(TRACE_SUFFIX)))
+        else:
+            paths.append(arg)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay output traces through the GUI output path.")
+    parser.add_argument("traces", nargs="*", help="trace files or directories of them")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="playback speed; 1 is as recorded, 0 is as fast as possible (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="replays per trace (default: %(default)s)")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="report path (default: benchmarks/replay_report.json)")
+    parser.add_argument("--xvfb", action="store_true", help="use Xvfb even if DISPLAY is set")
+    parser.add_argument("--synthesize", metavar="DIR", help="write synthetic sample traces to DIR and exit")
+    args = parser.parse_args(argv)
+
+    if args.synthesize:
+        for path in synthesize(args.synthesize):
+            print(path)
+        return 0
+    paths = _collect(args.traces)
+    if not paths:
+        parser.error("no traces given")
+
+    xvfb = None
+    if sys.platform.startswith("linux") and (args.xvfb or not os.environ.get("DISPLAY")):
+        xvfb, os.environ["DISPLAY"] = start_xvfb()
+    try:
+        results = run_all(paths, args.speed, max(1, args.repeat))
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "speed": args.speed,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
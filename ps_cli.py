@@ -0,0 +1,136 @@
+"""Headless runner for PowerShell Command Runner.
+
+Runs stored commands without building the GUI, e.g. from a scheduled task:
+
+    python ps_cli.py --run "Flush DNS"
+    python ps_cli.py --category Network
+    python ps_cli.py --list
+
+Only the store and the execution engine are imported (no tkinter, PIL or
+pystray).  Output is streamed to stdout as it arrives, and the exit code is
+the command's own (for ``--category``, the first non-zero one).
+"""
+import argparse
+import os
+import sys
+
+from ps_engine import ExecutionEngine, EV_OUTPUT, EV_EXIT, EV_ERROR
+from ps_store import CommandStore
+from ps_trace import TraceRecorder
+
+if getattr(sys, 'frozen', False):
+    SCRIPT_DIR = os.path.dirname(sys.executable)
+else:
+    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_FILE = os.path.join(SCRIPT_DIR, "commands.json")
+
+# Exit codes for failures of the runner itself
+EXIT_NOT_FOUND = 2
+EXIT_FAILED = 1
+EXIT_INTERRUPTED = 130
+
+CLI_FLAGS = ("--run", "--category", "--list")
+
+
+def wants_cli(argv):
+    """True if *argv* asks for a headless run rather than the GUI."""
+    return any(arg.split("=", 1)[0] in CLI_FLAGS for arg in argv[1:])
+
+
+def _find(commands, name):
+    for item in commands:
+        if item.get("name") == name:
+            return item
+    folded = name.casefold()
+    for item in commands:
+        if str(item.get("name", "")).casefold() == folded:
+            return item
+    return None
+
+
+def run_items(items, engine=None, out=None):
+    """Run *items* one after another, streaming their output to *out*.
+
+    Returns the first non-zero exit code, or 0.
+    """
+    engine = engine or ExecutionEngine()
+    out = out or sys.stdout.buffer
+    result = 0
+    for item in items:
+        run_id = engine.start(item["cmd"], elevated=bool(item.get("admin", False)))
+        code = None
+        finished = False
+        while not finished:
+            for kind, rid, payload in engine.drain(timeout=0.5):
+                if rid != run_id:
+                    continue
+                if kind == EV_OUTPUT:
+                    out.write(payload)
+                    out.flush()
+                elif kind == EV_EXIT:
+                    code, finished = payload, True
+                elif kind == EV_ERROR:
+                    sys.stderr.write(f"{item['name']}: {payload}\n")
+                    finished = True
+        engine.timings.pop(run_id, None)
+        if code is None:
+            code = EXIT_FAILED
+        if code and not result:
+            result = code
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="ps_cli", description="Run stored PowerShell commands without the GUI.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--run", metavar="NAME", help="run the command with this name")
+    group.add_argument("--category", metavar="CAT", help="run every command in this category, in order")
+    group.add_argument("--list", action="store_true", help="list stored commands")
+    parser.add_argument("--trace", metavar="DIR", help="also record each run's raw output to a trace file in DIR")
+    parser.add_argument("--data", default=DATA_FILE, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    # A windowed (no console) build has no standard streams
+    if sys.stdout is None:
+        sys.stdout = open(os.devnull, "w")
+    if sys.stderr is None:
+        sys.stderr = open(os.devnull, "w")
+
+    store = CommandStore(args.data)
+    commands = store.items
+    if store.load_error:
+        sys.stderr.write(store.load_error + "\n")
+        return EXIT_FAILED
+
+    if args.list:
+        for item in commands:
+            cat = item.get("category", "")
+            sys.stdout.write(f"{item.get('name', '')}\t{cat}\n")
+        return 0
+
+    if args.run is not None:
+        item = _find(commands, args.run)
+        if item is None:
+            sys.stderr.write(f"No command named '{args.run}'.\n")
+            return EXIT_NOT_FOUND
+        items = [item]
+    else:
+        items = [c for c in commands if c.get("category", "") == args.category]
+        if not items:
+            sys.stderr.write(f"No commands in category '{args.category}'.\n")
+            return EXIT_NOT_FOUND
+
+    engine = ExecutionEngine()
+    if args.trace:
+        engine.recorder = TraceRecorder(args.trace)
+    try:
+        return run_items(items, engine)
+    except KeyboardInterrupt:
+        engine.shutdown()
+        return EXIT_INTERRUPTED
+    except OSError as e:
+        sys.stderr.write(f"{e}\n")
+        return EXIT_FAILED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,984 @@
+"""Execution engine for PowerShell Command Runner.
+
+Every run (a fresh process, a warm pooled host or an elevated script) gets a
+reader thread that drains its output into a shared queue.  The GUI drains
+that queue once per frame, so it never blocks on a pipe and throughput is
+limited only by the pipe itself.
+"""
+import base64
+import collections
+import os
+import queue
+import select
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+# Upper bound for a single read.  read1() returns as soon as *any* data is
+# available, so this only caps how much one chunk can carry.
+READ_SIZE = 64 * 1024
+
+# Event kinds posted to ExecutionEngine.events as (kind, run_id, payload)
+EV_START = "start"    # payload: command; a queued or new run is now running
+EV_OUTPUT = "output"  # payload: bytes, or whatever the engine's decoder returns
+EV_EXIT = "exit"      # payload: exit code
+EV_ERROR = "error"    # payload: message; the run could not be started or lost its output
+
+
+# Windows PowerShell on Windows; PowerShell 7 (pwsh) everywhere else
+POWERSHELL_EXE = "powershell" if os.name == "nt" else "pwsh"
+
+
+def powershell_argv(command):
+    return [POWERSHELL_EXE, "-NoProfile", "-Command", command]
+
+
+def _popen_kwargs():
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NO_WINDOW}
+    return {}
+
+
+# ---------------------------------------------------------------------------
+# Single run
+# ---------------------------------------------------------------------------
+class Run:
+    """One PowerShell process and the thread draining its output.
+
+    Output is read into one reused buffer and posted as a ``memoryview`` of
+    it, so *events* must consume each chunk before returning (the engine's
+    wrapper decodes or copies it).
+    """
+
+    def __init__(self, run_id, command, events):
+        self.id = run_id
+        self.command = command
+        self.proc = None
+        self.returncode = None
+        self._events = events
+        self._thread = None
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            powershell_argv(self.command),
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            **_popen_kwargs()
+        )
+        self._thread = threading.Thread(target=self._reader, name=f"ps-run-{self.id}", daemon=True)
+        self._thread.start()
+
+    def _reader(self):
+        stream = self.proc.stdout
+        readinto = getattr(stream, "readinto1", stream.readinto)
+        buf = bytearray(READ_SIZE)
+        view = memoryview(buf)
+        try:
+            while True:
+                n = readinto(buf)
+                if not n:
+                    break
+                self._events.put((EV_OUTPUT, self.id, view[:n]))
+        except (OSError, ValueError):
+            pass
+        finally:
+            try:
+                stream.close()
+            except OSError:
+                pass
+        self.returncode = self.proc.wait()
+        self._events.put((EV_EXIT, self.id, self.returncode))
+
+    def kill(self):
+        if self.proc and self.proc.poll() is None:
+            try:
+                self.proc.kill()
+            except OSError:
+                pass
+
+
+# ---------------------------------------------------------------------------
+# Warm host pool
+# ---------------------------------------------------------------------------
+# A pooled host reads one command per line from stdin:
+#
+#     <token> <base64 of the UTF-8 command text>
+#
+# runs it, writes its output to stdout and ends it with a line of the form
+#
+#     <<<PSR_DONE:<token>:<exit code>>>
+#
+# Anything that speaks this protocol can stand in for PowerShell (a stub
+# interpreter in tests, for instance) by passing its argv to HostPool.
+DONE_PREFIX = b"<<<PSR_DONE:"
+DONE_SUFFIX = b">>>"
+
+# Shared by pooled hosts (stdin/stdout) and the elevated broker (a socket);
+# __IN__ and __OUT__ are replaced with the reader and writer to use.
+_COMMAND_LOOP = r"""
+$__home = (Get-Location).Path
+while ($true) {
+    $__line = __IN__.ReadLine()
+    if ($null -eq $__line) { break }
+    $__tok, $__b64 = $__line.Split(' ', 2)
+    $__code = 0
+    Set-Location $__home
+    $global:LASTEXITCODE = 0
+    try {
+        $__src = [Text.Encoding]::UTF8.GetString([Convert]::FromBase64String($__b64))
+        & ([ScriptBlock]::Create($__src)) 2>&1 | Out-String -Stream | ForEach-Object { __OUT__.WriteLine($_) }
+        if ($global:LASTEXITCODE) { $__code = $global:LASTEXITCODE }
+    } catch {
+        __OUT__.WriteLine(($_ | Out-String).TrimEnd())
+        $__code = 1
+    }
+    __OUT__.WriteLine("<<<PSR_DONE:${__tok}:${__code}>>>")
+    __OUT__.Flush()
+}
+"""
+
+_HOST_LOOP = r"""
+$ErrorActionPreference = 'Continue'
+[Console]::OutputEncoding = New-Object Text.UTF8Encoding $false
+""" + _COMMAND_LOOP.replace("__IN__", "[Console]::In").replace("__OUT__", "[Console]::Out")
+
+
+def powershell_host_argv():
+    encoded = base64.b64encode(_HOST_LOOP.encode("utf-16-le")).decode("ascii")
+    return [POWERSHELL_EXE, "-NoProfile", "-NoLogo", "-NonInteractive", "-EncodedCommand", encoded]
+
+
+def encode_host_command(token, command):
+    """One protocol line asking a host to run *command*."""
+    payload = base64.b64encode(command.encode("utf-8")).decode("ascii")
+    return f"{token} {payload}\n".encode("ascii")
+
+
+class DoneScanner:
+    """Finds the end-of-command marker in a byte stream.
+
+    Bytes that might be the start of a marker split across reads are held
+    back until the next :meth:`feed`.  The marker counts as seen once its
+    whole line has arrived, newline included, so nothing of it is left in
+    a host's stream for the next command to read.
+    """
+
+    def __init__(self, token):
+        self._marker = DONE_PREFIX + token.encode("ascii") + b":"
+        self._tail = b""
+
+    def feed(self, data):
+        """Return ``(output, exit_code)``; *exit_code* is None until the
+        marker has been seen, after which any further bytes are dropped."""
+        buf = self._tail + bytes(data) if self._tail else bytes(data)
+        self._tail = b""
+        marker = self._marker
+        i = buf.find(marker)
+        if i >= 0:
+            j = buf.find(DONE_SUFFIX, i + len(marker))
+            end = buf.find(b"\n", j + len(DONE_SUFFIX)) if j >= 0 else -1
+            if end < 0:
+                self._tail = buf[i:]
+                return buf[:i], None
+            try:
+                code = int(buf[i + len(marker):j])
+            except ValueError:
+                code = 1
+            return buf[:i], code
+        # Keep any suffix that is still a possible marker prefix
+        start = max(0, len(buf) - len(marker) + 1)
+        k = buf.find(b"<", start)
+        while k >= 0:
+            if marker.startswith(buf[k:]):
+                self._tail = buf[k:]
+                return buf[:k], None
+            k = buf.find(b"<", k + 1)
+        return buf, None
+
+
+class PooledHost:
+    """A long-lived interpreter that runs commands sent over its stdin."""
+
+    def __init__(self, argv):
+        self.runs = 0
+        self.proc = subprocess.Popen(
+            argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            **_popen_kwargs()
+        )
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+    def kill(self):
+        if self.alive():
+            try:
+                self.proc.kill()
+            except OSError:
+                pass
+
+
+class HostPool:
+    """Keeps *size* warm hosts ready so a run skips interpreter startup.
+
+    Hosts are recycled after *max_runs* commands, or as soon as a command
+    fails or the host dies, so state leaking between commands stays bounded.
+    """
+
+    def __init__(self, size, max_runs=25, argv=None):
+        self.size = size
+        self.max_runs = max_runs
+        self._argv = argv or powershell_host_argv()
+        self._idle = []
+        self._spawning = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def warm(self):
+        """Spawn hosts until *size* are idle.  Hosts initialize on their own,
+        so this returns as soon as the processes exist."""
+        while True:
+            with self._lock:
+                if self._closed or len(self._idle) + self._spawning >= self.size:
+                    return
+                self._spawning += 1
+            try:
+                host = PooledHost(self._argv)
+            except OSError:
+                host = None
+            with self._lock:
+                self._spawning -= 1
+                if host is None:
+                    return
+                if not self._closed:
+                    self._idle.append(host)
+                    continue
+            host.close()
+            return
+
+    def acquire(self):
+        """Return an idle, living host or None."""
+        with self._lock:
+            while self._idle:
+                host = self._idle.pop(0)
+                if host.alive():
+                    return host
+        return None
+
+    def release(self, host, ok):
+        host.runs += 1
+        recycle = not ok or host.runs >= self.max_runs or not host.alive()
+        if not recycle:
+            with self._lock:
+                if not self._closed:
+                    self._idle.append(host)
+                    return
+        host.close()
+        threading.Thread(target=self.warm, name="ps-pool-warm", daemon=True).start()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            hosts, self._idle = self._idle, []
+        for host in hosts:
+            host.close()
+
+
+class PooledRun:
+    """A run executed by a warm host instead of a fresh process."""
+
+    def __init__(self, run_id, command, events, host, pool):
+        self.id = run_id
+        self.command = command
+        self.host = host
+        self.returncode = None
+        self._events = events
+        self._pool = pool
+        self._token = uuid.uuid4().hex
+        self._thread = None
+
+    def start(self):
+        try:
+            self.host.proc.stdin.write(encode_host_command(self._token, self.command))
+            self.host.proc.stdin.flush()
+        except (OSError, ValueError):
+            # The host died while idle; let the pool replace it
+            self._pool.release(self.host, False)
+            raise
+        self._thread = threading.Thread(target=self._reader, name=f"ps-run-{self.id}", daemon=True)
+        self._thread.start()
+
+    def _reader(self):
+        stream = self.host.proc.stdout
+        scanner = DoneScanner(self._token)
+        code = None
+        try:
+            while code is None:
+                chunk = stream.read1(READ_SIZE)
+                if not chunk:
+                    break
+                data, code = scanner.feed(chunk)
+                if data:
+                    self._events.put((EV_OUTPUT, self.id, data))
+        except (OSError, ValueError):
+            pass
+        if code is None:
+            # Host exited mid-command; its stdout can close just before it
+            # is reaped, so wait for the real exit code
+            try:
+                code = self.host.proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                code = -1
+        self.returncode = code
+        self._pool.release(self.host, code == 0)
+        self._events.put((EV_EXIT, self.id, code))
+
+    def kill(self):
+        self.host.kill()
+
+
+# ---------------------------------------------------------------------------
+# Elevated runs
+# ---------------------------------------------------------------------------
+# An elevated process cannot inherit our pipes, so the generated script
+# connects back to a loopback socket, proves itself with a one-time token and
+# streams its output there.  If the connection fails (a firewall, say) it
+# appends to a temp file instead, which is tailed by byte offset.  Both paths
+# end with the same <<<PSR_DONE:token:code>>> marker as pooled hosts.
+_ELEVATED_SCRIPT = r"""
+try {{ $Host.UI.RawUI.BufferSize = New-Object Management.Automation.Host.Size(500,9999) }} catch {{ }}
+$__utf8 = New-Object Text.UTF8Encoding $false
+$__w = $null
+try {{
+    $__c = New-Object Net.Sockets.TcpClient('127.0.0.1', {port})
+    $__w = New-Object IO.StreamWriter($__c.GetStream(), $__utf8)
+    $__w.AutoFlush = $true
+    $__w.WriteLine('{token}')
+}} catch {{
+    $__w = New-Object IO.StreamWriter('{output_path}', $true, $__utf8)
+    $__w.AutoFlush = $true
+}}
+$__code = 0
+$global:LASTEXITCODE = 0
+try {{
+    $__src = [Text.Encoding]::UTF8.GetString([Convert]::FromBase64String('{payload}'))
+    & ([ScriptBlock]::Create($__src)) 2>&1 | Out-String -Stream | ForEach-Object {{ $__w.WriteLine($_) }}
+    if ($global:LASTEXITCODE) {{ $__code = $global:LASTEXITCODE }}
+}} catch {{
+    $__w.WriteLine(($_ | Out-String).TrimEnd())
+    $__code = 1
+}}
+$__w.WriteLine("<<<PSR_DONE:{token}:$__code>>>")
+$__w.Dispose()
+"""
+
+# How long a connected socket gets to present its token
+_AUTH_TIMEOUT = 5.0
+
+# How long a launched elevated script gets to connect back or start writing
+# its fallback file
+_ELEVATED_CONNECT_TIMEOUT = 60.0
+
+
+def launch_elevated(script_path):
+    """Run *script_path* in an elevated, hidden PowerShell (UAC prompt)."""
+    if os.name != "nt":
+        raise OSError("Running as Administrator is only supported on Windows")
+    import ctypes
+    rc = ctypes.windll.shell32.ShellExecuteW(
+        None, "runas", POWERSHELL_EXE,
+        f'-NoProfile -WindowStyle Hidden -ExecutionPolicy Bypass -File "{script_path}"',
+        None, 0
+    )
+    # ShellExecuteW returns a value <= 32 on failure, 5 when UAC is declined
+    if rc <= 32:
+        raise OSError(f"Elevation failed or was cancelled (code {rc})")
+
+
+def launch_unelevated(script_path):
+    """Stand-in for launch_elevated that skips UAC, for tests and non-Windows
+    hosts: runs *script_path* in a normal PowerShell."""
+    subprocess.Popen(
+        [POWERSHELL_EXE, "-NoProfile", "-ExecutionPolicy", "Bypass", "-File", script_path],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        **_popen_kwargs()
+    )
+
+
+def _recv_line(conn, limit=256):
+    """Read one newline-terminated line; returns (line, leftover bytes)."""
+    data = b""
+    while b"\n" not in data and len(data) < limit:
+        chunk = conn.recv(limit)
+        if not chunk:
+            break
+        data += chunk
+    line, _, rest = data.partition(b"\n")
+    return line.strip(), rest
+
+
+class ElevatedRun:
+    """A run in an elevated process, streamed back over loopback or a file."""
+
+    def __init__(self, run_id, command, events, launcher=launch_elevated):
+        self.id = run_id
+        self.command = command
+        self.returncode = None
+        self._events = events
+        self._launcher = launcher
+        self._token = uuid.uuid4().hex
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._finished = False
+        self._conn = None
+        self._listener = None
+        self._script_path = None
+        self._output_path = None
+        self._thread = None
+
+    def start(self):
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.bind(("127.0.0.1", 0))
+        self._listener.listen(4)
+        port = self._listener.getsockname()[1]
+
+        fd, self._output_path = tempfile.mkstemp(suffix=".txt")
+        os.close(fd)
+        fd, self._script_path = tempfile.mkstemp(suffix=".ps1")
+        os.close(fd)
+        payload = base64.b64encode(self.command.encode("utf-8")).decode("ascii")
+        with open(self._script_path, "w", encoding="utf-8") as f:
+            f.write(_ELEVATED_SCRIPT.format(
+                port=port, token=self._token, payload=payload,
+                output_path=self._output_path.replace("'", "''")
+            ))
+        self._thread = threading.Thread(target=self._reader, name=f"ps-run-{self.id}", daemon=True)
+        self._thread.start()
+
+    def _reader(self):
+        try:
+            code = None
+            try:
+                self._launcher(self._script_path)
+                conn, leftover = self._wait_for_stream()
+                if conn is not None:
+                    # Published before the cancel check in _read_socket, so a
+                    # kill() either sees the socket or is seen by the reader
+                    self._conn = conn
+                    with conn:
+                        code = self._read_socket(conn, leftover)
+                elif not self._cancelled.is_set():
+                    code = self._tail_file()
+            except OSError as e:
+                self._finish((EV_ERROR, self.id, str(e)))
+                return
+            if not self._cancelled.is_set():
+                self.returncode = code
+            self._finish((EV_EXIT, self.id, code))
+        finally:
+            self._listener.close()
+            for path in (self._script_path, self._output_path):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def _wait_for_stream(self):
+        """Block until the script either connects with the right token or
+        starts writing the fallback file.  Returns (socket, leftover) or
+        (None, b""); raises OSError if neither happens in time."""
+        deadline = time.monotonic() + _ELEVATED_CONNECT_TIMEOUT
+        while not self._cancelled.is_set():
+            if time.monotonic() > deadline:
+                raise OSError("Elevated command did not connect back")
+            readable, _, _ = select.select([self._listener], [], [], 0.1)
+            if readable:
+                conn, _ = self._listener.accept()
+                conn.settimeout(_AUTH_TIMEOUT)
+                try:
+                    line, leftover = _recv_line(conn)
+                except OSError:
+                    line, leftover = b"", b""
+                if line == self._token.encode("ascii"):
+                    conn.settimeout(None)
+                    return conn, leftover
+                conn.close()
+                continue
+            try:
+                if os.path.getsize(self._output_path) > 0:
+                    return None, b""
+            except OSError:
+                pass
+        return None, b""
+
+    def _read_socket(self, conn, leftover):
+        scanner = DoneScanner(self._token)
+        buf = bytearray(READ_SIZE)
+        view = memoryview(buf)
+        data = leftover
+        while True:
+            if data:
+                out, code = scanner.feed(data)
+                if out:
+                    self._events.put((EV_OUTPUT, self.id, out))
+                if code is not None:
+                    return code
+            if self._cancelled.is_set():
+                return None
+            try:
+                n = conn.recv_into(buf)
+            except OSError:
+                n = 0
+            if not n:
+                if self._cancelled.is_set():
+                    return None  # kill() shut the socket down
+                raise OSError("Elevated command exited without an exit code")
+            data = view[:n]
+
+    def _tail_file(self):
+        """Fallback: follow the output file by binary offset until the marker."""
+        scanner = DoneScanner(self._token)
+        with open(self._output_path, "rb") as f:
+            while not self._cancelled.is_set():
+                data = f.read(READ_SIZE)
+                if not data:
+                    time.sleep(0.05)
+                    continue
+                out, code = scanner.feed(data)
+                if out:
+                    self._events.put((EV_OUTPUT, self.id, out))
+                if code is not None:
+                    return code
+        return None
+
+    def _finish(self, event):
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+        self._events.put(event)
+
+    def kill(self):
+        # An unelevated process cannot kill an elevated one; stop listening,
+        # wake the reader if it is blocked on the socket, and report the run
+        # as cancelled right away so its slot is freed.
+        self._cancelled.set()
+        conn = self._conn
+        if conn is not None:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._finish((EV_EXIT, self.id, None))
+
+
+# ---------------------------------------------------------------------------
+# Elevated broker
+# ---------------------------------------------------------------------------
+# Opt-in alternative to one ElevatedRun per admin command: a single elevated
+# PowerShell is launched (one UAC prompt) and then serves every admin command
+# of the session over a loopback connection, one at a time, using the same
+# line protocol as pooled hosts.  Both ends prove themselves: the broker
+# sends its token first, and only executes commands after the app answers
+# with a second token that exists nowhere but in the script and in memory.
+_BROKER_SCRIPT = r"""
+$ErrorActionPreference = 'Continue'
+$__utf8 = New-Object Text.UTF8Encoding $false
+$__c = New-Object Net.Sockets.TcpClient('127.0.0.1', __PORT__)
+$__s = $__c.GetStream()
+$__w = New-Object IO.StreamWriter($__s, $__utf8)
+$__w.AutoFlush = $true
+$__r = New-Object IO.StreamReader($__s, $__utf8)
+$__w.WriteLine('__BROKER_TOKEN__')
+if ($__r.ReadLine() -ne '__APP_TOKEN__') { $__c.Close(); exit 1 }
+""" + _COMMAND_LOOP.replace("__IN__", "$__r").replace("__OUT__", "$__w") + r"""
+$__c.Close()
+"""
+
+# How long a launched broker gets to connect back
+_BROKER_CONNECT_TIMEOUT = 60.0
+
+
+class ElevatedBroker:
+    """One elevated PowerShell that runs every admin command of a session."""
+
+    def __init__(self, launcher=launch_elevated):
+        self._launcher = launcher
+        self._lock = threading.Lock()  # one command at a time
+        self._conn = None
+
+    @property
+    def connected(self):
+        return self._conn is not None
+
+    def _connect(self):
+        broker_token = uuid.uuid4().hex
+        app_token = uuid.uuid4().hex
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        fd, script_path = tempfile.mkstemp(suffix=".ps1")
+        os.close(fd)
+        try:
+            listener.bind(("127.0.0.1", 0))
+            listener.listen(4)
+            script = (_BROKER_SCRIPT
+                      .replace("__PORT__", str(listener.getsockname()[1]))
+                      .replace("__BROKER_TOKEN__", broker_token)
+                      .replace("__APP_TOKEN__", app_token))
+            with open(script_path, "w", encoding="utf-8") as f:
+                f.write(script)
+            self._launcher(script_path)
+
+            deadline = time.monotonic() + _BROKER_CONNECT_TIMEOUT
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise OSError("Elevated broker did not connect")
+                readable, _, _ = select.select([listener], [], [], min(remaining, 0.5))
+                if not readable:
+                    continue
+                conn, _ = listener.accept()
+                conn.settimeout(_AUTH_TIMEOUT)
+                try:
+                    line, _ = _recv_line(conn)
+                    if line == broker_token.encode("ascii"):
+                        conn.sendall(app_token.encode("ascii") + b"\n")
+                        conn.settimeout(None)
+                        self._conn = conn
+                        return
+                except OSError:
+                    pass
+                conn.close()
+        finally:
+            listener.close()
+            try:
+                os.unlink(script_path)
+            except OSError:
+                pass
+
+    def execute(self, run):
+        """Run *run.command* on the broker, launching it on first use.
+
+        Output goes to ``run.emit``; returns the exit code.  Raises OSError if
+        the broker cannot be launched or the connection drops.
+        """
+        with self._lock:
+            if self._conn is None:
+                self._connect()
+            token = uuid.uuid4().hex
+            scanner = DoneScanner(token)
+            buf = bytearray(READ_SIZE)
+            view = memoryview(buf)
+            try:
+                self._conn.sendall(encode_host_command(token, run.command))
+                while True:
+                    n = self._conn.recv_into(buf)
+                    if not n:
+                        raise OSError("Elevated broker exited")
+                    out, code = scanner.feed(view[:n])
+                    if out:
+                        run.emit(out)
+                    if code is not None:
+                        return code
+            except OSError:
+                self._drop()
+                raise
+
+    def _drop(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+            self._conn = None
+
+    def close(self):
+        """Closing the connection ends the broker's read loop."""
+        self._drop()
+
+
+class BrokerRun:
+    """An admin run executed by the session's ElevatedBroker."""
+
+    def __init__(self, run_id, command, events, broker):
+        self.id = run_id
+        self.command = command
+        self.returncode = None
+        self._events = events
+        self._broker = broker
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._reader, name=f"ps-run-{self.id}", daemon=True)
+        self._thread.start()
+
+    def emit(self, data):
+        if not self._cancelled.is_set():
+            self._events.put((EV_OUTPUT, self.id, data))
+
+    def _reader(self):
+        try:
+            code = self._broker.execute(self)
+        except OSError as e:
+            if not self._cancelled.is_set():
+                self._events.put((EV_ERROR, self.id, str(e)))
+            return
+        self.returncode = code
+        if not self._cancelled.is_set():
+            self._events.put((EV_EXIT, self.id, code))
+
+    def kill(self):
+        # The broker keeps running the command; stop showing it and free
+        # the slot right away.
+        if not self._cancelled.is_set():
+            self._cancelled.set()
+            self._events.put((EV_EXIT, self.id, None))
+
+
+# ---------------------------------------------------------------------------
+# Timing
+# ---------------------------------------------------------------------------
+class RunTiming:
+    """``time.perf_counter()`` stamps for one run, taken where they happen:
+    the reader thread stamps output and exit as it posts them."""
+
+    __slots__ = ("queued", "spawn_start", "spawned", "first_byte", "last_byte", "exited", "bytes")
+
+    def __init__(self):
+        self.queued = time.perf_counter()
+        self.spawn_start = self.spawned = None
+        self.first_byte = self.last_byte = self.exited = None
+        self.bytes = 0
+
+
+class _TimedEvents:
+    """Stands in for the event queue given to one run, stamping its
+    RunTiming (and writing its trace, if one is being recorded) as events
+    go through.
+
+    With a *decoder* output is decoded here, on the reader thread, and
+    posted as the decoder's result; one such event is posted per chunk
+    read, even if the decoder is holding all of it back.  Without one,
+    chunks are posted as bytes.
+
+    Events are held back until :meth:`started` is called, so a reader
+    thread that is quick off the mark cannot get ahead of EV_START.
+    """
+
+    def __init__(self, events, timing, trace=None, decoder=None):
+        self._events = events
+        self._timing = timing
+        self._trace = trace
+        self._decoder = decoder
+        self._lock = threading.Lock()  # a cancel may end the run from another thread
+        self._held = []  # None once the run has started
+        self._held_lock = threading.Lock()
+
+    def started(self, event):
+        """Post *event* (the run's EV_START), then whatever the run posted
+        while it was starting; later events go straight through."""
+        with self._held_lock:
+            self._events.put(event)
+            for held in self._held:
+                self._events.put(held)
+            self._held = None
+
+    def _post(self, event):
+        if self._held is not None:
+            with self._held_lock:
+                if self._held is not None:
+                    self._held.append(event)
+                    return
+        self._events.put(event)
+
+    def put(self, event):
+        kind, run_id, payload = event
+        timing = self._timing
+        now = time.perf_counter()
+        if kind == EV_OUTPUT:
+            if timing.first_byte is None:
+                timing.first_byte = now
+            timing.last_byte = now
+            timing.bytes += len(payload)
+        elif kind in (EV_EXIT, EV_ERROR):
+            timing.exited = now
+        if self._trace is not None:
+            self._trace.add(kind, payload, now)
+        decoder = self._decoder
+        if decoder is None:
+            if kind == EV_OUTPUT and not isinstance(payload, bytes):
+                event = (kind, run_id, bytes(payload))
+        elif kind == EV_OUTPUT:
+            with self._lock:
+                event = (kind, run_id, decoder.decode(payload))
+        else:
+            with self._lock:
+                tail = decoder.flush()
+            if tail:
+                self._post((EV_OUTPUT, run_id, tail))
+        self._post(event)
+
+
+# ---------------------------------------------------------------------------
+# Engine
+# ---------------------------------------------------------------------------
+class ExecutionEngine:
+    """Starts runs and collects their output events on one thread-safe queue.
+
+    Reader threads only ever *put* into ``events``; the owner (the Tk thread in
+    the GUI) calls :meth:`drain` to pull whatever has arrived since last time.
+    With *max_concurrent* set, runs beyond the cap wait in ``pending`` and are
+    started from :meth:`drain` as earlier runs exit.
+
+    ``timings`` maps each run id to its RunTiming; the owner pops entries
+    once it is done with a run.  *decoder*, if given, is called once per run
+    for an object whose ``decode(data)``/``flush()`` turn its output into
+    text on the reader thread (see ps_output.OutputDecoder).  ``recorder``,
+    if set, is called as ``recorder(run_id, command, elevated)`` for every
+    run launched and returns a trace writer (see ps_trace) or None.
+    """
+
+    def __init__(self, pool=None, max_concurrent=0, elevate=launch_elevated, broker=None, decoder=None):
+        self.events = queue.SimpleQueue()
+        self.runs = {}
+        self.pending = collections.deque()
+        self.timings = {}
+        self.pool = pool
+        self.max_concurrent = max_concurrent
+        self.elevate = elevate
+        self.broker = broker
+        self.decoder = decoder
+        self.recorder = None
+        self._next_id = 1
+
+    def start(self, command, elevated=False):
+        """Queue or run *command* and return its run id.
+
+        Raises OSError if a run that could start immediately fails to spawn.
+        """
+        run_id = self._next_id
+        self._next_id += 1
+        self.timings[run_id] = RunTiming()
+        if self._at_capacity():
+            self.pending.append((run_id, command, elevated))
+        else:
+            self._launch(run_id, command, elevated)
+        return run_id
+
+    def is_queued(self, run_id):
+        return any(entry[0] == run_id for entry in self.pending)
+
+    def cancel(self, run_id):
+        """Drop a queued run or kill a running one."""
+        for entry in self.pending:
+            if entry[0] == run_id:
+                self.pending.remove(entry)
+                self.events.put((EV_EXIT, run_id, None))
+                return
+        run = self.runs.get(run_id)
+        if run:
+            run.kill()
+
+    def _at_capacity(self):
+        return bool(self.max_concurrent) and len(self.runs) >= self.max_concurrent
+
+    def _launch(self, run_id, command, elevated):
+        timing = self.timings.setdefault(run_id, RunTiming())
+        trace = self.recorder(run_id, command, elevated) if self.recorder else None
+        decoder = self.decoder() if self.decoder else None
+        events = _TimedEvents(self.events, timing, trace, decoder)
+        run = self._make_run(run_id, command, elevated, events)
+        timing.spawn_start = time.perf_counter()
+        try:
+            try:
+                run.start()
+            except (OSError, ValueError):
+                if not isinstance(run, PooledRun):
+                    raise
+                # The warm host died while idle and the pool is replacing
+                # it; a fresh process can still run the command
+                run = Run(run_id, command, events)
+                run.start()
+        except BaseException:
+            self.timings.pop(run_id, None)
+            if trace is not None:
+                trace.close()
+            raise
+        timing.spawned = time.perf_counter()
+        self.runs[run_id] = run
+        events.started((EV_START, run_id, command))
+
+    def _make_run(self, run_id, command, elevated, events):
+        # A warm host from the pool is used when one is idle; otherwise a
+        # fresh process is spawned.
+        host = self.pool.acquire() if self.pool and not elevated else None
+        if elevated and self.broker:
+            return BrokerRun(run_id, command, events, self.broker)
+        if elevated:
+            return ElevatedRun(run_id, command, events, self.elevate)
+        if host is not None:
+            return PooledRun(run_id, command, events, host, self.pool)
+        return Run(run_id, command, events)
+
+    def _promote(self):
+        while self.pending and not self._at_capacity():
+            run_id, command, elevated = self.pending.popleft()
+            try:
+                self._launch(run_id, command, elevated)
+            except OSError as e:
+                self.events.put((EV_ERROR, run_id, str(e)))
+
+    def drain(self, max_bytes=1 << 20, timeout=None):
+        """Return queued events, stopping once roughly *max_bytes* of output
+        has been collected so a firehose cannot starve the GUI.
+
+        With *timeout*, wait up to that many seconds for the first event
+        instead of returning an empty list straight away.
+        """
+        out = []
+        total = 0
+        while total < max_bytes:
+            try:
+                if timeout is not None and not out:
+                    ev = self.events.get(timeout=timeout)
+                else:
+                    ev = self.events.get_nowait()
+            except queue.Empty:
+                break
+            out.append(ev)
+            if ev[0] == EV_OUTPUT:
+                payload = ev[2]
+                # A decoder's coloured output is a [text, tag, ...] list
+                total += sum(map(len, payload[0::2])) if isinstance(payload, list) else len(payload)
+            elif ev[0] in (EV_EXIT, EV_ERROR):
+                self.runs.pop(ev[1], None)
+                self._promote()
+        return out
+
+    def busy(self):
+        """True while any run is alive, queued or has undelivered events."""
+        return bool(self.runs) or bool(self.pending) or not self.events.empty()
+
+    def close(self):
+        """Release the pool and broker; runs already started keep going."""
+        if self.pool:
+            self.pool.close()
+        if self.broker:
+            self.broker.close()
+
+    def shutdown(self):
+        self.pending.clear()
+        for run in list(self.runs.values()):
+            run.kill()
+        self.close()
@@ -0,0 +1,393 @@
+"""In-memory indexes over the command list for PowerShell Command Runner.
+
+Commands are plain dicts held in a list whose order the user controls, so
+the indexes key each command by ``id(item)`` rather than its position.  The
+caller tells the index about every add, edit and remove; nothing here
+touches Tk.
+"""
+import heapq
+from collections import Counter, defaultdict
+from itertools import islice
+
+# Search scores: where in the name the query falls, then which field it hit
+SCORE_EXACT = 100
+SCORE_PREFIX = 80
+SCORE_WORD = 70
+SCORE_NAME = 60
+SCORE_CATEGORY = 40
+SCORE_TEXT = 30     # command text or description
+# Fuzzy hits score below every exact tier
+
+# A fuzzy hit must share at least this fraction of the query's trigrams
+FUZZY_MIN_OVERLAP = 0.5
+# Fuzzy matching only kicks in when exact hits are this scarce
+FUZZY_WHEN_FEWER_THAN = 25
+
+# Names a one- or two-character query walks, in list order, for its head
+SHORT_QUERY_WALK = 4096
+
+
+def normalize(text):
+    """Case-fold *text* and collapse runs of whitespace."""
+    return " ".join(str(text or "").split()).casefold()
+
+
+def _grams(*fields):
+    # Fields are padded and joined by two spaces: padding gives word starts
+    # and ends their own trigrams, and a normalized query never contains a
+    # double space, so no trigram spans two fields.
+    text = " " + "  ".join(fields) + " "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _starts(name):
+    """Keys for one- and two-character queries: ``^x``/``^xy`` for the name's
+    prefix and plain ``x``/``xy`` for the start of any word in it."""
+    keys = {"^" + name[:1], "^" + name[:2]}
+    for word in name.split(" "):
+        keys.add(word[:1])
+        keys.add(word[:2])
+    keys.discard("")
+    keys.discard("^")
+    return keys
+
+
+def _post(postings, doc, keys):
+    for key in keys:
+        ids = postings.get(key)
+        if ids is None:
+            postings[key] = {doc}
+        else:
+            ids.add(doc)
+
+
+def _unpost(postings, doc, keys):
+    for key in keys:
+        ids = postings[key]
+        ids.discard(doc)
+        if not ids:
+            del postings[key]
+
+
+# ---------------------------------------------------------------------------
+# Search index
+# ---------------------------------------------------------------------------
+class SearchIndex:
+    """Trigram index over name, command, category and description.
+
+    ``search`` returns ``{id(item): score}`` for every match, ``ranked`` the
+    same ids best first and ``top`` just the first few of them.  Each field
+    group has its own postings so a hit's tier comes from set algebra rather
+    than a scan: names and command text/description are trigram-indexed, and
+    categories, having few distinct values, map straight to their commands.
+    Multi-trigram candidates are verified against the pre-normalized fields.
+    Queries under three characters match name substrings, ranked by whether
+    they start the name or a word in it.  When exact hits are scarce, commands
+    sharing most of the query's trigrams are added as lower-ranked fuzzy hits.
+    """
+
+    def __init__(self, commands=()):
+        self._fields = {}   # doc id -> (name, category, cmd, description), normalized
+        self._names = {}    # doc id -> normalized name, the hottest field
+        self._keys = {}     # doc id -> (name trigrams, text trigrams, starts, category)
+        self._name_postings = {}
+        self._text_postings = {}
+        self._start_postings = {}
+        self._categories = {}  # normalized category -> doc ids
+        self.rebuild(commands)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def _postings(self):
+        return self._name_postings, self._text_postings, self._start_postings, self._categories
+
+    @staticmethod
+    def _index(item):
+        fields = (normalize(item.get("name")), normalize(item.get("category")),
+                  normalize(item.get("cmd")), normalize(item.get("description")))
+        keys = (_grams(fields[0]), _grams(fields[2], fields[3]), _starts(fields[0]), (fields[1],))
+        return fields, keys
+
+    def rebuild(self, commands):
+        self._fields = {}
+        self._names = {}
+        self._keys = {}
+        self._name_postings = {}
+        self._text_postings = {}
+        self._start_postings = {}
+        self._categories = {}
+        self.extend(commands)
+
+    def extend(self, items):
+        """Index (or re-index) *items* in one pass, which is much cheaper
+        than an ``add`` per item."""
+        fields_by_doc = self._fields
+        names = self._names
+        keys_by_doc = self._keys
+        lists = tuple(defaultdict(list) for _ in range(4))
+        for item in items:
+            doc = id(item)
+            if doc in fields_by_doc:
+                self.remove(item)
+            fields, keys = self._index(item)
+            fields_by_doc[doc] = fields
+            names[doc] = fields[0]
+            keys_by_doc[doc] = keys
+            for postings, doc_keys in zip(lists, keys):
+                for key in doc_keys:
+                    postings[key].append(doc)
+        for postings, new in zip(self._postings(), lists):
+            for key, docs in new.items():
+                ids = postings.get(key)
+                if ids is None:
+                    postings[key] = set(docs)
+                else:
+                    ids.update(docs)
+
+    def add(self, item):
+        doc = id(item)
+        if doc in self._fields:
+            self.remove(item)
+        fields, keys = self._index(item)
+        self._fields[doc] = fields
+        self._names[doc] = fields[0]
+        self._keys[doc] = keys
+        for postings, doc_keys in zip(self._postings(), keys):
+            _post(postings, doc, doc_keys)
+
+    def update(self, item):
+        """Re-index *item* after it was edited in place."""
+        self.add(item)
+
+    def remove(self, item):
+        doc = id(item)
+        if self._fields.pop(doc, None) is None:
+            return
+        del self._names[doc]
+        for postings, doc_keys in zip(self._postings(), self._keys.pop(doc)):
+            _unpost(postings, doc, doc_keys)
+
+    def search(self, query):
+        """Return ``{doc id: score}`` for commands matching *query*."""
+        q = normalize(query)
+        fields = self._fields
+        if not q:
+            return dict.fromkeys(fields, 0)
+        if len(q) < 3:
+            # Too short for trigrams; a scan of the names is no more work
+            # than the (usually large) result it produces
+            hits = dict.fromkeys([doc for doc, name in self._names.items() if q in name], SCORE_NAME)
+            starts = self._start_postings
+            hits.update(dict.fromkeys(starts.get(q, ()), SCORE_WORD))
+            prefixed = starts.get("^" + q, ())
+            hits.update(dict.fromkeys(prefixed, SCORE_PREFIX))
+            hits.update(dict.fromkeys([doc for doc in prefixed if self._names[doc] == q], SCORE_EXACT))
+            return hits
+
+        grams = [q[i:i + 3] for i in range(len(q) - 2)]
+        verify = len(grams) > 1  # a single trigram hit is already a substring hit
+
+        # Lowest tier first so better tiers overwrite it
+        text = self._intersect(self._text_postings, grams)
+        if verify:
+            text = [doc for doc in text if q in fields[doc][2] or q in fields[doc][3]]
+        hits = dict.fromkeys(text, SCORE_TEXT)
+
+        for category, docs in self._categories.items():
+            if q in category:
+                hits.update(dict.fromkeys(docs, SCORE_CATEGORY))
+
+        in_name = self._intersect(self._name_postings, grams)
+        if verify:
+            names = self._names
+            in_name = {doc for doc in in_name if q in names[doc]}
+        if in_name:
+            hits.update(dict.fromkeys(in_name, SCORE_NAME))
+            self._rank_name_hits(q, in_name, hits)
+
+        if len(hits) < FUZZY_WHEN_FEWER_THAN:
+            self._fuzzy(_grams(q), hits)
+        return hits
+
+    def ranked(self, query, position):
+        """Ids of the commands matching *query*, best first; *position* maps
+        an id to its place in the list, which orders ties."""
+        hits = self.search(query)
+        order = sorted(hits, key=position)
+        order.sort(key=hits.__getitem__, reverse=True)  # stable, so ties keep list order
+        return order
+
+    def top(self, query, position, limit, order=()):
+        """The first *limit* ids of ``ranked(query, position)``, or None.
+
+        Name hits outrank every other tier, so when at least *limit* names
+        match, the head of the ranking comes from them alone: the text
+        fields are never searched, and each lower name tier is only worked
+        out if the better ones fall short.  *order*, the ids in list order,
+        lets a short query stop scanning names once the head is full.  None
+        means the query is narrow enough that ``ranked`` costs no more.
+        """
+        q = normalize(query)
+        if not q:
+            return None
+        names = self._names
+        starts = self._start_postings
+        if len(q) < 3:
+            # Every prefix is also a word start; plain substrings rank below
+            # both and are found by walking the list until the head is full
+            at_word = starts.get(q, ())
+            at_start = starts.get("^" + q, ())
+            head = self._head([[doc for doc in at_start if names[doc] == q], at_start, at_word], position, limit)
+            if len(head) < limit:
+                if not order:
+                    return None
+                # Walking the list beats scanning every name only when the
+                # matches are common enough to fill the head early on
+                chunk = list(islice(order, SHORT_QUERY_WALK))
+                found = [doc for doc, name in zip(chunk, map(names.__getitem__, chunk)) if q in name]
+                head += [doc for doc in found if doc not in at_word] if at_word else found
+                if len(head) < limit and len(chunk) == SHORT_QUERY_WALK:
+                    return None
+                del head[limit:]
+            return head
+
+        grams = [q[i:i + 3] for i in range(len(q) - 2)]
+        found = self._intersect(self._name_postings, grams)  # every name hit, maybe more
+        if len(found) < limit:
+            return None
+        at_start = [doc for doc in found.intersection(starts.get("^" + q[:2], ())) if names[doc].startswith(q)]
+        tiers = [[doc for doc in at_start if names[doc] == q], at_start]
+        if len(at_start) < limit:
+            word = " " + q
+            at_word = [doc for doc in found.intersection(starts.get(q[:2], ())) if word in names[doc]]
+            tiers.append(at_word)
+            if len(set(at_start).union(at_word)) < limit:
+                if len(grams) > 1:
+                    found = {doc for doc in found if q in names[doc]}
+                    if len(found) < limit:
+                        return None
+                tiers.append(found)
+        return self._head(tiers, position, limit)
+
+    @staticmethod
+    def _head(tiers, position, limit):
+        # Best tier first; a doc ranks in the first tier holding it
+        order = []
+        for tier in tiers:
+            take = limit - len(order)
+            if take <= 0:
+                break
+            if order:
+                tier = set(tier).difference(order)
+            order += heapq.nsmallest(take, tier, key=position)
+        return order
+
+    def _rank_name_hits(self, q, in_name, hits):
+        # Word and prefix candidates come from the start postings, so only
+        # they are checked against the name itself
+        names = self._names
+        starts = self._start_postings
+        word = " " + q
+        at_word = in_name.intersection(starts.get(q[:2], ()))
+        hits.update(dict.fromkeys([doc for doc in at_word if word in names[doc]], SCORE_WORD))
+        at_start = [doc for doc in in_name.intersection(starts.get("^" + q[:2], ())) if names[doc].startswith(q)]
+        hits.update(dict.fromkeys(at_start, SCORE_PREFIX))
+        hits.update(dict.fromkeys([doc for doc in at_start if names[doc] == q], SCORE_EXACT))
+
+    @staticmethod
+    def _intersect(postings, grams):
+        sets = sorted((postings.get(g, ()) for g in grams), key=len)
+        if not sets[0]:
+            return ()
+        return sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+
+    def _fuzzy(self, grams, hits):
+        counts = Counter()
+        names, text = self._name_postings, self._text_postings
+        empty = frozenset()
+        for g in grams:
+            # Names mostly repeat the command text: count each doc once
+            # without building the union of the two
+            in_text = text.get(g, empty)
+            counts.update(in_text)
+            counts.update(names.get(g, empty).difference(in_text))
+        need = FUZZY_MIN_OVERLAP * len(grams)
+        for doc, shared in counts.items():
+            if shared >= need and doc not in hits:
+                # Below every exact tier, ordered by overlap
+                hits[doc] = int(19 * shared / len(grams))
+
+
+# ---------------------------------------------------------------------------
+# Category index
+# ---------------------------------------------------------------------------
+class CategoryIndex:
+    """Per-category command counts and custom-category icons.
+
+    Counts and icon lookups are O(1); every add, edit and remove adjusts one
+    or two counters.  The sorted category list is cached and only re-sorted
+    when a category appears or disappears.
+    """
+
+    def __init__(self, commands=(), custom=()):
+        self._counts = Counter()  # category -> number of commands in it
+        self._of = {}             # doc id -> category it is counted under
+        self._icons = {}          # custom category -> icon ("" for none)
+        self._sorted = None
+        self.rebuild(commands, custom)
+
+    def rebuild(self, commands, custom=()):
+        self._of = {id(item): item.get("category", "") for item in commands}
+        self._counts = Counter(self._of.values())
+        self._icons = {info["name"]: info.get("icon", "") for info in custom}
+        self._sorted = None
+
+    def __len__(self):
+        """Number of commands indexed."""
+        return len(self._of)
+
+    def count(self, category):
+        return self._counts.get(category, 0)
+
+    def icon(self, category):
+        return self._icons.get(category, "")
+
+    def is_custom(self, category):
+        return category in self._icons
+
+    def categories(self):
+        """Sorted names of every category in use or custom-defined."""
+        if self._sorted is None:
+            cats = {cat for cat, n in self._counts.items() if cat and n > 0}
+            cats.update(self._icons)
+            self._sorted = sorted(cats)
+        return self._sorted
+
+    def add_custom(self, info):
+        if info["name"] not in self._icons:
+            self._sorted = None
+        self._icons[info["name"]] = info.get("icon", "")
+
+    def add(self, item):
+        doc = id(item)
+        if doc in self._of:
+            self.remove(item)
+        cat = item.get("category", "")
+        self._of[doc] = cat
+        self._counts[cat] += 1
+        if self._counts[cat] == 1:
+            self._sorted = None
+
+    def update(self, item):
+        """Re-count *item* after it was edited in place."""
+        self.add(item)
+
+    def remove(self, item):
+        cat = self._of.pop(id(item), None)
+        if cat is None:
+            return
+        self._counts[cat] -= 1
+        if not self._counts[cat]:
+            del self._counts[cat]
+            self._sorted = None
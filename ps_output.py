@@ -0,0 +1,435 @@
+"""Output pipeline for PowerShell Command Runner.
+
+Pure-Python stages between the raw bytes coming off a process and the Tk
+widget that shows it.  Nothing in here touches Tk, so it can be exercised
+(and benchmarked) without a display.
+"""
+import codecs
+import os
+import re
+from itertools import repeat
+
+# ANSI CSI sequences: colours, cursor moves, ``ESC[?25l`` and the like
+_CSI_RE = re.compile(r"\x1b\[[0-?]*[ -/]*[@-~]")
+# The same, splitting text into [text, params, final byte, text, ...]
+_CSI_SPLIT_RE = re.compile(r"\x1b\[([0-?]*)[ -/]*([@-~])")
+# SGR (colour) sequences only, splitting text into [text, params, text, ...]
+_SGR_SPLIT_RE = re.compile(r"\x1b\[([0-9;]*)m")
+# The start of a CSI sequence cut off by the end of a chunk
+_PARTIAL_CSI_RE = re.compile(r"\x1b(?:\[[0-?]*[ -/]*)?\Z")
+# A \r\n with escape sequences (a colour reset, say) between its halves
+_CR_ESCAPES_LF_RE = re.compile(r"\r((?:\x1b\[[0-?]*[ -/]*[@-~])+)\n")
+# A \r at the end of a chunk, perhaps followed by escape sequences: the
+# first half of a \r\n whose \n has not arrived yet
+_CR_TAIL_RE = re.compile(r"\r(?:\x1b\[[0-?]*[ -/]*[@-~])*(?:\x1b(?:\[[0-?]*[ -/]*)?)?\Z")
+# Longest escape sequence held back waiting for the rest of it
+MAX_HELD_ESCAPE = 64
+
+
+def sanitize(text):
+    """Strip escape sequences and BOMs and turn \\r\\n into \\n.
+
+    Each pass is a C-level scan that returns *text* itself when it has
+    nothing to do; one regex alternating over all three is several times
+    slower, since it loses the fast search for the leading ESC.
+    """
+    if "\x1b" in text:
+        text = _CSI_RE.sub("", text)
+    return text.replace("\ufeff", "").replace("\r\n", "\n")
+
+
+def oem_encoding():
+    """The console's OEM code page on Windows (e.g. ``cp850``), else None.
+
+    Windows PowerShell writes redirected output in this code page unless the
+    command sets ``[Console]::OutputEncoding``.
+    """
+    if os.name != "nt":
+        return None
+    try:
+        import ctypes
+        cp = ctypes.windll.kernel32.GetOEMCP()
+    except (AttributeError, OSError):
+        return None
+    if cp == 65001:
+        return None
+    try:
+        return codecs.lookup(f"cp{cp}").name
+    except LookupError:
+        return None
+
+
+OEM_ENCODING = oem_encoding()
+
+
+# ---------------------------------------------------------------------------
+# ANSI colours
+# ---------------------------------------------------------------------------
+# The 16 console colours (Windows Terminal "Campbell"); 256-colour and
+# RGB sequences are mapped to the nearest of these, which keeps the set of
+# distinct styles, and so of Text tags, small
+ANSI_PALETTE = (
+    "#0C0C0C", "#C50F1F", "#13A10E", "#C19C00", "#0037DA", "#881798", "#3A96DD", "#CCCCCC",
+    "#767676", "#E74856", "#16C60C", "#F9F1A5", "#3B78FF", "#B4009E", "#61D6D6", "#F2F2F2",
+)
+_PALETTE_RGB = tuple(tuple(int(c[i:i + 2], 16) for i in (1, 3, 5)) for c in ANSI_PALETTE)
+
+# Style flags
+BOLD = 1
+UNDERLINE = 2
+INVERSE = 4
+
+# A style is (foreground, background, flags); colours are palette indices,
+# None for the widget's default
+DEFAULT_STYLE = (None, None, 0)
+
+# Plain red, yellow and green text (PowerShell 7's error, warning and table
+# header colours) reuse the output panel's own tags
+_SEMANTIC_TAGS = {1: "error", 9: "error", 3: "warning", 11: "warning", 2: "success", 10: "success"}
+
+_TAG_STYLES = {}        # tag name -> style, for every tag handed out
+_SGR_MEMO = {}          # (style, params) -> (style, tag)
+_SGR_MEMO_MAX = 4096    # RGB sequences could otherwise grow it without bound
+
+# For the chunk-at-a-time fast path, by SGR params seen before: its kind
+# ("r" a plain reset, "a" starting with a reset, "l" relative to the current
+# style) and the style and tag it gives when applied to the default style
+_SGR_KIND = {}
+_SGR_STYLE = {}
+_SGR_TAG = {}
+
+
+def tag_style(tag):
+    """The ``(fg, bg, flags)`` style behind an ANSI tag, or None if *tag*
+    is not one."""
+    return _TAG_STYLES.get(tag)
+
+
+def _tag_for(style):
+    fg, bg, flags = style
+    if style == DEFAULT_STYLE:
+        return None
+    if bg is None and not flags & ~BOLD and fg in _SEMANTIC_TAGS:
+        return _SEMANTIC_TAGS[fg]
+    tag = f"ansi-{'x' if fg is None else fg}-{'x' if bg is None else bg}-{flags}"
+    _TAG_STYLES[tag] = style
+    return tag
+
+
+def _nearest(r, g, b):
+    return min(range(16), key=lambda i: (_PALETTE_RGB[i][0] - r) ** 2 + (_PALETTE_RGB[i][1] - g) ** 2 + (_PALETTE_RGB[i][2] - b) ** 2)
+
+
+def _colour_256(n):
+    if n < 16:
+        return n
+    if n < 232:
+        levels = (0, 95, 135, 175, 215, 255)
+        n -= 16
+        return _nearest(levels[n // 36], levels[n // 6 % 6], levels[n % 6])
+    grey = 8 + 10 * (n - 232)
+    return _nearest(grey, grey, grey)
+
+
+def _apply_sgr(style, params):
+    """Apply one SGR sequence's parameters to *style*."""
+    fg, bg, flags = style
+    codes = iter(params.split(";"))
+    for code in codes:
+        if not code:
+            n = 0
+        elif code.isdigit():
+            n = int(code)
+        else:
+            continue  # colon sub-parameters and the like
+        if n == 0:
+            fg, bg, flags = DEFAULT_STYLE
+        elif 30 <= n <= 37:
+            fg = n - 30
+        elif 90 <= n <= 97:
+            fg = n - 82
+        elif 40 <= n <= 47:
+            bg = n - 40
+        elif 100 <= n <= 107:
+            bg = n - 92
+        elif n == 39:
+            fg = None
+        elif n == 49:
+            bg = None
+        elif n == 1:
+            flags |= BOLD
+        elif n == 22:
+            flags &= ~BOLD
+        elif n == 4:
+            flags |= UNDERLINE
+        elif n == 24:
+            flags &= ~UNDERLINE
+        elif n == 7:
+            flags |= INVERSE
+        elif n == 27:
+            flags &= ~INVERSE
+        elif n in (38, 48):
+            try:
+                mode = next(codes)
+                if mode == "5":
+                    colour = _colour_256(int(next(codes)) & 0xFF)
+                elif mode == "2":
+                    colour = _nearest(*(int(next(codes)) & 0xFF for _ in range(3)))
+                else:
+                    continue
+            except (StopIteration, ValueError):
+                break
+            if n == 38:
+                fg = colour
+            else:
+                bg = colour
+    return (fg, bg, flags)
+
+
+def _sgr(style, params):
+    """``(new style, its tag)`` after an SGR sequence, memoized: output
+    repeats the same few sequences over and over."""
+    key = (style, params)
+    result = _SGR_MEMO.get(key)
+    if result is None:
+        if len(_SGR_MEMO) >= _SGR_MEMO_MAX:
+            for table in (_SGR_MEMO, _SGR_KIND, _SGR_STYLE, _SGR_TAG):
+                table.clear()
+        new = _apply_sgr(style, params)
+        result = _SGR_MEMO[key] = (new, _tag_for(new))
+    if params not in _SGR_KIND and not params.strip("0123456789;"):
+        _SGR_STYLE[params] = fresh = _apply_sgr(DEFAULT_STYLE, params)
+        _SGR_TAG[params] = _tag_for(fresh)
+        _SGR_KIND[params] = "r" if fresh == DEFAULT_STYLE and params in ("", "0") else (
+            "a" if params == "0" or params.startswith("0;") else "l")
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Decoder
+# ---------------------------------------------------------------------------
+class OutputDecoder:
+    """Turns one run's output bytes into display text, chunk by chunk.
+
+    Meant to run on the run's reader thread: ``decode`` accepts any buffer
+    (a ``memoryview`` into a reused read buffer is never copied).  It
+    returns plain text while the output is unstyled, and once SGR colour
+    sequences appear a flat ``[text, tag, text, tag, ...]`` list (the
+    argument order of ``Text.insert``), with tags from the interned palette
+    (see :func:`tag_style`) and None for the default style.  Other escape
+    sequences and BOMs are dropped and \\r\\n becomes \\n, even with colour
+    changes between the two.  A multibyte character, escape sequence or
+    \\r\\n split across two reads is held back until the rest of it arrives
+    instead of turning into replacement characters or a stray \\r.
+
+    Output is taken to be UTF-8.  With a *fallback* encoding (the console
+    code page by default) the decoder starts strict: invalid UTF-8 seen
+    before any valid multibyte character means the host is writing in the
+    code page, and the rest of the run is decoded with *fallback*.
+    """
+
+    def __init__(self, encoding="utf-8", fallback=OEM_ENCODING):
+        if fallback and codecs.lookup(fallback).name == codecs.lookup(encoding).name:
+            fallback = None
+        self.encoding = encoding
+        self._fallback = fallback
+        self._decoder = codecs.getincrementaldecoder(encoding)("strict" if fallback else "replace")
+        self._held = ""
+        self._style = DEFAULT_STYLE
+        self._tag = None
+
+    def decode(self, data, final=False):
+        try:
+            text = self._decoder.decode(data, final)
+        except UnicodeDecodeError:
+            # Only raised while the encoding is still undecided
+            text = self._settle(self._fallback, data, final)
+        else:
+            if self._fallback and not text.isascii():
+                self._settle(self.encoding)
+        if self._held:
+            text = self._held + text
+            self._held = ""
+        if not text.isascii():
+            text = text.replace("\ufeff", "")
+        if "\r" in text:
+            text = text.replace("\r\n", "\n")
+            if "\r\x1b" in text:
+                text = _CR_ESCAPES_LF_RE.sub(r"\1\n", text)
+        cr = text.rfind("\r", max(0, len(text) - MAX_HELD_ESCAPE))
+        esc = text.rfind("\x1b", max(0, len(text) - MAX_HELD_ESCAPE))
+        if not final and cr >= 0 and _CR_TAIL_RE.match(text, cr):
+            # May be the first half of a \r\n, escapes and all
+            self._held = text[cr:]
+            text = text[:cr]
+        elif esc >= 0 and _PARTIAL_CSI_RE.match(text, esc):
+            # Wait for the rest of it; at the end of the stream it can never
+            # complete, so it is dropped rather than shown as raw text
+            if not final:
+                self._held = text[esc:]
+            text = text[:esc]
+        if "\x1b" in text:
+            return self._runs(text)
+        if self._tag is None or not text:
+            return text
+        return [text, self._tag]
+
+    def _runs(self, text):
+        # Fast path, with no Python-level work per sequence: when every
+        # escape is an SGR sequence seen before and none of them depends on
+        # the style before it (each relative one follows a plain reset), a
+        # single dict lookup per sequence, done by map() in C, gives its tag
+        parts = _SGR_SPLIT_RE.split(text)
+        heads = parts[1::2]
+        if text.count("\x1b") == len(heads):
+            kinds = "".join(map(_SGR_KIND.get, heads, repeat("?")))
+            if ("?" not in kinds and "ll" not in kinds and "al" not in kinds
+                    and (kinds[0] != "l" or self._style == DEFAULT_STYLE)):
+                tags = list(map(_SGR_TAG.__getitem__, heads))
+                self._style = _SGR_STYLE[heads[-1]]
+                parts.append(self._tag)
+                self._tag = tags[-1]
+                # [t0, p1, t1, ..., pn, tn, tag0] -> [t0, tag0, t1, tag1, ...]
+                parts[1::2] = parts[-1:] + tags
+                return parts
+
+        # General path: walk the sequences, SGR ones move the style and the
+        # rest are dropped
+        parts = _CSI_SPLIT_RE.split(text)
+        style, tag = self._style, self._tag
+        runs = [parts[0], tag] if parts[0] else []
+        memo = _SGR_MEMO
+        for params, final, chunk in zip(parts[1::3], parts[2::3], parts[3::3]):
+            if final == "m":
+                style, tag = memo.get((style, params)) or _sgr(style, params)
+            if chunk:
+                runs += (chunk, tag)
+        self._style, self._tag = style, tag
+        return runs
+
+    def flush(self):
+        """Text still held back at the end of the run, less any escape
+        sequence left unfinished."""
+        return self.decode(b"", final=True)
+
+    def _settle(self, encoding, data=b"", final=False):
+        # Swap in a lenient decoder; bytes the old one was holding (and, on
+        # a decode error, the chunk it rejected) are decoded again
+        pending = self._decoder.getstate()[0]
+        self._decoder = codecs.getincrementaldecoder(encoding)("replace")
+        self.encoding = encoding
+        self._fallback = None
+        return self._decoder.decode(pending + bytes(data), final)
+
+
+# ---------------------------------------------------------------------------
+# Frame batch
+# ---------------------------------------------------------------------------
+class OutputBatch:
+    """Collects one frame's worth of output and folds ``\\r`` overwrites.
+
+    Progress bars send thousands of bare carriage returns; applying each one
+    to the widget costs an index lookup and a delete.  Here they are resolved
+    against the pending text instead, so a whole frame reduces to at most one
+    delete (of the widget's current last line) followed by one insert.
+
+    A trailing ``\\r`` is held back until the next write because it may be the
+    first half of a ``\\r\\n`` split across two reads.
+    """
+
+    def __init__(self):
+        self._runs = []          # [text, tag, text, tag, ...] waiting to be inserted
+        self._erase_line = False  # clear the widget's last line first
+        self._held_cr = False
+
+    @property
+    def pending(self):
+        return bool(self._runs) or self._erase_line
+
+    def write(self, text, tag=None):
+        if self._held_cr:
+            self._held_cr = False
+            if not text.startswith("\n"):
+                self._carriage_return()
+        if text.endswith("\r"):
+            text = text[:-1]
+            self._held_cr = True
+        if "\r" not in text:
+            if text:
+                self._runs += (text, tag)
+            return
+        for i, part in enumerate(text.split("\r")):
+            if i:
+                self._carriage_return()
+            if part:
+                self._runs += (part, tag)
+
+    def write_runs(self, runs):
+        """``write`` for a flat ``[text, tag, ...]`` list from an
+        OutputDecoder, taken over as is when no ``\\r`` needs folding."""
+        texts = runs[0::2]
+        joined = "".join(texts)
+        cut = joined.rfind("\r")
+        if cut < 0 and not self._held_cr:
+            self._runs += runs
+            return
+        if (0 <= cut < len(joined) - 1 and joined[cut + 1] != "\n"
+                and "\n" not in joined[:cut]):
+            # A progress update: everything up to the last \r overwrites the
+            # current line, so one carriage return stands for all of them
+            self._held_cr = False
+            self._carriage_return()
+            i = len(texts) - 1
+            while "\r" not in texts[i]:
+                i -= 1
+            self._runs += (texts[i].rpartition("\r")[2], runs[2 * i + 1])
+            self._runs += runs[2 * i + 2:]
+            return
+        for text, tag in zip(texts, runs[1::2]):
+            self.write(text, tag)
+
+    def _carriage_return(self):
+        # Back up to the last newline still pending; if there is none the
+        # overwrite reaches into the widget's last line.
+        runs = self._runs
+        while runs:
+            text = runs[-2]
+            nl = text.rfind("\n")
+            if nl >= 0:
+                runs[-2] = text[:nl + 1]
+                return
+            del runs[-2:]
+        self._erase_line = True
+
+    def take(self):
+        """Return ``(erase_line, insert_args)`` and reset the batch.
+
+        *insert_args* alternates text and tag, ready for a single
+        ``Text.insert("end", *insert_args)`` call; adjacent runs sharing a tag
+        are merged.
+        """
+        args = []
+        texts = []
+        cur_tag = None
+        runs = self._runs
+        for text, tag in zip(runs[0::2], runs[1::2]):
+            if not text:
+                continue
+            if texts and tag != cur_tag:
+                args.append("".join(texts))
+                args.append(cur_tag or "")
+                texts = []
+            cur_tag = tag
+            texts.append(text)
+        if texts:
+            args.append("".join(texts))
+            args.append(cur_tag or "")
+        erase = self._erase_line
+        self._runs = []
+        self._erase_line = False
+        return erase, args
+
+    def clear(self):
+        self._runs = []
+        self._erase_line = False
+        self._held_cr = False
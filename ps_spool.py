@@ -0,0 +1,179 @@
+"""Spooled output for PowerShell Command Runner.
+
+Runs that print hundreds of megabytes (event log exports, recursive
+listings) cannot live in a Tk Text widget.  An :class:`OutputSpool` writes
+a run's decoded output to a file on disk instead and reads back only the
+lines asked for, through an mmap of that file, so the viewer shows a window
+of lines and scrolling, jumping to the end and searching cost the same at
+any size.
+
+Lines are found through a sparse index: a checkpoint ``(byte offset, line
+number)`` at a line start roughly every CHECKPOINT_BYTES.  Locating a line
+scans forward from the nearest checkpoint, which keeps the index at a few
+bytes per kilobyte of output while every lookup stays bounded.  Nothing here
+touches Tk.
+"""
+import mmap
+import os
+import shutil
+import tempfile
+from array import array
+from bisect import bisect_right
+
+# Bytes of output between line-index checkpoints
+CHECKPOINT_BYTES = 16 * 1024
+# Longest line returned by read_lines; the rest of it stays in the spool
+MAX_LINE_BYTES = 4096
+
+
+class OutputSpool:
+    """One run's output in a file: append as it arrives, read lines back by
+    number.
+
+    The file is a temporary one (in *directory*, or the system temp dir)
+    removed by ``close``.  Text is stored as UTF-8 exactly as written, bare
+    ``\\r`` overwrites included; :meth:`read_lines` resolves those to the
+    text after the last ``\\r``, as the output panel would show it.
+    """
+
+    def __init__(self, directory=None):
+        fd, self.path = tempfile.mkstemp(prefix="psrunner-", suffix=".log", dir=directory)
+        # Read/write: an mmap of the file needs read access to the handle
+        self._file = os.fdopen(fd, "w+b")
+        self._map = None
+        self._mapped = 0     # bytes covered by self._map
+        self._flushed = True
+        self._reset()
+
+    def _reset(self):
+        self.size = 0
+        self.newlines = 0
+        self._tail_start = 0  # offset of the last (unterminated) line
+        self._cp_offsets = array("Q", [0])
+        self._cp_lines = array("Q", [0])
+
+    @property
+    def lines(self):
+        """Line count, counting a last line with no newline yet."""
+        return self.newlines + (1 if self.size > self._tail_start else 0)
+
+    # -- Writing -----------------------------------------------------------
+    def write(self, text):
+        """Append output (str or UTF-8 bytes)."""
+        data = text.encode("utf-8") if isinstance(text, str) else text
+        if not data:
+            return
+        self._file.write(data)
+        self._flushed = False
+        last = data.rfind(b"\n")
+        if last >= 0:
+            self.newlines += data.count(b"\n")
+            self._tail_start = self.size + last + 1
+            if self._tail_start - self._cp_offsets[-1] >= CHECKPOINT_BYTES:
+                self._cp_offsets.append(self._tail_start)
+                self._cp_lines.append(self.newlines)
+        self.size += len(data)
+
+    def clear(self):
+        """Drop everything written so far."""
+        self._unmap()
+        self._file.seek(0)
+        self._file.truncate()
+        self._flushed = True
+        self._reset()
+
+    def save(self, path):
+        """Copy the spool to *path* as it is on disk, without reading it
+        through the viewer."""
+        self._sync()
+        shutil.copyfile(self.path, path)
+
+    def close(self):
+        """Release the mapping and delete the spool file."""
+        self._unmap()
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    # -- Reading -----------------------------------------------------------
+    def _sync(self):
+        if not self._flushed:
+            self._file.flush()
+            self._flushed = True
+
+    def _unmap(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            self._mapped = 0
+
+    def _view(self):
+        """The mmap, remapped if output arrived since it was made; None
+        while the spool is empty (an empty file cannot be mapped)."""
+        if self._mapped < self.size:
+            self._sync()
+            self._unmap()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped = len(self._map)
+        return self._map
+
+    def line_offset(self, n):
+        """Byte offset where line *n* (0-based) starts."""
+        n = max(0, min(n, self.newlines))
+        if n == self.newlines:
+            return self._tail_start
+        i = bisect_right(self._cp_lines, n) - 1
+        pos = self._cp_offsets[i]
+        mm = self._view()
+        for _ in range(n - self._cp_lines[i]):
+            pos = mm.find(b"\n", pos) + 1
+        return pos
+
+    def line_at(self, offset):
+        """Number of the line containing byte *offset*."""
+        i = bisect_right(self._cp_offsets, offset) - 1
+        start = self._cp_offsets[i]
+        mm = self._view()
+        return self._cp_lines[i] + (mm[start:offset].count(b"\n") if mm is not None else 0)
+
+    def read_lines(self, first, count):
+        """Up to *count* lines from line *first* on, as text without their
+        newlines.  Lines longer than MAX_LINE_BYTES are cut short."""
+        mm = self._view()
+        if mm is None or count <= 0 or first >= self.lines:
+            return []
+        pos = self.line_offset(first)
+        size = self._mapped
+        out = []
+        while len(out) < count and pos < size:
+            end = mm.find(b"\n", pos, size)
+            if end < 0:
+                end = size
+            text = mm[pos:min(end, pos + MAX_LINE_BYTES)].decode("utf-8", errors="replace")
+            if "\r" in text:
+                text = text.rstrip("\r").rpartition("\r")[2]
+            out.append(text)
+            pos = end + 1
+        return out
+
+    def find(self, needle, line=0, forward=True):
+        """Number of the next line after *line* (the previous one before it
+        when not *forward*) containing *needle*, case-sensitively; None if
+        there is none.
+
+        The search runs over the mapped bytes as they are, with no decoding
+        or line splitting.
+        """
+        mm = self._view()
+        pattern = needle.encode("utf-8")
+        if mm is None or not pattern:
+            return None
+        if forward:
+            hit = mm.find(pattern, self.line_offset(line + 1))
+        else:
+            end = self.size if line >= self.lines else self.line_offset(line)
+            hit = mm.rfind(pattern, 0, end)
+        return None if hit < 0 else self.line_at(hit)
@@ -0,0 +1,716 @@
+"""Persistent stores for PowerShell Command Runner.
+
+Everything here is plain file I/O with no Tk, so the GUI and headless tools
+can share it.
+"""
+import copy
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+import zlib
+
+# Seconds of quiet before pending config changes are written
+CONFIG_SAVE_DELAY = 0.5
+
+
+def write_atomic(path, text):
+    """Replace *path* with *text* so readers see the old or new file, never
+    a truncated one."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# ---------------------------------------------------------------------------
+# Config store
+# ---------------------------------------------------------------------------
+class ConfigStore:
+    """config.json, loaded once and kept in memory.
+
+    ``set`` only marks the store dirty and (re)arms a timer; the file is
+    written from the timer thread once changes stop arriving, or right away
+    by ``flush``.  Values are copied on ``set`` so later mutation by the
+    caller cannot race the writer.
+    """
+
+    def __init__(self, path, delay=CONFIG_SAVE_DELAY):
+        self.path = path
+        self.delay = delay
+        self._data = {}
+        self._dirty = False
+        self._timer = None
+        self._lock = threading.Lock()        # guards _data, _dirty, _timer
+        self._write_lock = threading.Lock()  # one writer at a time
+        self.reload()
+
+    def reload(self):
+        """Re-read the file, dropping changes not yet written."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        with self._lock:
+            self._data = data if isinstance(data, dict) else {}
+            self._dirty = False
+
+    def get(self, key, default=None):
+        with self._lock:
+            return copy.deepcopy(self._data.get(key, default))
+
+    def set(self, key, value):
+        value = copy.deepcopy(value)
+        with self._lock:
+            if key in self._data and self._data[key] == value:
+                return
+            self._data[key] = value
+            self._dirty = True
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write pending changes now; a no-op when nothing changed."""
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                text = json.dumps(self._data)
+                self._dirty = False
+            try:
+                write_atomic(self.path, text)
+            except OSError:
+                with self._lock:
+                    self._dirty = True
+
+    def close(self):
+        self.flush()
+
+
+# ---------------------------------------------------------------------------
+# Command store
+# ---------------------------------------------------------------------------
+# While the app runs, the journal is compacted into a fresh snapshot once it
+# outgrows the snapshot itself (and this floor, so small libraries are not
+# rewritten often); whatever is left is folded in by close()
+COMPACT_MIN_BYTES = 256 * 1024
+
+
+def _sha1(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+class CommandStore:
+    """The command list, persisted as a snapshot plus an append-only journal.
+
+    commands.json stays a plain list of dicts (the import/export format) and
+    is only rewritten by compaction.  Each mutation appends one JSON line to
+    commands.journal, whose first line records the SHA-1 of the snapshot it
+    applies to.  Compaction serializes a copy of the list on a worker thread,
+    then swaps in the new snapshot and a new journal (``.new``) carrying the
+    mutations made meanwhile.  A crash at any point leaves one journal whose
+    base matches the snapshot on disk; load replays that one.
+
+    Mutations are positional and mirror list methods; callers change items
+    only through them.  Loading happens on a background thread started by
+    ``preload``, and ``items`` waits for it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + ".journal"
+        self.load_error = None   # message when the snapshot or journal was unreadable
+        self._items = None
+        self._loader = None
+        self._journal = None     # open file, created on the first mutation
+        self._live = self.journal_path  # the journal matching the snapshot on disk
+        self._base = None        # SHA-1 of the snapshot on disk
+        self._snapshot_bytes = 0
+        self._journal_bytes = 0
+        self._since = None       # ops logged while a compaction runs
+        self._compactor = None
+        self._lock = threading.Lock()
+
+    # -- loading ------------------------------------------------------------
+    def preload(self):
+        """Start loading in the background."""
+        if self._items is None and self._loader is None:
+            self._loader = threading.Thread(target=self._load, name="cmd-load", daemon=True)
+            self._loader.start()
+
+    @property
+    def items(self):
+        if self._items is None:
+            if self._loader is not None:
+                self._loader.join()
+                self._loader = None
+            if self._items is None:
+                self._load()
+        return self._items
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            data = b""
+        items = []
+        if data:
+            try:
+                items = json.loads(data)
+                if not isinstance(items, list):
+                    raise ValueError("not a list")
+            except ValueError as e:
+                self.load_error = f"{os.path.basename(self.path)} is corrupted ({e})"
+                items = []
+        self._base = _sha1(data)
+        self._snapshot_bytes = len(data)
+        self._journal_bytes = 0
+
+        # Replay whichever journal was written against this snapshot
+        current = None
+        for candidate in (self.journal_path, self.journal_path + ".new"):
+            if current is None and self._replay(candidate, items):
+                current = candidate
+            elif os.path.exists(candidate):
+                try:
+                    os.unlink(candidate)
+                except OSError:
+                    pass
+        self._live = self.journal_path
+        if current and current != self.journal_path:
+            try:
+                os.replace(current, self.journal_path)
+            except OSError:
+                self._live = current
+        self._items = items
+
+    def _replay(self, path, items):
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return False
+        torn = False
+        with f:
+            try:
+                header = f.readline()
+                if json.loads(header).get("base") != self._base:
+                    return False
+            except (ValueError, AttributeError):
+                return False
+            size = 0
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError
+                    op = json.loads(line)
+                except ValueError:
+                    torn = True  # final line cut short by a crash mid-append
+                    break
+                try:
+                    self._apply(items, op)
+                except (LookupError, TypeError) as e:
+                    # An edit that does not fit the list: drop it and the rest
+                    # as if torn, rather than fail the whole load
+                    error = (f"{os.path.basename(path)} has an edit that does not apply "
+                             f"({e!r}); it and later edits were dropped")
+                    self.load_error = f"{self.load_error}; {error}" if self.load_error else error
+                    torn = True
+                    break
+                size += len(line)
+            self._journal_bytes = size
+        if torn:
+            # Cut it off so the next append starts on a fresh line
+            with open(path, "r+b") as f:
+                f.truncate(len(header) + size)
+        return True
+
+    @staticmethod
+    def _apply(items, op):
+        kind = op["op"]
+        if kind == "insert":
+            items.insert(op["at"], op["item"])
+        elif kind == "update":
+            items[op["at"]] = op["item"]
+        elif kind == "delete":
+            del items[op["at"]]
+        elif kind == "move":
+            items.insert(op["to"], items.pop(op["from"]))
+        elif kind == "extend":
+            items.extend(op["items"])
+        elif kind == "clear":
+            items.clear()
+
+    def reload(self):
+        """Drop the in-memory list and read it from disk again."""
+        self.close(fold=False)
+        self._items = None
+        self.load_error = None
+        self._load()
+
+    # -- mutations ----------------------------------------------------------
+    def append(self, item):
+        self.insert(len(self.items), item)
+
+    def insert(self, at, item):
+        self.items.insert(at, item)
+        self._log({"op": "insert", "at": at, "item": item})
+
+    def update(self, at):
+        """Record that the item at *at* was edited in place."""
+        self._log({"op": "update", "at": at, "item": self.items[at]})
+
+    def delete(self, at):
+        item = self.items.pop(at)
+        self._log({"op": "delete", "at": at})
+        return item
+
+    def move(self, src, dst):
+        items = self.items
+        items.insert(dst, items.pop(src))
+        self._log({"op": "move", "from": src, "to": dst})
+
+    def extend(self, new_items):
+        new_items = list(new_items)
+        self.items.extend(new_items)
+        self._log({"op": "extend", "items": new_items})
+
+    def clear(self):
+        self.items.clear()
+        self._log({"op": "clear"})
+
+    # -- journal ------------------------------------------------------------
+    def _header(self, base):
+        return (json.dumps({"base": base}) + "\n").encode("utf-8")
+
+    def _log(self, op):
+        line = (json.dumps(op) + "\n").encode("utf-8")
+        with self._lock:
+            if self._journal is None:
+                self._open_journal()
+            self._journal.write(line)
+            self._journal.flush()
+            self._journal_bytes += len(line)
+            if self._since is not None:
+                self._since.append(line)
+        if self._compactor is None and self._journal_bytes > max(COMPACT_MIN_BYTES, self._snapshot_bytes):
+            self.compact()
+
+    def _open_journal(self):
+        exists = os.path.exists(self._live)
+        self._journal = open(self._live, "ab")
+        if not exists or self._journal.tell() == 0:
+            self._journal.write(self._header(self._base))
+            self._journal_bytes = 0
+
+    def compact(self):
+        """Fold the journal into a new snapshot on a worker thread."""
+        if self._compactor is not None:
+            return
+        # Items hold only strings and flags, so a shallow copy is a snapshot
+        snapshot = [dict(item) for item in self.items]
+        with self._lock:
+            self._since = []
+        self._compactor = threading.Thread(
+            target=self._compact, args=(snapshot,), name="cmd-compact", daemon=True)
+        self._compactor.start()
+
+    def _compact(self, snapshot):
+        try:
+            data = json.dumps(snapshot).encode("utf-8")
+            base = _sha1(data)
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            with self._lock:
+                new = self.journal_path + ".new"
+                if self._live == new:
+                    # An earlier swap failed and mutations went on into .new;
+                    # move it into place before writing another
+                    self._close_journal()
+                    os.replace(new, self.journal_path)
+                    self._live = self.journal_path
+                with open(new, "wb") as f:
+                    f.write(self._header(base))
+                    f.writelines(self._since)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # Snapshot first: until the journal is swapped too, load
+                # finds the .new journal matching it
+                os.replace(tmp, self.path)
+                # .new is now the journal for commands.json; should the swap
+                # below fail, mutations go on being appended to it
+                self._live = new
+                self._base = base
+                self._snapshot_bytes = len(data)
+                self._journal_bytes = sum(len(line) for line in self._since)
+                self._close_journal()
+                os.replace(new, self.journal_path)
+                self._live = self.journal_path
+        except OSError:
+            pass  # the next mutation reopens whichever journal is live
+        finally:
+            with self._lock:
+                self._since = None
+            self._compactor = None
+
+    def _snapshot_unchanged(self):
+        try:
+            with open(self.path, "rb") as f:
+                return _sha1(f.read()) == self._base
+        except OSError:
+            return self._base == _sha1(b"")
+
+    def close(self, fold=True):
+        """Wait for a running compaction and close the journal.
+
+        With *fold*, a non-empty journal is first compacted into the
+        snapshot, so commands.json is current after every session.  That is
+        skipped if commands.json was changed on disk since it was loaded:
+        the next load then keeps the edited file and drops the journal.
+        """
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        if fold and self._items is not None and self._journal_bytes and self._snapshot_unchanged():
+            self._since = []
+            self._compact([dict(item) for item in self._items])
+        with self._lock:
+            if self._journal is not None:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+            self._close_journal()
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+# ---------------------------------------------------------------------------
+# Streaming import
+# ---------------------------------------------------------------------------
+IMPORT_READ_SIZE = 1024 * 1024
+# Items handed to the UI at a time
+IMPORT_BATCH_SIZE = 500
+
+
+def iter_json_array(read, read_size=IMPORT_READ_SIZE):
+    """Yield the elements of a top-level JSON array without holding the whole
+    text; *read* is a text file's ``read``.  Raises ValueError on malformed
+    input."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = read(read_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    skip_ws()
+    if pos >= len(buf) or buf[pos] != "[":
+        raise ValueError("File does not contain a JSON list.")
+    pos += 1
+    skip_ws()
+    if pos < len(buf) and buf[pos] == "]":
+        return
+    while True:
+        skip_ws()
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+            if end == len(buf) and not eof:
+                raise ValueError  # a number may continue in the next chunk
+        except ValueError:
+            if eof:
+                raise ValueError(f"Malformed JSON near character {pos}")
+            fill()
+            continue
+        pos = end
+        yield item
+        skip_ws()
+        if pos >= len(buf):
+            raise ValueError("Unexpected end of file inside the list.")
+        if buf[pos] == "]":
+            return
+        if buf[pos] != ",":
+            raise ValueError(f"Expected ',' or ']' near character {pos}")
+        pos += 1
+
+
+def command_key(item):
+    """Identity used to spot duplicate commands across imports."""
+    text = "\0".join((str(item.get("name", "")), str(item.get("cmd", "")), str(item.get("category", ""))))
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+class CommandImport:
+    """Streams a command file on a worker thread, dropping invalid items and
+    any whose ``command_key`` matches an *existing* item or an earlier one in
+    the file.
+
+    New items arrive on ``batches`` in lists of up to IMPORT_BATCH_SIZE; the
+    caller drains it from the UI thread.  ``progress`` is the fraction of the
+    file read so far; ``error`` is set if the file turned out to be invalid.
+    """
+
+    def __init__(self, path, existing=()):
+        self.path = path
+        self.batches = queue.SimpleQueue()
+        self.added = 0
+        self.duplicates = 0
+        self.progress = 0.0
+        self.error = None
+        self.done = False
+        self._existing = list(existing)
+        self._keys = set()
+        self._cancelled = False
+        self._thread = threading.Thread(target=self._run, name="cmd-import", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled = True
+
+    def _run(self):
+        try:
+            self._keys.update(command_key(item) for item in self._existing)
+            self._existing = None
+            size = max(1, os.path.getsize(self.path))
+            with open(self.path, "r", encoding="utf-8-sig") as f:
+                read = 0
+
+                def counted(n):
+                    nonlocal read
+                    chunk = f.read(n)
+                    read += len(chunk)
+                    self.progress = min(1.0, read / size)
+                    return chunk
+
+                batch = []
+                for item in iter_json_array(counted):
+                    if self._cancelled:
+                        return
+                    if not (isinstance(item, dict) and "name" in item and "cmd" in item):
+                        continue
+                    key = command_key(item)
+                    if key in self._keys:
+                        self.duplicates += 1
+                        continue
+                    self._keys.add(key)
+                    batch.append(item)
+                    if len(batch) >= IMPORT_BATCH_SIZE:
+                        self.added += len(batch)
+                        self.batches.put(batch)
+                        batch = []
+                if batch:
+                    self.added += len(batch)
+                    self.batches.put(batch)
+        except (OSError, ValueError) as e:
+            self.error = str(e)
+        finally:
+            self.progress = 1.0
+            self.done = True
+
+
+# ---------------------------------------------------------------------------
+# Run history
+# ---------------------------------------------------------------------------
+DEFAULT_HISTORY_MAX_DAYS = 30
+DEFAULT_HISTORY_MAX_MB = 50
+# Raw output captured per run; anything beyond is dropped and flagged
+HISTORY_MAX_RUN_BYTES = 16 * 1024 * 1024
+HISTORY_COMPRESS_LEVEL = 6
+
+
+class RunRecord:
+    """Captures one run's output into a zlib stream as it arrives."""
+
+    def __init__(self, history, entry):
+        self.entry = entry
+        self._history = history
+        self._compressor = zlib.compressobj(HISTORY_COMPRESS_LEVEL)
+        self._file = open(history.output_path(entry), "wb")
+        self._t0 = time.monotonic()
+
+    def write(self, data):
+        """Append output: bytes, or decoded text (stored as UTF-8)."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        entry = self.entry
+        room = HISTORY_MAX_RUN_BYTES - entry["bytes"]
+        if room <= 0:
+            entry["truncated"] = True
+            return
+        if len(data) > room:
+            data = data[:room]
+            entry["truncated"] = True
+        entry["bytes"] += len(data)
+        chunk = self._compressor.compress(data)
+        if chunk:
+            self._file.write(chunk)
+
+    def finish(self, exit_code):
+        """Close the capture and add the run to the history index."""
+        entry = self.entry
+        try:
+            self._file.write(self._compressor.flush())
+            entry["size"] = self._file.tell()
+        finally:
+            self._file.close()
+        entry["duration"] = round(time.monotonic() - self._t0, 3)
+        entry["exit"] = exit_code
+        self._history.add(entry)
+
+
+class RunHistory:
+    """Past runs: an index.jsonl of metadata plus one zlib file per run.
+
+    The index is read on first use.  Runs older than *max_age_days* and the
+    oldest runs beyond *max_bytes* of compressed output are pruned when the
+    index loads and whenever a finished run takes it over budget.
+    """
+
+    def __init__(self, directory, max_age_days=DEFAULT_HISTORY_MAX_DAYS,
+                 max_bytes=DEFAULT_HISTORY_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.jsonl")
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self._entries = None  # oldest first
+        self._total = 0
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self._load()
+        return self._entries
+
+    @property
+    def total_bytes(self):
+        if self._entries is None:
+            self._load()
+        return self._total
+
+    def _load(self):
+        entries = []
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        self._entries = entries
+        self._total = sum(e.get("size", 0) for e in entries)
+        self.prune()
+
+    def output_path(self, entry):
+        return os.path.join(self.directory, entry["id"] + ".z")
+
+    def begin(self, name, command, admin=False):
+        os.makedirs(self.directory, exist_ok=True)
+        start = time.time()
+        entry = {
+            "id": time.strftime("%Y%m%d-%H%M%S", time.localtime(start)) + "-" + uuid.uuid4().hex[:6],
+            "name": name, "command": command, "admin": bool(admin), "start": start,
+            "duration": None, "exit": None, "bytes": 0, "size": 0, "truncated": False,
+        }
+        return RunRecord(self, entry)
+
+    def add(self, entry):
+        entries = self.entries
+        entries.append(entry)
+        self._total += entry.get("size", 0)
+        try:
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            pass
+        if self._total > self.max_bytes:
+            self.prune()
+
+    def read_output(self, entry):
+        """Return the run's captured output as bytes (b"" if it is gone)."""
+        try:
+            with open(self.output_path(entry), "rb") as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return b""
+
+    def search(self, text=""):
+        """Runs whose name or command contains *text*, newest first."""
+        needle = text.casefold()
+        return [e for e in reversed(self.entries)
+                if not needle or needle in e.get("name", "").casefold() or needle in e.get("command", "").casefold()]
+
+    def prune(self, max_age_days=None, max_bytes=None):
+        """Drop runs past the age or size limit; returns how many went."""
+        if max_age_days is None:
+            max_age_days = self.max_age_days
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        entries = self.entries
+        cutoff = time.time() - max_age_days * 86400 if max_age_days > 0 else None
+        keep = [e for e in entries if cutoff is None or e.get("start", 0) >= cutoff]
+        total = sum(e.get("size", 0) for e in keep)
+        while keep and max_bytes > 0 and total > max_bytes:
+            total -= keep.pop(0).get("size", 0)
+        if len(keep) == len(entries):
+            return 0
+        kept = {id(e) for e in keep}
+        return self._remove([e for e in entries if id(e) not in kept])
+
+    def delete(self, entries):
+        return self._remove(list(entries))
+
+    def clear(self):
+        return self._remove(list(self.entries))
+
+    def _remove(self, doomed):
+        ids = {e["id"] for e in doomed}
+        if not ids:
+            return 0
+        self._entries = [e for e in self.entries if e["id"] not in ids]
+        self._total = sum(e.get("size", 0) for e in self._entries)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            write_atomic(self.index_path, "".join(json.dumps(e) + "\n" for e in self._entries))
+        except OSError:
+            pass
+        for e in doomed:
+            try:
+                os.unlink(self.output_path(e))
+            except OSError:
+                pass
+        return len(ids)
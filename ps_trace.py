@@ -0,0 +1,313 @@
+"""Output traces for PowerShell Command Runner.
+
+A trace is the exact byte stream of one run together with when each chunk
+arrived, so output handling can be benchmarked on any machine, PowerShell or
+not.  :class:`TraceRecorder` plugs into ``ExecutionEngine.recorder`` and
+writes one ``.pstrace`` file per run; :class:`ReplayEngine` is an
+ExecutionEngine whose "commands" are trace paths, played back at recorded
+speed or as fast as possible.
+
+File format: the 8-byte magic ``PSTRACE1`` followed by one zlib stream of
+records.  The first record is the metadata (varint length + UTF-8 JSON);
+each later record is a tag byte, the varint microseconds since the previous
+record (the first is measured from spawn) and a tag-specific body:
+
+    1  output     varint length + raw bytes
+    2  exit       zigzag varint exit code
+    3  cancelled  (no body)
+    4  error      varint length + UTF-8 message
+
+A trace cut short (the app closed mid-run) reads back up to its last
+complete record.
+"""
+import json
+import os
+import threading
+import time
+import zlib
+
+from ps_engine import ExecutionEngine, EV_OUTPUT, EV_EXIT, EV_ERROR
+
+TRACE_MAGIC = b"PSTRACE1"
+TRACE_SUFFIX = ".pstrace"
+
+_TAG_OUTPUT = 1
+_TAG_EXIT = 2
+_TAG_CANCELLED = 3
+_TAG_ERROR = 4
+
+
+def _varint(n):
+    out = bytearray()
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def _zigzag(n):
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def _unzigzag(n):
+    return n // 2 if not n & 1 else -(n + 1) // 2
+
+
+class _Truncated(Exception):
+    pass
+
+
+def _read_varint(buf, pos):
+    n = shift = 0
+    while True:
+        if pos >= len(buf):
+            raise _Truncated
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _read_bytes(buf, pos):
+    size, pos = _read_varint(buf, pos)
+    if pos + size > len(buf):
+        raise _Truncated
+    return bytes(buf[pos:pos + size]), pos + size
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+class TraceWriter:
+    """Writes one run's events to *path* as they happen.
+
+    ``add`` is called from the run's reader thread with the event and the
+    ``perf_counter`` stamp it was posted at; *start* is the stamp the first
+    gap is measured from (now, by default).  A kill posts the run's end
+    from the UI thread while the reader may still be adding, so both hold
+    a lock, and anything added after the trace is closed is dropped.  A
+    write error stops the trace rather than the run.
+    """
+
+    def __init__(self, path, meta, start=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "wb")
+        self._file.write(TRACE_MAGIC)
+        self._z = zlib.compressobj(6)
+        header = json.dumps(meta).encode("utf-8")
+        self._write(_varint(len(header)) + header)
+        self._last = time.perf_counter() if start is None else start
+
+    def _write(self, data):
+        self._file.write(self._z.compress(data))
+
+    def add(self, kind, payload, now):
+        with self._lock:
+            if self._file is None:
+                return
+            delta = _varint(max(0, round((now - self._last) * 1e6)))
+            self._last = now
+            try:
+                if kind == EV_OUTPUT:
+                    self._write(bytes((_TAG_OUTPUT,)) + delta + _varint(len(payload)) + payload)
+                elif kind == EV_EXIT:
+                    if payload is None:
+                        self._write(bytes((_TAG_CANCELLED,)) + delta)
+                    else:
+                        self._write(bytes((_TAG_EXIT,)) + delta + _varint(_zigzag(payload)))
+                    self._close()
+                elif kind == EV_ERROR:
+                    msg = str(payload).encode("utf-8")
+                    self._write(bytes((_TAG_ERROR,)) + delta + _varint(len(msg)) + msg)
+                    self._close()
+            except OSError:
+                self._close()
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        f, self._file = self._file, None
+        if f is None:
+            return
+        try:
+            f.write(self._z.flush())
+        except OSError:
+            pass
+        finally:
+            f.close()
+
+
+class TraceRecorder:
+    """``ExecutionEngine.recorder`` that writes a trace per run into
+    *directory*, named by start time and run id."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self, run_id, command, elevated):
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, f"{stamp}-{run_id}{TRACE_SUFFIX}")
+        meta = {"command": command, "elevated": bool(elevated), "started": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            return TraceWriter(path, meta)
+        except OSError:
+            return None
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+class Trace:
+    """A recorded run: ``meta`` and ``events``, a list of
+    ``(seconds since previous event, kind, payload)``."""
+
+    def __init__(self, meta, events, complete):
+        self.meta = meta
+        self.events = events
+        self.complete = complete  # False if the recording was cut short
+
+    @property
+    def bytes(self):
+        return sum(len(p) for _, kind, p in self.events if kind == EV_OUTPUT)
+
+    @property
+    def chunks(self):
+        return sum(1 for _, kind, _p in self.events if kind == EV_OUTPUT)
+
+    @property
+    def duration(self):
+        return sum(delta for delta, _k, _p in self.events)
+
+
+def read_trace(path):
+    """Load a trace file.  Raises ValueError if it is not one."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(TRACE_MAGIC):
+        raise ValueError(f"{path} is not a trace file")
+    try:
+        buf = zlib.decompressobj().decompress(data[len(TRACE_MAGIC):])
+    except zlib.error as e:
+        raise ValueError(f"{path} is corrupt: {e}") from None
+    try:
+        header, pos = _read_bytes(buf, 0)
+    except _Truncated:
+        raise ValueError(f"{path} has no header") from None
+    meta = json.loads(header.decode("utf-8"))
+
+    events = []
+    complete = False
+    try:
+        while pos < len(buf):
+            tag = buf[pos]
+            delta, pos = _read_varint(buf, pos + 1)
+            delta /= 1e6
+            if tag == _TAG_OUTPUT:
+                chunk, pos = _read_bytes(buf, pos)
+                events.append((delta, EV_OUTPUT, chunk))
+                continue
+            if tag == _TAG_EXIT:
+                code, pos = _read_varint(buf, pos)
+                events.append((delta, EV_EXIT, _unzigzag(code)))
+            elif tag == _TAG_CANCELLED:
+                events.append((delta, EV_EXIT, None))
+            elif tag == _TAG_ERROR:
+                msg, pos = _read_bytes(buf, pos)
+                events.append((delta, EV_ERROR, msg.decode("utf-8", errors="replace")))
+            else:
+                raise ValueError(f"{path}: unknown record type {tag}")
+            complete = True
+            break
+    except _Truncated:
+        pass
+    return Trace(meta, events, complete)
+
+
+# ---------------------------------------------------------------------------
+# Replay
+# ---------------------------------------------------------------------------
+class ReplayRun:
+    """Plays a Trace into the engine's event queue from its own thread, like
+    a reader thread would.  *speed* scales the recorded gaps (2.0 is twice as
+    fast); 0 posts everything as fast as possible.
+
+    ``stamps`` collects ``(perf_counter, chunks so far)`` for every chunk
+    posted, for latency measurements.
+    """
+
+    def __init__(self, run_id, trace, events, speed=1.0):
+        self.id = run_id
+        self.command = trace.meta.get("command", "")
+        self.trace = trace
+        self.speed = speed
+        self.returncode = None
+        self.stamps = []
+        self._events = events
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._finished = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._reader, name=f"ps-replay-{self.id}", daemon=True)
+        self._thread.start()
+
+    def _reader(self):
+        start = time.perf_counter()
+        elapsed = 0.0
+        for delta, kind, payload in self.trace.events:
+            if self.speed:
+                elapsed += delta / self.speed
+                wait = start + elapsed - time.perf_counter()
+                if wait > 0 and self._cancelled.wait(wait):
+                    return
+            if self._cancelled.is_set():
+                return
+            if kind == EV_OUTPUT:
+                self.stamps.append((time.perf_counter(), len(self.stamps) + 1))
+                self._events.put((kind, self.id, payload))
+                continue
+            if kind == EV_EXIT:
+                self.returncode = payload
+            self._finish((kind, self.id, payload))
+            return
+        # Cut-short recording: end it the way a cancelled run ends
+        self._finish((EV_EXIT, self.id, None))
+
+    def _finish(self, event):
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+        self._events.put(event)
+
+    def kill(self):
+        self._cancelled.set()
+        self._finish((EV_EXIT, self.id, None))
+
+
+class ReplayEngine(ExecutionEngine):
+    """ExecutionEngine that replays traces instead of running PowerShell:
+    ``start(path)`` plays the trace at *path*.  Loaded traces are cached so
+    repeated replays measure the output path, not file reads."""
+
+    def __init__(self, speed=1.0, max_concurrent=0, decoder=None):
+        super().__init__(max_concurrent=max_concurrent, decoder=decoder)
+        self.speed = speed
+        self._traces = {}
+
+    def load(self, path):
+        trace = self._traces.get(path)
+        if trace is None:
+            trace = self._traces[path] = read_trace(path)
+        return trace
+
+    def _make_run(self, run_id, command, elevated, events):
+        return ReplayRun(run_id, self.load(command), events, self.speed)
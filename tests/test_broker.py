@@ -0,0 +1,135 @@
+"""ElevatedBroker and BrokerRun with elevation stubbed out: the launcher
+starts a Python stand-in that connects back with the tokens from the
+generated script, as the elevated PowerShell would."""
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from ps_engine import EV_ERROR, EV_EXIT, EV_OUTPUT, ElevatedBroker, ExecutionEngine
+
+# Connects, sends the broker token, checks the app's answer, then serves
+# "token base64(command)" lines like the host loop.  Commands are Python.
+STUB_BROKER = r"""
+import base64, contextlib, io, socket, sys
+port, broker_token, app_token = int(sys.argv[1]), sys.argv[2], sys.argv[3]
+conn = socket.create_connection(("127.0.0.1", port))
+lines = conn.makefile("rb")
+conn.sendall(broker_token.encode("ascii") + b"\n")
+if lines.readline().strip().decode("ascii") != app_token:
+    sys.exit(1)
+for line in lines:
+    token, payload = line.decode("ascii").split(" ", 1)
+    out = io.StringIO()
+    code = 0
+    with contextlib.redirect_stdout(out):
+        try:
+            exec(base64.b64decode(payload).decode("utf-8"), {"conn": conn})
+        except SystemExit as e:
+            code = e.code or 0
+    conn.sendall(out.getvalue().encode("utf-8") + f"<<<PSR_DONE:{token}:{code}>>>\r\n".encode("ascii"))
+"""
+
+
+class StubLauncher:
+    """Stands in for launch_elevated: reads the port and tokens out of the
+    broker script and starts STUB_BROKER with them."""
+
+    def __init__(self, impostor=False):
+        self.impostor = impostor  # connect once with a wrong token first
+        self.impostor_answer = None
+        self.threads = []
+        self.procs = []
+
+    def __call__(self, script_path):
+        with open(script_path, encoding="utf-8") as f:
+            script = f.read()
+        port = re.search(r"TcpClient\('127\.0\.0\.1', (\d+)\)", script).group(1)
+        broker_token = re.search(r"\$__w\.WriteLine\('(\w+)'\)", script).group(1)
+        app_token = re.search(r"-ne '(\w+)'", script).group(1)
+        if self.impostor:
+            # The broker only accepts once the launcher has returned
+            impostor = threading.Thread(target=self._impostor, args=(int(port),))
+            impostor.start()
+            self.threads.append(impostor)
+            impostor.join(timeout=0.2)  # get in line before the real one
+        self.procs.append(subprocess.Popen([sys.executable, "-c", STUB_BROKER, port, broker_token, app_token]))
+
+    def _impostor(self, port):
+        with socket.create_connection(("127.0.0.1", port)) as sock:
+            sock.sendall(b"not-the-token\n")
+            self.impostor_answer = sock.recv(64)
+
+    def close(self):
+        for thread in self.threads:
+            thread.join(timeout=5)
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+@pytest.fixture
+def launcher():
+    launcher = StubLauncher()
+    yield launcher
+    launcher.close()
+
+
+def _run(engine, command, timeout=20):
+    """Run *command* elevated; return (output, final event kind, payload)."""
+    run_id = engine.start(command, elevated=True)
+    output = b""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for kind, rid, payload in engine.drain(timeout=0.1):
+            if rid != run_id:
+                continue
+            if kind == EV_OUTPUT:
+                output += payload
+            elif kind in (EV_EXIT, EV_ERROR):
+                return output, kind, payload
+    raise AssertionError("run did not finish")
+
+
+def _engine(launcher):
+    return ExecutionEngine(broker=ElevatedBroker(launcher))
+
+
+def test_handshake_ignores_a_connection_without_the_token():
+    launcher = StubLauncher(impostor=True)
+    engine = _engine(launcher)
+    try:
+        assert _run(engine, "print('admin')") == (b"admin\n", EV_EXIT, 0)
+    finally:
+        engine.shutdown()
+        launcher.close()
+    assert launcher.impostor_answer == b""  # dropped without the app token
+    assert len(launcher.procs) == 1
+
+
+def test_commands_share_one_connection(launcher):
+    engine = _engine(launcher)
+    try:
+        results = [_run(engine, f"print({n}); raise SystemExit({n})") for n in range(3)]
+    finally:
+        engine.shutdown()
+    assert results == [(f"{n}\n".encode(), EV_EXIT, n) for n in range(3)]
+    assert len(launcher.procs) == 1  # one launch, so one UAC prompt
+
+
+def test_reconnects_after_the_broker_drops(launcher):
+    engine = _engine(launcher)
+    try:
+        assert _run(engine, "print('first')")[1:] == (EV_EXIT, 0)
+        _, kind, message = _run(engine, "import os; conn.close(); os._exit(0)")
+        assert kind == EV_ERROR and "exited" in message
+        assert _run(engine, "print('again')") == (b"again\n", EV_EXIT, 0)
+    finally:
+        engine.shutdown()
+    assert len(launcher.procs) == 2
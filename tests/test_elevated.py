@@ -0,0 +1,97 @@
+"""ElevatedRun with elevation stubbed out: the launcher connects back with
+the port and token from the generated script, as the elevated PowerShell
+would, and plays out a run."""
+import queue
+import re
+import socket
+import threading
+
+import ps_engine
+from ps_engine import EV_ERROR, EV_EXIT, EV_OUTPUT, ElevatedRun
+
+
+class StubLauncher:
+    """Stands in for launch_elevated: connects to the run's socket, sends the
+    token and then *reply* (with ``{token}`` filled in), and closes unless
+    *hold* is set."""
+
+    def __init__(self, reply="", hold=False):
+        self.reply = reply
+        self.hold = hold
+        self.conns = []
+        self.threads = []
+
+    def __call__(self, script_path):
+        with open(script_path, encoding="utf-8") as f:
+            script = f.read()
+        port = int(re.search(r"TcpClient\('127\.0\.0\.1', (\d+)\)", script).group(1))
+        token = re.search(r"\$__w\.WriteLine\('(\w+)'\)", script).group(1)
+        thread = threading.Thread(target=self._serve, args=(port, token))
+        thread.start()
+        self.threads.append(thread)
+
+    def _serve(self, port, token):
+        conn = socket.create_connection(("127.0.0.1", port))
+        self.conns.append(conn)
+        conn.sendall(token.encode("ascii") + b"\n" + self.reply.format(token=token).encode("utf-8"))
+        if not self.hold:
+            conn.close()
+
+    def close(self):
+        for thread in self.threads:
+            thread.join()
+        for conn in self.conns:
+            conn.close()
+
+
+def _events(launcher, command="Get-Date"):
+    events = queue.Queue()
+    run = ElevatedRun(1, command, events, launcher=launcher)
+    run.start()
+    return run, events
+
+
+def _until_done(events, timeout=5):
+    seen = []
+    while not seen or seen[-1][0] not in (EV_EXIT, EV_ERROR):
+        seen.append(events.get(timeout=timeout))
+    return seen
+
+
+def test_exit_code_comes_from_the_marker():
+    launcher = StubLauncher("hi\r\n<<<PSR_DONE:{token}:3>>>\r\n")
+    run, events = _events(launcher)
+    seen = _until_done(events)
+    launcher.close()
+    assert b"".join(bytes(ev[2]) for ev in seen if ev[0] == EV_OUTPUT) == b"hi\r\n"
+    assert seen[-1] == (EV_EXIT, 1, 3)
+    assert run.returncode == 3
+
+
+def test_stream_dropped_before_the_marker_is_an_error():
+    launcher = StubLauncher("partial output\r\n")
+    run, events = _events(launcher)
+    seen = _until_done(events)
+    launcher.close()
+    assert seen[-1][0] == EV_ERROR
+    assert "exit code" in seen[-1][2]
+    assert run.returncode is None
+
+
+def test_script_that_never_connects_is_an_error(monkeypatch):
+    monkeypatch.setattr(ps_engine, "_ELEVATED_CONNECT_TIMEOUT", 0.3)
+    run, events = _events(lambda script_path: None)
+    seen = _until_done(events)
+    assert seen[-1][0] == EV_ERROR
+    assert "did not connect" in seen[-1][2]
+
+
+def test_kill_mid_stream_is_a_cancel_not_an_error():
+    launcher = StubLauncher("working\r\n", hold=True)
+    run, events = _events(launcher)
+    assert events.get(timeout=5)[0] == EV_OUTPUT
+    run.kill()
+    assert _until_done(events)[-1] == (EV_EXIT, 1, None)
+    run._thread.join(timeout=5)
+    assert events.empty()  # the reader's own ending is not reported twice
+    launcher.close()
@@ -0,0 +1,44 @@
+"""Tests for ps_engine that need no PowerShell."""
+import queue
+
+import pytest
+
+import ps_engine
+from ps_engine import EV_EXIT, EV_OUTPUT, EV_START, ExecutionEngine, RunTiming, _TimedEvents
+from ps_output import OutputDecoder
+
+
+def test_drain_caps_coloured_output():
+    engine = ExecutionEngine()
+    decoder = OutputDecoder()
+    line = b"\x1b[32mok\x1b[0m " + b"x" * 53 + b"\r\n"   # 64 bytes
+    chunk = line * 1024                                  # 64 KB
+    for _ in range(200):
+        payload = decoder.decode(chunk)
+        assert isinstance(payload, list)
+        engine.events.put((EV_OUTPUT, 1, payload))
+    events = engine.drain(max_bytes=1 << 20)
+    chars = sum(len(text) for _, _, payload in events for text in payload[0::2])
+    assert len(events) < 200
+    assert chars < (1 << 20) + len(chunk)
+
+
+def test_failed_start_posts_nothing_and_keeps_no_timing(monkeypatch):
+    monkeypatch.setattr(ps_engine, "powershell_argv", lambda command: ["/nonexistent/pwsh", "-c", command])
+    engine = ExecutionEngine()
+    with pytest.raises(OSError):
+        engine.start("Get-Date")
+    assert engine.events.empty()
+    assert engine.timings == {}
+    assert engine.runs == {}
+
+
+def test_run_events_wait_for_the_start():
+    events = queue.Queue()
+    timed = _TimedEvents(events, RunTiming())
+    timed.put((EV_OUTPUT, 1, b"early"))
+    assert events.empty()
+    timed.started((EV_START, 1, "Get-Date"))
+    timed.put((EV_EXIT, 1, 0))
+    assert [events.get_nowait() for _ in range(3)] == [(EV_START, 1, "Get-Date"), (EV_OUTPUT, 1, b"early"),
+                                                       (EV_EXIT, 1, 0)]
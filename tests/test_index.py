@@ -0,0 +1,41 @@
+"""Tests for the search index in ps_index."""
+import random
+
+import pytest
+
+from ps_index import SearchIndex
+
+VERBS = ["Get", "Set", "Stop", "Start", "Restart", "Test", "Clear", "Export"]
+NOUNS = ["Service", "NetAdapter", "Process", "User", "Share", "Setting", "Get"]
+
+
+def _commands(count, seed):
+    rnd = random.Random(seed)
+    commands = []
+    for i in range(count):
+        verb, noun = rnd.choice(VERBS), rnd.choice(NOUNS)
+        name = rnd.choice([f"{verb} {noun} {i}", f"{verb}{noun}", noun, verb])
+        commands.append({"name": name, "cmd": f"{verb}-{noun} -Name 'item{i}'", "category": f"{noun} Tools"})
+    return commands
+
+
+@pytest.mark.parametrize("query", ["g", "s", "se", "e", "q", "et", "get", "set", "service", "net", "stop", "e 1",
+                                   "get service", "start", "restart", "service 1"])
+def test_top_is_the_head_of_the_full_ranking(query):
+    commands = _commands(3000, 5)
+    index = SearchIndex(commands)
+    random.Random(9).shuffle(commands)  # positions no longer follow the index's own order
+    position = {id(item): idx for idx, item in enumerate(commands)}.__getitem__
+    ranked = index.ranked(query, position)
+    for limit in (1, 12, 120):
+        head = index.top(query, position, limit, map(id, commands))
+        if head is not None:
+            assert head == ranked[:limit]
+
+
+def test_top_leaves_narrow_queries_to_ranked():
+    commands = _commands(3000, 5)
+    index = SearchIndex(commands)
+    position = {id(item): idx for idx, item in enumerate(commands)}.__getitem__
+    assert index.top("service 12", position, 120, map(id, commands)) is None
+    assert index.top("get", position, 120, map(id, commands)) is not None
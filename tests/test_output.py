@@ -0,0 +1,74 @@
+"""Tests for the output pipeline in ps_output."""
+import random
+import re
+
+import pytest
+
+from ps_output import DEFAULT_STYLE, OutputDecoder, _apply_sgr, _tag_for
+
+SEQUENCES = ["\x1b[31m", "\x1b[0m", "\x1b[m", "\x1b[1m", "\x1b[44m", "\x1b[0;32m", "\x1b[39m",
+             "\x1b[38;5;200m", "\x1b[2K", "\x1b[?25l", "\x1b[7m", "\x1b[22;24m"]
+TEXTS = ["ab", "c\n", "", "xyz\n", "é", "d\r\n", "e\r", "\n"]
+
+
+def _reference(text):
+    """``(text, tag)`` runs for *text*, one escape sequence at a time."""
+    # A \r is the first half of a \r\n if only escapes stand between them
+    text = re.sub(r"\r(?=(?:\x1b\[[0-?]*[ -/]*[@-~])*\n)", "", text)
+    style = DEFAULT_STYLE
+    runs = []
+    for m in re.finditer(r"\x1b\[([0-?]*)[ -/]*([@-~])|([^\x1b]+)", text):
+        if m.group(3):
+            runs.append((m.group(3), _tag_for(style)))
+        elif m.group(2) == "m":
+            style = _apply_sgr(style, m.group(1))
+    return runs
+
+
+def _pairs(output):
+    if isinstance(output, str):
+        return [(output, None)]
+    return list(zip(output[0::2], output[1::2]))
+
+
+def _merged(runs):
+    merged = []
+    for text, tag in runs:
+        if not text:
+            continue
+        if merged and merged[-1][1] == tag:
+            merged[-1] = (merged[-1][0] + text, tag)
+        else:
+            merged.append((text, tag))
+    return merged
+
+
+def _decode(data, size):
+    decoder = OutputDecoder()
+    runs = []
+    for i in range(0, len(data), size):
+        runs += _pairs(decoder.decode(data[i:i + size]))
+    return runs + _pairs(decoder.flush())
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64, 4096])
+def test_decoder_matches_reference_at_any_chunk_size(size):
+    rng = random.Random(size)
+    for trial in range(150):
+        pool = SEQUENCES if trial % 2 else ["\x1b[31m", "\x1b[0m", "\x1b[32;1m", "\x1b[m", "\x1b[0;33m"]
+        text = "".join(rng.choice(pool) + rng.choice(TEXTS) for _ in range(rng.randint(1, 200)))
+        assert _merged(_decode(text.encode("utf-8"), size)) == _merged(_reference(text))
+
+
+def test_unfinished_escape_at_end_is_dropped():
+    for tail in ("\x1b", "\x1b[", "\x1b[3", "\x1b[38;5"):
+        assert _merged(_decode(("done\n" + tail).encode("ascii"), 2)) == [("done\n", None)]
+
+
+def test_crlf_around_a_colour_reset_is_a_newline():
+    # PowerShell resets the colour at the end of a line, after the \r
+    data = b"\x1b[32mok\r\x1b[0m\nnext\r\n"
+    for cut in range(len(data) + 1):
+        decoder = OutputDecoder()
+        runs = _pairs(decoder.decode(data[:cut])) + _pairs(decoder.decode(data[cut:])) + _pairs(decoder.flush())
+        assert _merged(runs) == [("ok", _tag_for(_apply_sgr(DEFAULT_STYLE, "32"))), ("\nnext\n", None)]
@@ -0,0 +1,135 @@
+"""HostPool and PooledRun driven by a small Python stand-in for the
+PowerShell host loop."""
+import sys
+import time
+
+import pytest
+
+import ps_engine
+from ps_engine import (DONE_PREFIX, EV_EXIT, EV_OUTPUT, EV_START, DoneScanner, ExecutionEngine,
+                       HostPool, PooledRun, Run)
+
+# Speaks the host protocol: one "token base64(command)" line per command,
+# output, then the done marker.  Commands are Python; SystemExit sets the
+# exit code.  The marker ends in \r\n as WriteLine does on Windows and is
+# written in two halves so it arrives split across reads.
+STUB_HOST = r"""
+import base64, sys, time
+for line in sys.stdin:
+    token, payload = line.split(" ", 1)
+    code = 0
+    try:
+        exec(base64.b64decode(payload).decode("utf-8"), {})
+    except SystemExit as e:
+        code = e.code or 0
+    except Exception as e:
+        print(e)
+        code = 1
+    sys.stdout.flush()
+    marker = f"<<<PSR_DONE:{token}:{code}>>>\r\n"
+    sys.stdout.write(marker[:9]); sys.stdout.flush()
+    time.sleep(0.01)
+    sys.stdout.write(marker[9:]); sys.stdout.flush()
+"""
+STUB_ARGV = [sys.executable, "-c", STUB_HOST]
+
+
+@pytest.fixture
+def engine():
+    pool = HostPool(1, max_runs=3, argv=STUB_ARGV)
+    pool.warm()
+    engine = ExecutionEngine(pool)
+    yield engine
+    engine.shutdown()
+
+
+def _run(engine, command, timeout=10):
+    """Run *command*; return (host it ran on, output, exit code)."""
+    run_id = engine.start(command)
+    run = engine.runs[run_id]
+    assert isinstance(run, PooledRun)
+    output = b""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for kind, rid, payload in engine.drain(timeout=0.1):
+            if rid != run_id:
+                continue
+            if kind == EV_OUTPUT:
+                output += payload
+            elif kind == EV_EXIT:
+                return run.host, output, payload
+    raise AssertionError("run did not finish")
+
+
+def _wait_for_idle_host(pool, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not pool._idle:
+        assert time.monotonic() < deadline, "pool did not respawn a host"
+        time.sleep(0.01)
+
+
+def test_exit_code_and_output_pass_through(engine):
+    host, output, code = _run(engine, "print('hello'); raise SystemExit(3)")
+    assert output.replace(b"\r\n", b"\n") == b"hello\n"
+    assert code == 3
+
+
+def test_marker_line_is_consumed_whole(engine):
+    first, _, _ = _run(engine, "print('one')")
+    second, output, code = _run(engine, "print('two')")
+    assert second is first
+    assert output.replace(b"\r\n", b"\n") == b"two\n"  # no \r\n left over from the marker
+    assert code == 0
+
+
+def test_host_recycled_after_max_runs(engine):
+    hosts = [_run(engine, "pass")[0] for _ in range(3)]
+    assert hosts[0] is hosts[1] is hosts[2]
+    assert hosts[0].proc.wait(timeout=5) is not None  # closed after its third run
+    _wait_for_idle_host(engine.pool)
+    assert _run(engine, "pass")[0] is not hosts[0]
+
+
+def test_host_recycled_after_failed_command(engine):
+    host, _, code = _run(engine, "raise SystemExit(2)")
+    assert code == 2
+    host.proc.wait(timeout=5)
+    _wait_for_idle_host(engine.pool)
+    assert _run(engine, "pass")[0] is not host
+
+
+def test_host_dying_mid_command_reports_its_exit_code(engine):
+    command = "import os, sys; sys.stdout.write('partial\\n'); sys.stdout.flush(); os._exit(7)"
+    host, output, code = _run(engine, command)
+    assert output.replace(b"\r\n", b"\n") == b"partial\n"
+    assert code == 7
+
+
+def test_marker_split_at_every_byte():
+    stream = b"out\r\n" + DONE_PREFIX + b"tok:5>>>\r\n"
+    for cut in range(len(stream) + 1):
+        scanner = DoneScanner("tok")
+        out, code = scanner.feed(stream[:cut])
+        assert code is None or cut == len(stream)
+        if code is None:
+            more, code = scanner.feed(stream[cut:])
+            out += more
+        assert (out, code) == (b"out\r\n", 5)
+
+
+def test_dead_idle_host_falls_back_to_a_fresh_process(engine, monkeypatch):
+    monkeypatch.setattr(ps_engine, "powershell_argv", lambda command: [sys.executable, "-c", command])
+    dead = engine.pool._idle[0]
+    dead.proc.kill()
+    dead.proc.wait(timeout=5)
+    monkeypatch.setattr(dead, "alive", lambda: True)  # died just after the pool checked
+    run_id = engine.start("print('fresh')")
+    assert isinstance(engine.runs[run_id], Run)
+    events = []
+    deadline = time.monotonic() + 10
+    while not events or events[-1][0] != EV_EXIT:
+        assert time.monotonic() < deadline, "run did not finish"
+        events += [ev for ev in engine.drain(timeout=0.1) if ev[1] == run_id]
+    assert events[0] == (EV_START, run_id, "print('fresh')")
+    assert b"".join(p for kind, _, p in events if kind == EV_OUTPUT).strip() == b"fresh"
+    assert events[-1] == (EV_EXIT, run_id, 0)
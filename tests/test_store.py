@@ -0,0 +1,72 @@
+"""Tests for the journaled command store in ps_store."""
+import json
+import os
+
+import ps_store
+from ps_store import CommandStore
+
+
+def _store(tmp_path, items=()):
+    path = tmp_path / "commands.json"
+    path.write_text(json.dumps(list(items)), encoding="utf-8")
+    return CommandStore(str(path))
+
+
+def _reloaded(store):
+    return CommandStore(store.path).items
+
+
+def _compact_now(store):
+    store.compact()
+    if store._compactor is not None:
+        store._compactor.join()
+
+
+def test_mutations_survive_a_reload(tmp_path):
+    store = _store(tmp_path, [{"name": "a"}])
+    store.append({"name": "b"})
+    store.move(1, 0)
+    store.close(fold=False)
+    assert _reloaded(store) == [{"name": "b"}, {"name": "a"}]
+
+
+def test_failed_journal_swap_keeps_journaling(tmp_path, monkeypatch):
+    store = _store(tmp_path, [{"name": "a"}])
+    store.append({"name": "b"})
+    real_replace = os.replace
+
+    def replace(src, dst):
+        if dst == store.journal_path:
+            raise PermissionError("sharing violation")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(ps_store.os, "replace", replace)
+    _compact_now(store)
+    store.append({"name": "c"})  # used to raise "write to closed file"
+    assert _reloaded(store) == [{"name": "a"}, {"name": "b"}, {"name": "c"}]
+
+    # Once the swap works again the next compaction moves the journal back
+    monkeypatch.setattr(ps_store.os, "replace", real_replace)
+    _compact_now(store)
+    store.append({"name": "d"})
+    store.close(fold=False)
+    assert not os.path.exists(store.journal_path + ".new")
+    assert _reloaded(store) == [{"name": n} for n in "abcd"]
+
+
+def test_journal_edit_that_does_not_apply_is_dropped(tmp_path):
+    store = _store(tmp_path, [{"name": "a"}])
+    store.append({"name": "b"})
+    store.close(fold=False)
+    with open(store.journal_path, "ab") as f:
+        f.write(b'{"op": "delete", "at": 7}\n')
+        f.write(b'{"op": "append"}\n')
+    reloaded = CommandStore(store.path)
+    assert reloaded.items == [{"name": "a"}, {"name": "b"}]
+    assert "commands.journal" in reloaded.load_error
+
+    # The bad edit was cut off, so new edits append after the good ones
+    reloaded.append({"name": "c"})
+    reloaded.close(fold=False)
+    again = CommandStore(store.path)
+    assert again.items == [{"name": n} for n in "abc"] and again.load_error is None
@@ -0,0 +1,72 @@
+"""Tests for recording and reading traces in ps_trace."""
+import threading
+import time
+
+import ps_trace
+from ps_engine import EV_EXIT, EV_OUTPUT
+from ps_trace import TraceWriter, read_trace
+
+
+def test_events_after_the_end_are_dropped(tmp_path):
+    path = str(tmp_path / "run.pstrace")
+    writer = TraceWriter(path, {"command": "Get-Date"})
+    now = time.perf_counter()
+    writer.add(EV_OUTPUT, b"hello\r\n", now)
+    writer.add(EV_EXIT, None, now)   # a kill ends the trace
+    writer.add(EV_OUTPUT, b"late\r\n", now)
+    writer.add(EV_EXIT, 0, now)
+    writer.close()
+
+    trace = read_trace(path)
+    assert trace.complete
+    assert [(kind, payload) for _, kind, payload in trace.events] == [(EV_OUTPUT, b"hello\r\n"), (EV_EXIT, None)]
+
+
+class GatedFile:
+    """A file whose next write, once armed, waits for the test to let it
+    through."""
+
+    def __init__(self, f):
+        self._f = f
+        self.armed = False
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, data):
+        if self.armed:
+            self.armed = False
+            self.entered.set()
+            self.release.wait(5)
+        return self._f.write(data)
+
+    def close(self):
+        self._f.close()
+
+
+def test_close_waits_for_an_add_in_progress(tmp_path, monkeypatch):
+    files = []
+
+    def gated_open(*args):
+        files.append(GatedFile(open(*args)))
+        return files[-1]
+
+    monkeypatch.setattr(ps_trace, "open", gated_open, raising=False)
+    path = str(tmp_path / "run.pstrace")
+    writer = TraceWriter(path, {"command": "Get-Date"})
+    monkeypatch.undo()
+    gate = files[0]
+    gate.armed = True
+    adding = threading.Thread(target=writer.add, args=(EV_OUTPUT, b"x" * 100000, time.perf_counter()))
+    adding.start()
+    assert gate.entered.wait(5)
+    closing = threading.Thread(target=writer.close)  # a kill, from the UI thread
+    closing.start()
+    closing.join(0.2)
+    assert closing.is_alive()
+    gate.release.set()
+    adding.join(5)
+    closing.join(5)
+    writer.add(EV_OUTPUT, b"late", time.perf_counter())
+
+    trace = read_trace(path)
+    assert [payload for _, _kind, payload in trace.events] == [b"x" * 100000]